@@ -7,11 +7,21 @@ class Settings:
     # MongoDB
     MONGODB_URL: str = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
     DATABASE_NAME: str = os.getenv("DATABASE_NAME", "goodzwork")
+    MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+    MONGODB_MIN_POOL_SIZE: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "0"))  # 0 = wait forever
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "30000"))
+    MONGODB_COMPRESSORS: str = os.getenv("MONGODB_COMPRESSORS", "")  # e.g. "zstd,snappy,zlib"
+    # Read preference for report/export queries (primary, secondaryPreferred, ...)
+    MONGODB_REPORT_READ_PREFERENCE: str = os.getenv("MONGODB_REPORT_READ_PREFERENCE", "secondaryPreferred")
     
     # JWT
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "your-secret-key")
     JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
+    # Authenticated principal cache (0 disables it)
+    AUTH_PRINCIPAL_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+    AUTH_PRINCIPAL_CACHE_SIZE: int = int(os.getenv("AUTH_PRINCIPAL_CACHE_SIZE", "10000"))
     
     # Geofencing
     COMPANY_LATITUDE: float = float(os.getenv("COMPANY_LATITUDE", "10.7769"))
@@ -22,9 +32,42 @@ class Settings:
     FACE_MODEL: str = os.getenv("FACE_MODEL", "ArcFace")
     FACE_DETECTOR: str = os.getenv("FACE_DETECTOR", "retinaface")
     FACE_DISTANCE_THRESHOLD: float = float(os.getenv("FACE_DISTANCE_THRESHOLD", "0.4"))
+    # Coarse-to-fine detection: detect on a downscaled frame, refine around the hit.
+    # Off by default: enrolled templates were built from full-resolution crops,
+    # so re-enroll faces after turning it on
+    FACE_DETECT_COARSE_TO_FINE: bool = os.getenv("FACE_DETECT_COARSE_TO_FINE", "false").lower() == "true"
+    FACE_DETECT_DOWNSCALE: float = float(os.getenv("FACE_DETECT_DOWNSCALE", "0.5"))
+    FACE_DETECT_COARSE_SCALE_FACTOR: float = float(os.getenv("FACE_DETECT_COARSE_SCALE_FACTOR", "1.1"))
+    FACE_DETECT_ROI_MARGIN: float = float(os.getenv("FACE_DETECT_ROI_MARGIN", "0.25"))
+    # Retry at full resolution when the coarse pass misses (safer, slower on misses)
+    FACE_DETECT_FULL_FALLBACK: bool = os.getenv("FACE_DETECT_FULL_FALLBACK", "true").lower() == "true"
+    FACE_TEMPLATE_CACHE_SIZE: int = int(os.getenv("FACE_TEMPLATE_CACHE_SIZE", "1000"))
+    # Process pool for CPU-bound OpenCV work (0 = run in a thread instead)
+    FACE_WORKER_PROCESSES: int = int(os.getenv("FACE_WORKER_PROCESSES", str(os.cpu_count() or 2)))
+    # Max requests waiting for a worker before answering 503
+    FACE_WORKER_QUEUE_SIZE: int = int(os.getenv("FACE_WORKER_QUEUE_SIZE", "32"))
     
     # Paths
     FACE_DATA_PATH: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), "face_data")
     UPLOADS_PATH: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
+    # Cached export workbooks - not under UPLOADS_PATH, which is served publicly
+    EXPORTS_PATH: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), "exports")
+    
+    # Background export jobs (files cached under EXPORTS_PATH)
+    EXPORT_JOB_WORKERS: int = int(os.getenv("EXPORT_JOB_WORKERS", "2"))
+    
+    # Socket.IO presence: "memory" (single worker) or "redis" (shared by all workers)
+    PRESENCE_BACKEND: str = os.getenv("PRESENCE_BACKEND", "memory")
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    # Multi-node Socket.IO: pub/sub URL shared by every node (redis://... or
+    # amqp://...); empty = single node, events only reach local clients
+    SOCKETIO_MESSAGE_QUEUE: str = os.getenv("SOCKETIO_MESSAGE_QUEUE", "")
+    # Delivered/seen receipts are buffered this long and written together
+    CHAT_RECEIPT_FLUSH_MS: int = int(os.getenv("CHAT_RECEIPT_FLUSH_MS", "200"))
+    
+    # Employee performance stats cache (0 disables it)
+    PERFORMANCE_STATS_CACHE_TTL_SECONDS: float = float(os.getenv("PERFORMANCE_STATS_CACHE_TTL_SECONDS", "30"))
+    # Summary cache of closed (all PAID) payroll months (0 disables it)
+    PAYROLL_SUMMARY_CACHE_TTL_SECONDS: float = float(os.getenv("PAYROLL_SUMMARY_CACHE_TTL_SECONDS", "60"))
 
 settings = Settings()
@@ -1,14 +1,113 @@
+import threading
+import time
+from typing import Dict, List
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, ReadPreference
+from pymongo.errors import OperationFailure
+from pymongo.monitoring import ConnectionPoolListener
 from .config import settings
 
+class PoolMetrics(ConnectionPoolListener):
+    """
+    Connection pool counters for tuning MONGODB_* pool settings.
+    Checkout wait is measured per thread, since pymongo emits the
+    started/checked-out events on the thread doing the checkout.
+    """
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checked_in = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.pools_cleared = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+    
+    def _wait_ms(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return (time.perf_counter() - started) * 1000 if started else 0.0
+    
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+    
+    def connection_checked_out(self, event):
+        wait_ms = self._wait_ms()
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+    
+    def connection_check_out_failed(self, event):
+        self._wait_ms()
+        with self._lock:
+            self.checkout_failures += 1
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_in += 1
+    
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+    
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+    
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_ready(self, event):
+        pass
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "max_pool_size": settings.MONGODB_MAX_POOL_SIZE,
+                "min_pool_size": settings.MONGODB_MIN_POOL_SIZE,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checked_out_now": self.checkouts - self.checked_in,
+                "open_connections": self.connections_created - self.connections_closed,
+                "pools_cleared": self.pools_cleared,
+                "avg_wait_ms": round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.wait_max_ms, 3)
+            }
+
 class Database:
     client: AsyncIOMotorClient = None
     
 db = Database()
+pool_metrics = PoolMetrics()
 
 async def connect_to_mongo():
     """Connect to MongoDB on startup"""
-    db.client = AsyncIOMotorClient(settings.MONGODB_URL)
+    options = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "event_listeners": [pool_metrics]
+    }
+    if settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS > 0:
+        options["waitQueueTimeoutMS"] = settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS
+    if settings.MONGODB_COMPRESSORS:
+        options["compressors"] = settings.MONGODB_COMPRESSORS
+    
+    db.client = AsyncIOMotorClient(settings.MONGODB_URL, **options)
     print(f"✅ Đã kết nối tới MongoDB: {settings.DATABASE_NAME}")
 
 async def close_mongo_connection():
@@ -21,27 +120,113 @@ def get_database():
     """Get the database instance"""
     return db.client[settings.DATABASE_NAME]
 
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST
+}
+
+def get_reporting_collection(name: str):
+    """
+    Collection handle for report/export reads, routed by
+    MONGODB_REPORT_READ_PREFERENCE (secondaries by default) so heavy
+    scans stay off the primary. Only use for reads that tolerate lag.
+    """
+    read_preference = READ_PREFERENCES.get(
+        settings.MONGODB_REPORT_READ_PREFERENCE, ReadPreference.SECONDARY_PREFERRED
+    )
+    return get_database()[name].with_options(read_preference=read_preference)
+
+# Index registry: routers declare the indexes their queries rely on
+# at import time, and they are ensured once on startup.
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {}
+
+def register_indexes(collection_name: str, *indexes: IndexModel):
+    """Declare indexes for a collection (call at module level)"""
+    INDEX_REGISTRY.setdefault(collection_name, []).extend(indexes)
+
+async def ensure_indexes():
+    """Create every registered index. Existing identical indexes are a no-op."""
+    database = get_database()
+    for collection_name, indexes in INDEX_REGISTRY.items():
+        try:
+            names = await database[collection_name].create_indexes(indexes)
+            print(f"📇 {collection_name}: {', '.join(names)}")
+        except OperationFailure as e:
+            # e.g. an index with the same name but different options already exists
+            print(f"⚠️ Không thể tạo index cho {collection_name}: {e}")
+
 # Collections
+class Collections:
+    """Canonical collection names - never spell them out in routers"""
+    USERS = "users"
+    ATTENDANCE_LOGS = "attendance_logs"
+    DAILY_ATTENDANCE = "daily_attendance"
+    LEAVES = "leaves"
+    OVERTIME = "overtime"
+    PROJECTS = "projects"
+    TASKS = "tasks"
+    MESSAGES = "messages"
+    CONVERSATIONS = "conversations"
+    READ_CURSORS = "read_cursors"
+    PAYROLLS = "payrolls"
+    NOTIFICATIONS = "notifications"
+    SETTINGS = "settings"
+    DOCUMENTS = "documents"
+    CONTRACTS = "contracts"
+    KPI_REVIEWS = "kpi_reviews"
+    FACE_TEMPLATES = "face_templates"
+    EXPORT_JOBS = "export_jobs"
+
 def get_users_collection():
-    return get_database()["users"]
+    return get_database()[Collections.USERS]
 
 def get_attendance_collection():
-    return get_database()["attendance_logs"]
+    return get_database()[Collections.ATTENDANCE_LOGS]
+
+def get_daily_attendance_collection():
+    return get_database()[Collections.DAILY_ATTENDANCE]
 
 def get_projects_collection():
-    return get_database()["projects"]
+    return get_database()[Collections.PROJECTS]
 
 def get_tasks_collection():
-    return get_database()["tasks"]
+    return get_database()[Collections.TASKS]
 
 def get_messages_collection():
-    return get_database()["messages"]
+    return get_database()[Collections.MESSAGES]
 
 def get_conversations_collection():
-    return get_database()["conversations"]
+    return get_database()[Collections.CONVERSATIONS]
 
 def get_payrolls_collection():
-    return get_database()["payrolls"]
+    return get_database()[Collections.PAYROLLS]
 
 def get_notifications_collection():
-    return get_database()["notifications"]
+    return get_database()[Collections.NOTIFICATIONS]
+
+def get_face_templates_collection():
+    return get_database()[Collections.FACE_TEMPLATES]
+
+def get_export_jobs_collection():
+    return get_database()[Collections.EXPORT_JOBS]
+
+def get_leaves_collection():
+    return get_database()[Collections.LEAVES]
+
+def get_overtime_collection():
+    return get_database()[Collections.OVERTIME]
+
+def get_settings_collection():
+    return get_database()[Collections.SETTINGS]
+
+def get_documents_collection():
+    return get_database()[Collections.DOCUMENTS]
+
+def get_contracts_collection():
+    return get_database()[Collections.CONTRACTS]
+
+def get_kpi_collection():
+    return get_database()[Collections.KPI_REVIEWS]
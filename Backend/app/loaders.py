@@ -0,0 +1,63 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional
+
+from .repositories import Repository, projects_repo, users_repo
+
+class BatchLoader:
+    """
+    DataLoader-style lookups by id for one request. load() calls made
+    before the event loop next runs are coalesced into a single $in query
+    (Repository.get_many), and every result is cached for the rest of the
+    request, so rendering a list costs one query per collection instead of
+    one per item. Missing or malformed ids resolve to None.
+    """
+
+    def __init__(self, repo: Repository, projection: Optional[dict] = None):
+        self.repo = repo
+        self.projection = projection
+        self._cache: Dict[str, asyncio.Future] = {}
+        self._queue: List[str] = []
+        self._dispatch_task: Optional[asyncio.Task] = None
+
+    def load(self, id) -> "asyncio.Future[Optional[dict]]":
+        key = str(id)
+        future = self._cache.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._cache[key] = future
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                # Runs once the caller yields, after the rest of the batch is queued
+                self._dispatch_task = asyncio.create_task(self._dispatch())
+        return future
+
+    async def load_many(self, ids: Iterable) -> List[Optional[dict]]:
+        """Load several ids with one query, in the order given"""
+        return list(await asyncio.gather(*(self.load(i) for i in ids)))
+
+    async def _dispatch(self):
+        keys, self._queue = self._queue, []
+        try:
+            docs = await self.repo.get_many(keys, self.projection)
+        except Exception as e:
+            for key in keys:
+                # Do not cache failures - a later load() retries
+                self._cache.pop(key).set_exception(e)
+            return
+        for key in keys:
+            self._cache[key].set_result(docs.get(key))
+
+class RequestLoaders:
+    """The loaders of one request - use through the get_loaders dependency"""
+
+    # Fields endpoints show for a user next to a project or task
+    USER_FIELDS = {"full_name": 1, "email": 1, "avatar": 1, "position": 1, "department": 1}
+    PROJECT_FIELDS = {"name": 1}
+
+    def __init__(self):
+        self.users = BatchLoader(users_repo, self.USER_FIELDS)
+        self.projects = BatchLoader(projects_repo, self.PROJECT_FIELDS)
+
+def get_loaders() -> RequestLoaders:
+    """FastAPI dependency: fresh loaders (and cache) for every request"""
+    return RequestLoaders()
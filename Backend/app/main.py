@@ -1,11 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 import os
 
 from .config import settings as settings_config
-from .database import connect_to_mongo, close_mongo_connection
-from .socket_events import socket_app
+from .database import connect_to_mongo, close_mongo_connection, ensure_indexes
+from .socket_events import receipts, socket_app
+from .services.face_worker_pool import face_worker_pool, FaceWorkerPoolBusy
+from .services.export_jobs import export_jobs
+from .services.presence import presence
 
 # Import routers
 from .routers import auth, users, attendance, chat, projects, payroll, settings, leaves, notifications, calendar, overtime, exports, kpi, contracts, documents
@@ -31,15 +35,30 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup():
     await connect_to_mongo()
+    await ensure_indexes()
     # Create directories
     os.makedirs(settings_config.FACE_DATA_PATH, exist_ok=True)
     os.makedirs(settings_config.UPLOADS_PATH, exist_ok=True)
+    face_worker_pool.start()
+    export_jobs.start()
     print("🚀 GoodZWork API đã chạy thành công!")
 
 @app.on_event("shutdown")
 async def shutdown():
+    face_worker_pool.shutdown()
+    await export_jobs.shutdown()
+    await presence.shutdown()
+    await receipts.shutdown()
     await close_mongo_connection()
 
+@app.exception_handler(FaceWorkerPoolBusy)
+async def face_worker_pool_busy_handler(request: Request, exc: FaceWorkerPoolBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Hệ thống nhận diện khuôn mặt đang quá tải, vui lòng thử lại sau giây lát"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -101,6 +120,7 @@ async def api_info():
             "new_message": "Receive new message",
             "typing": "Typing indicator",
             "mark_seen": "Mark messages as read",
+            "message_status_update": "Delivered/seen receipts for your messages: {conversation_id, delivered: {user_id: [message_id]}, seen: {user_id: [message_id]}}",
             "revoke_message": "Recall a message"
         }
     }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Union
 from datetime import datetime
 from enum import Enum
 
@@ -31,7 +31,9 @@ class Payroll(BaseModel):
     actual_working_days: int = 0
     late_days: int = 0
     early_leave_days: int = 0
-    absent_days: int = 0
+    absent_days: Union[int, float] = 0  # half-day leaves can leave half days
+    leave_days: Union[int, float] = 0  # paid leave on working days
+    overtime_hours: float = 0  # approved OT
     
     # Salary calculation
     base_salary: float = 0
@@ -66,6 +68,11 @@ class PayrollCalculateRequest(BaseModel):
     base_salary: float
     bonuses: List[PayrollBonus] = []
 
+class PayrollRunRequest(BaseModel):
+    month: int = Field(..., ge=1, le=12)
+    year: int
+    overwrite: bool = False  # Recalculate existing DRAFT payrolls
+
 class PayrollApprove(BaseModel):
     payroll_ids: List[str]
 
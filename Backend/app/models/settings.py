@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class CompanySettings(BaseModel):
@@ -13,6 +13,7 @@ class CompanySettings(BaseModel):
     work_end_time: str = "17:00"
     late_threshold_minutes: int = 15
     early_leave_threshold_minutes: int = 30
+    holidays: List[str] = []  # "YYYY-MM-DD", excluded from payroll working days
     updated_at: Optional[datetime] = None
     updated_by: Optional[str] = None
 
@@ -27,3 +28,4 @@ class CompanySettingsUpdate(BaseModel):
     work_end_time: Optional[str] = None
     late_threshold_minutes: Optional[int] = None
     early_leave_threshold_minutes: Optional[int] = None
+    holidays: Optional[List[str]] = None
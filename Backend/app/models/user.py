@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List
+from typing import Optional
 from datetime import datetime
 from enum import Enum
 from bson import ObjectId
@@ -49,8 +49,7 @@ class UserBase(BaseModel):
 class UserInDB(UserBase):
     id: Optional[str] = Field(default=None, alias="_id")
     hashed_password: str
-    face_encodings: Optional[List[List[float]]] = None  # Face vectors from DeepFace
-    face_registered: bool = False
+    face_registered: bool = False  # Encodings live in the face_templates collection
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
@@ -0,0 +1,340 @@
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .database import Collections, get_database, get_reporting_collection
+
+def _object_id(value):
+    """ObjectId for valid hex strings, the value unchanged otherwise"""
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return value
+
+def _keyset_after(sort: List[Tuple[str, int]], last: dict) -> dict:
+    """Filter for documents that come after `last` in `sort` order"""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: last.get(f) for f, _ in sort[:i]}
+        clause[field] = {"$gt" if direction == ASCENDING else "$lt": last.get(field)}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+class Repository:
+    """
+    Data access for one collection. reporting=True routes reads through
+    get_reporting_collection (secondaries) for reports that tolerate lag.
+    """
+
+    name: str = ""
+
+    def collection(self, reporting: bool = False):
+        if reporting:
+            return get_reporting_collection(self.name)
+        return get_database()[self.name]
+
+    async def get(self, id, projection: Optional[dict] = None, reporting: bool = False) -> Optional[dict]:
+        return await self.collection(reporting).find_one({"_id": _object_id(id)}, projection)
+
+    async def get_many(
+        self,
+        ids: Iterable,
+        projection: Optional[dict] = None,
+        reporting: bool = False
+    ) -> Dict[str, dict]:
+        """Fetch many documents in one $in query, keyed by str(_id)"""
+        object_ids = list({_object_id(i) for i in ids if i is not None})
+        if not object_ids:
+            return {}
+        cursor = self.collection(reporting).find({"_id": {"$in": object_ids}}, projection)
+        return {str(doc["_id"]): doc async for doc in cursor}
+
+    async def find_after(
+        self,
+        query: dict,
+        sort: List[Tuple[str, int]],
+        after: Optional[str] = None,
+        projection: Optional[dict] = None,
+        limit: int = 0
+    ):
+        """
+        Keyset pagination: cursor over documents matching query in sort
+        order, starting after the document whose id is `after`. sort must
+        end with _id so the order is total. limit=0 means no limit.
+        Raises ValueError if `after` is not an existing document.
+        """
+        if after is not None:
+            last = await self.get(after, {field: 1 for field, _ in sort})
+            if last is None:
+                raise ValueError(f"Unknown cursor: {after}")
+            query = {"$and": [query, _keyset_after(sort, last)]}
+        return self.collection().find(query, projection).sort(sort).limit(limit)
+
+class UsersRepository(Repository):
+    name = Collections.USERS
+
+    # Fields needed to show a user next to a record
+    SUMMARY = {"full_name": 1, "email": 1, "department": 1, "role": 1, "employee_id": 1, "avatar": 1}
+
+    def active(self, projection: Optional[dict] = None, department: Optional[str] = None, reporting: bool = False):
+        """Cursor over active users, optionally in one department"""
+        query = {"status": "ACTIVE"}
+        if department is not None:
+            query["department"] = department
+        return self.collection(reporting).find(query, projection)
+
+class DailyAttendanceRepository(Repository):
+    """
+    daily_attendance rollup: one document per (user_id, date) with the
+    day's check-in/check-out times, statuses and worked hours, kept up to
+    date on every check-in and check-out. date is "YYYY-MM-DD" (local).
+    Reports read this instead of re-deriving days from attendance_logs.
+    """
+    name = Collections.DAILY_ATTENDANCE
+
+    async def record_check_in(self, user_id: str, user_name: str, timestamp: datetime, status: str):
+        await self.collection().update_one(
+            {"user_id": user_id, "date": timestamp.strftime("%Y-%m-%d")},
+            {"$set": {
+                "user_name": user_name,
+                "check_in_time": timestamp,
+                "check_in_status": status,
+                "updated_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+
+    async def record_check_out(self, user_id: str, timestamp: datetime, status: str, total_hours: float):
+        await self.collection().update_one(
+            {"user_id": user_id, "date": timestamp.strftime("%Y-%m-%d")},
+            {"$set": {
+                "check_out_time": timestamp,
+                "check_out_status": status,
+                "total_hours": round(total_hours, 2),
+                "updated_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+
+    def for_user(self, user_id: str, start: date, end: date, projection: Optional[dict] = None, reporting: bool = False):
+        """A user's days between start and end (inclusive), oldest first"""
+        return self.collection(reporting).find(
+            {"user_id": user_id, "date": {"$gte": start.isoformat(), "$lte": end.isoformat()}},
+            projection
+        ).sort("date", 1)
+
+    async def count_checkins_by_user(
+        self,
+        start: date,
+        end: date,
+        reporting: bool = True
+    ) -> Dict[str, dict]:
+        """
+        Checked-in days per user between start and end (inclusive):
+        {user_id: {"total", "on_time", "late"}}. Served by the date index.
+        """
+        pipeline = [
+            {"$match": {
+                "date": {"$gte": start.isoformat(), "$lte": end.isoformat()},
+                "check_in_time": {"$ne": None}
+            }},
+            {"$group": {
+                "_id": "$user_id",
+                "total": {"$sum": 1},
+                "on_time": {"$sum": {"$cond": [{"$eq": ["$check_in_status", "ON_TIME"]}, 1, 0]}},
+                "late": {"$sum": {"$cond": [{"$eq": ["$check_in_status", "LATE"]}, 1, 0]}}
+            }}
+        ]
+        return {
+            row["_id"]: row
+            async for row in self.collection(reporting).aggregate(pipeline, allowDiskUse=True)
+        }
+
+    async def status_days_by_user(self, start: date, end: date, user_id: Optional[str] = None) -> List[dict]:
+        """
+        Attended days per user between start and end (inclusive), for payroll:
+        [{"_id": user_id, "dates": [...], "late": [...], "early": [...]}] with
+        one late/early-leave flag per date. A day counts as attended when
+        either its check-in or check-out has an attendance status.
+        """
+        def has_status(*statuses):
+            return {"$or": [
+                {"$in": [{"$ifNull": ["$check_in_status", None]}, list(statuses)]},
+                {"$in": [{"$ifNull": ["$check_out_status", None]}, list(statuses)]}
+            ]}
+        
+        attended = ["ON_TIME", "LATE", "EARLY_LEAVE"]
+        match = {
+            "date": {"$gte": start.isoformat(), "$lte": end.isoformat()},
+            "$or": [{"check_in_status": {"$in": attended}}, {"check_out_status": {"$in": attended}}]
+        }
+        if user_id is not None:
+            match["user_id"] = user_id
+        
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": "$user_id",
+                "dates": {"$push": "$date"},
+                "late": {"$push": has_status("LATE")},
+                "early": {"$push": has_status("EARLY_LEAVE")}
+            }}
+        ]
+        return await self.collection().aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+class LeavesRepository(Repository):
+    name = Collections.LEAVES
+
+    def in_year(self, year: int, reporting: bool = False):
+        """Leaves starting in a year (start_date is an ISO date string)"""
+        return self.collection(reporting).find({
+            "start_date": {"$gte": f"{year}-01-01", "$lte": f"{year}-12-31"}
+        })
+
+    async def approved_overlapping(self, start: date, end: date, user_id: Optional[str] = None) -> List[dict]:
+        """Approved leaves with at least one day between start and end"""
+        query = {
+            "status": "APPROVED",
+            "start_date": {"$lte": end.isoformat()},
+            "end_date": {"$gte": start.isoformat()}
+        }
+        if user_id is not None:
+            query["user_id"] = user_id
+        return await self.collection().find(
+            query,
+            {"user_id": 1, "leave_type": 1, "start_date": 1, "end_date": 1, "half_day": 1}
+        ).to_list(None)
+
+class OvertimeRepository(Repository):
+    name = Collections.OVERTIME
+
+    def approved_in_month(self, year: int, month: int, reporting: bool = False):
+        """Approved OT of a month (date is an ISO date string)"""
+        return self.collection(reporting).find({
+            "status": "APPROVED",
+            "date": {"$gte": f"{year}-{month:02d}-01", "$lte": f"{year}-{month:02d}-31"}
+        })
+
+    async def approved_hours_by_user(self, start: date, end: date, user_id: Optional[str] = None) -> Dict[str, float]:
+        """Approved OT hours per user between start and end (inclusive)"""
+        match = {"status": "APPROVED", "date": {"$gte": start.isoformat(), "$lte": end.isoformat()}}
+        if user_id is not None:
+            match["user_id"] = user_id
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": "$user_id", "hours": {"$sum": "$hours"}}}
+        ]
+        return {row["_id"]: row["hours"] async for row in self.collection().aggregate(pipeline)}
+
+class PayrollsRepository(Repository):
+    name = Collections.PAYROLLS
+
+class ProjectsRepository(Repository):
+    name = Collections.PROJECTS
+
+class TasksRepository(Repository):
+    name = Collections.TASKS
+
+    async def counts_by_assignee(self, assignee_ids: Optional[List[str]] = None) -> Dict[str, dict]:
+        """
+        Task counts per assignee from one $group:
+        {user_id: {"total", "completed", "in_progress"}}.
+        Limited to assignee_ids if given, otherwise every assigned task.
+        """
+        match = {"assigned_to": {"$in": assignee_ids} if assignee_ids is not None else {"$ne": None}}
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": "$assigned_to",
+                "total": {"$sum": 1},
+                "completed": {"$sum": {"$cond": [{"$eq": ["$status", "COMPLETED"]}, 1, 0]}},
+                "in_progress": {"$sum": {"$cond": [{"$eq": ["$status", "IN_PROGRESS"]}, 1, 0]}}
+            }}
+        ]
+        return {row["_id"]: row async for row in self.collection().aggregate(pipeline)}
+
+class MessagesRepository(Repository):
+    name = Collections.MESSAGES
+
+    async def unread_counts(self, user_id: str, cursors: Dict[str, Optional[ObjectId]]) -> Dict[str, int]:
+        """
+        Unread messages per conversation for one user: messages from others
+        after the user's read cursor (everything without one). One
+        aggregation; each conversation is an index range on
+        (conversation_id, _id). Messages the user saw before read cursors
+        existed (seen_by) are not counted.
+        """
+        if not cursors:
+            return {}
+        ranges = [
+            {"conversation_id": conversation_id, "_id": {"$gt": last_read_id}} if last_read_id else {"conversation_id": conversation_id}
+            for conversation_id, last_read_id in cursors.items()
+        ]
+        pipeline = [
+            {"$match": {"$or": ranges, "sender_id": {"$ne": user_id}, "seen_by": {"$ne": user_id}}},
+            {"$group": {"_id": "$conversation_id", "count": {"$sum": 1}}}
+        ]
+        return {row["_id"]: row["count"] async for row in self.collection().aggregate(pipeline)}
+
+class ReadCursorsRepository(Repository):
+    """
+    read_cursors: one document per (conversation_id, user_id) holding the
+    id of the last message the user has read. Everything up to it counts
+    as seen, so marking messages seen is one cursor update however many
+    messages or members a conversation has.
+    """
+    name = Collections.READ_CURSORS
+
+    async def advance_many(self, positions: Dict[Tuple[str, str], str]):
+        """Move (conversation_id, user_id) cursors forward to message ids (never back)"""
+        if not positions:
+            return
+        operations = [
+            UpdateOne(
+                {"conversation_id": conversation_id, "user_id": user_id},
+                {"$max": {"last_read_id": ObjectId(message_id)}, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+            for (conversation_id, user_id), message_id in positions.items()
+        ]
+        try:
+            await self.collection().bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Two upserts of a new cursor raced; $max makes a retry safe
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+            await self.collection().bulk_write([operations[error["index"]] for error in e.details["writeErrors"]], ordered=False)
+
+    async def for_conversation(self, conversation_id: str) -> Dict[str, ObjectId]:
+        """user_id -> last read message id, for every member with a cursor"""
+        cursor = self.collection().find({"conversation_id": conversation_id}, {"user_id": 1, "last_read_id": 1})
+        return {doc["user_id"]: doc["last_read_id"] async for doc in cursor}
+
+    async def for_user(self, user_id: str, conversation_ids: List[str]) -> Dict[str, ObjectId]:
+        """conversation_id -> last read message id, for one user"""
+        cursor = self.collection().find(
+            {"user_id": user_id, "conversation_id": {"$in": conversation_ids}},
+            {"conversation_id": 1, "last_read_id": 1}
+        )
+        return {doc["conversation_id"]: doc["last_read_id"] async for doc in cursor}
+
+    async def remove(self, conversation_id: str, user_id: Optional[str] = None):
+        """Drop a member's cursor, or every cursor of a deleted conversation"""
+        query = {"conversation_id": conversation_id}
+        if user_id is not None:
+            query["user_id"] = user_id
+        await self.collection().delete_many(query)
+
+# Singleton instances
+users_repo = UsersRepository()
+daily_attendance_repo = DailyAttendanceRepository()
+leaves_repo = LeavesRepository()
+overtime_repo = OvertimeRepository()
+payrolls_repo = PayrollsRepository()
+projects_repo = ProjectsRepository()
+tasks_repo = TasksRepository()
+messages_repo = MessagesRepository()
+read_cursors_repo = ReadCursorsRepository()
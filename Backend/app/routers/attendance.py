@@ -1,20 +1,39 @@
-from datetime import datetime, time
+from datetime import datetime, date, time
 from typing import List
 from fastapi import APIRouter, HTTPException, Depends
-from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING
 
-from ..database import get_attendance_collection, get_users_collection
+from ..database import Collections, get_attendance_collection, register_indexes
+from ..repositories import daily_attendance_repo, users_repo
 from ..models.attendance import (
     AttendanceLog, AttendanceCheckIn, AttendanceType, AttendanceStatus,
     LocationCheckRequest, LocationCheckResponse, DailyAttendanceSummary, GPSLocation
 )
 from ..models.user import UserStatus
-from ..services.face_recognition_service import face_service
+from ..services.face_template_cache import face_template_cache
+from ..services.face_worker_pool import face_worker_pool
 from ..services.geofencing_service import geofencing_service
+from ..services.export_jobs import export_jobs
 from .auth import get_current_user
 
 router = APIRouter(prefix="/api/attendance", tags=["Attendance"])
 
+register_indexes(
+    Collections.ATTENDANCE_LOGS,
+    # today's check-in / check-out lookups
+    IndexModel([("user_id", ASCENDING), ("attendance_type", ASCENDING), ("timestamp", ASCENDING)]),
+    # personal logs
+    IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)])
+)
+
+register_indexes(
+    Collections.DAILY_ATTENDANCE,
+    # one rollup document per user and day; monthly report, payroll
+    IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], unique=True),
+    # team report and exports over a month
+    IndexModel([("date", ASCENDING)])
+)
+
 # Work schedule (configurable)
 WORK_START_TIME = time(8, 30)  # 8:30 AM
 WORK_END_TIME = time(17, 30)   # 5:30 PM
@@ -87,18 +106,17 @@ async def check_in(
         raise HTTPException(status_code=400, detail=geo_message)
     
     # 2. Verify face
-    users_col = get_users_collection()
-    user = await users_col.find_one({"_id": ObjectId(current_user["_id"])})
+    face_template = await face_template_cache.get_template(current_user["_id"])
     
-    if not user.get("face_encodings"):
+    if face_template is None:
         raise HTTPException(
             status_code=400, 
             detail="Bạn chưa đăng ký khuôn mặt. Vui lòng hoàn tất đăng ký trước."
         )
     
-    is_match, confidence, face_message = face_service.verify_face(
+    is_match, confidence, face_message = await face_worker_pool.verify_face(
         data.face_image,
-        user["face_encodings"]
+        face_template
     )
     
     if not is_match:
@@ -119,7 +137,7 @@ async def check_in(
         raise HTTPException(status_code=400, detail="Bạn đã check-in hôm nay rồi")
     
     # 4. Save attendance image
-    image_path = face_service.save_attendance_image(
+    image_path = await face_worker_pool.save_attendance_image(
         current_user["_id"],
         data.face_image,
         "checkin"
@@ -145,6 +163,13 @@ async def check_in(
     }
     
     result = await attendance_col.insert_one(attendance_log)
+    await daily_attendance_repo.record_check_in(
+        current_user["_id"],
+        current_user.get("full_name", "Unknown"),
+        now,
+        status.value
+    )
+    await export_jobs.invalidate("attendance", now.year, now.month)
     
     status_text = "Đúng giờ ✓" if status == AttendanceStatus.ON_TIME else "Đi muộn ⚠"
     
@@ -176,15 +201,14 @@ async def check_out(
         raise HTTPException(status_code=400, detail=geo_message)
     
     # 2. Verify face
-    users_col = get_users_collection()
-    user = await users_col.find_one({"_id": ObjectId(current_user["_id"])})
+    face_template = await face_template_cache.get_template(current_user["_id"])
     
-    if not user.get("face_encodings"):
+    if face_template is None:
         raise HTTPException(status_code=400, detail="Bạn chưa đăng ký khuôn mặt")
     
-    is_match, confidence, face_message = face_service.verify_face(
+    is_match, confidence, face_message = await face_worker_pool.verify_face(
         data.face_image,
-        user["face_encodings"]
+        face_template
     )
     
     if not is_match:
@@ -223,7 +247,7 @@ async def check_out(
         raise HTTPException(status_code=400, detail="Bạn đã check-out hôm nay rồi")
     
     # 5. Save attendance image
-    image_path = face_service.save_attendance_image(
+    image_path = await face_worker_pool.save_attendance_image(
         current_user["_id"],
         data.face_image,
         "checkout"
@@ -254,6 +278,8 @@ async def check_out(
     }
     
     result = await attendance_col.insert_one(attendance_log)
+    await daily_attendance_repo.record_check_out(current_user["_id"], now, status.value, working_hours)
+    await export_jobs.invalidate("attendance", now.year, now.month)
     
     status_text = "Đúng giờ ✓" if status == AttendanceStatus.ON_TIME else "Về sớm ⚠"
     
@@ -300,33 +326,74 @@ async def get_attendance_logs(
     
     return result
 
+async def _fill_today_from_logs(user: dict, day: dict, now: datetime) -> dict:
+    """
+    Copy today's check-in/check-out from attendance_logs into the rollup
+    when it lacks them - the rollup write after the log failed, or the
+    backfill has not run yet - so /today agrees with the check-in/check-out
+    guards, which read the logs. Returns the day with the fields filled in.
+    """
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    today_end = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+    logs = await get_attendance_collection().find(
+        {"user_id": user["_id"], "timestamp": {"$gte": today_start, "$lte": today_end}},
+        {"attendance_type": 1, "status": 1, "timestamp": 1}
+    ).sort("timestamp", 1).to_list(None)
+    
+    checkin = next((log for log in logs if log["attendance_type"] == AttendanceType.CHECK_IN.value), None)
+    checkout = next((log for log in logs if log["attendance_type"] == AttendanceType.CHECK_OUT.value), None)
+    
+    day = dict(day)
+    if checkin and day.get("check_in_time") is None:
+        await daily_attendance_repo.record_check_in(
+            user["_id"], user.get("full_name", "Unknown"), checkin["timestamp"], checkin["status"]
+        )
+        day.update(check_in_time=checkin["timestamp"], check_in_status=checkin["status"])
+    if checkout and day.get("check_out_time") is None:
+        working_hours = (checkout["timestamp"] - checkin["timestamp"]).total_seconds() / 3600 if checkin else 0
+        await daily_attendance_repo.record_check_out(
+            user["_id"], checkout["timestamp"], checkout["status"], working_hours
+        )
+        day.update(check_out_time=checkout["timestamp"], check_out_status=checkout["status"])
+    return day
+
 @router.get("/today")
 async def get_today_status(current_user: dict = Depends(get_current_user)):
-    """Get today's attendance status for current user"""
-    attendance_col = get_attendance_collection()
+    """
+    Get today's attendance status for current user from the daily rollup,
+    completed from attendance_logs until the user has checked out
+    """
+    now = datetime.now()
+    day = await daily_attendance_repo.collection().find_one({
+        "user_id": current_user["_id"],
+        "date": now.strftime("%Y-%m-%d")
+    }) or {}
+    if day.get("check_out_time") is None:
+        day = await _fill_today_from_logs(current_user, day, now)
     
-    today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_end = datetime.now().replace(hour=23, minute=59, second=59, microsecond=999999)
+    checkin_time = day.get("check_in_time")
+    checkout_time = day.get("check_out_time")
     
-    checkin = await attendance_col.find_one({
-        "user_id": current_user["_id"],
-        "attendance_type": AttendanceType.CHECK_IN.value,
-        "timestamp": {"$gte": today_start, "$lte": today_end}
-    })
+    return {
+        "checked_in": checkin_time is not None,
+        "checked_out": checkout_time is not None,
+        "checkin_time": checkin_time.isoformat() if checkin_time else None,
+        "checkout_time": checkout_time.isoformat() if checkout_time else None,
+        "checkin_status": day.get("check_in_status"),
+        "checkout_status": day.get("check_out_status")
+    }
+
+@router.get("/face-pool/stats")
+async def get_face_pool_stats(current_user: dict = Depends(get_current_user)):
+    """Face worker pool occupancy and per-stage timing (Admin only)"""
+    from ..models.user import UserRole
     
-    checkout = await attendance_col.find_one({
-        "user_id": current_user["_id"],
-        "attendance_type": AttendanceType.CHECK_OUT.value,
-        "timestamp": {"$gte": today_start, "$lte": today_end}
-    })
+    if current_user.get("role") != UserRole.SUPER_ADMIN.value:
+        raise HTTPException(status_code=403, detail="Không có quyền truy cập")
     
     return {
-        "checked_in": checkin is not None,
-        "checked_out": checkout is not None,
-        "checkin_time": checkin["timestamp"].isoformat() if checkin else None,
-        "checkout_time": checkout["timestamp"].isoformat() if checkout else None,
-        "checkin_status": checkin["status"] if checkin else None,
-        "checkout_status": checkout["status"] if checkout else None
+        "pool": face_worker_pool.stats(),
+        "template_cache": face_template_cache.stats()
     }
 
 @router.get("/company-location")
@@ -343,31 +410,23 @@ async def get_monthly_report(
     """Get monthly attendance report for current user"""
     from calendar import monthrange
     
-    attendance_col = get_attendance_collection()
-    
-    # Build date range
-    first_day = datetime(year, month, 1)
-    last_day = datetime(year, month, monthrange(year, month)[1], 23, 59, 59)
-    
-    query = {
-        "user_id": current_user["_id"],
-        "timestamp": {"$gte": first_day, "$lte": last_day}
-    }
-    
-    logs = await attendance_col.find(query).sort("timestamp", 1).to_list(1000)
+    # One rollup document per day instead of every raw log
+    days = daily_attendance_repo.for_user(
+        current_user["_id"],
+        date(year, month, 1),
+        date(year, month, monthrange(year, month)[1]),
+        {"date": 1, "check_in_time": 1, "check_out_time": 1, "check_in_status": 1}
+    )
     
-    # Aggregate by day
     daily_data = {}
-    for log in logs:
-        day = log["timestamp"].strftime("%Y-%m-%d")
-        if day not in daily_data:
-            daily_data[day] = {"checkin": None, "checkout": None, "status": None}
-        
-        if log["attendance_type"] == "CHECK_IN":
-            daily_data[day]["checkin"] = log["timestamp"].strftime("%H:%M")
-            daily_data[day]["status"] = log["status"]
-        elif log["attendance_type"] == "CHECK_OUT":
-            daily_data[day]["checkout"] = log["timestamp"].strftime("%H:%M")
+    async for day in days:
+        checkin_time = day.get("check_in_time")
+        checkout_time = day.get("check_out_time")
+        daily_data[day["date"]] = {
+            "checkin": checkin_time.strftime("%H:%M") if checkin_time else None,
+            "checkout": checkout_time.strftime("%H:%M") if checkout_time else None,
+            "status": day.get("check_in_status")
+        }
     
     # Calculate statistics
     total_days = len(daily_data)
@@ -397,35 +456,33 @@ async def get_team_report(
     if current_user.get("role") not in [UserRole.SUPER_ADMIN.value, UserRole.HR_MANAGER.value, UserRole.LEADER.value]:
         raise HTTPException(status_code=403, detail="Không có quyền xem báo cáo team")
     
-    attendance_col = get_attendance_collection()
-    users_col = get_users_collection()
-    
     # Build date range
-    first_day = datetime(year, month, 1)
-    last_day = datetime(year, month, monthrange(year, month)[1], 23, 59, 59)
+    first_day = date(year, month, 1)
+    last_day = date(year, month, monthrange(year, month)[1])
     
     # Get all users (filter by department for Leaders)
-    user_query = {"status": "ACTIVE"}
+    # Read-only report - served from secondaries when available
+    department = None
     if current_user.get("role") == UserRole.LEADER.value:
-        user_query["department"] = current_user.get("department")
+        department = current_user.get("department")
     
-    users = await users_col.find(user_query).to_list(1000)
+    users = await users_repo.active(
+        {"full_name": 1, "department": 1},
+        department=department,
+        reporting=True
+    ).to_list(None)
     
-    # Get all attendance logs for the month
-    logs = await attendance_col.find({
-        "timestamp": {"$gte": first_day, "$lte": last_day},
-        "attendance_type": "CHECK_IN"
-    }).to_list(10000)
+    # Count check-ins per user and status on the server
+    counts = await daily_attendance_repo.count_checkins_by_user(first_day, last_day)
     
-    # Aggregate by user
+    # Join to users by id
+    empty = {"total": 0, "on_time": 0, "late": 0}
     user_stats = {}
     for user in users:
         user_id = str(user["_id"])
-        user_logs = [l for l in logs if l["user_id"] == user_id]
-        
-        on_time = sum(1 for l in user_logs if l["status"] == "ON_TIME")
-        late = sum(1 for l in user_logs if l["status"] == "LATE")
-        total = len(user_logs)
+        row = counts.get(user_id, empty)
+        total = row["total"]
+        on_time = row["on_time"]
         
         user_stats[user_id] = {
             "id": user_id,
@@ -433,7 +490,7 @@ async def get_team_report(
             "department": user.get("department"),
             "total_days": total,
             "on_time": on_time,
-            "late": late,
+            "late": row["late"],
             "on_time_rate": round(on_time / total * 100, 1) if total > 0 else 0
         }
     
@@ -441,8 +498,8 @@ async def get_team_report(
     sorted_stats = sorted(user_stats.values(), key=lambda x: x["on_time_rate"], reverse=True)
     
     # Calculate overall statistics
-    total_checkins = len(logs)
-    total_on_time = sum(1 for l in logs if l["status"] == "ON_TIME")
+    total_checkins = sum(row["total"] for row in counts.values())
+    total_on_time = sum(row["on_time"] for row in counts.values())
     
     return {
         "month": month,
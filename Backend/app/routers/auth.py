@@ -8,6 +8,7 @@ from bson import ObjectId
 from ..config import settings
 from ..database import get_users_collection
 from ..models.user import UserCreate, UserLogin, UserResponse, Token, UserStatus, UserRole
+from ..services.principal_cache import principal_cache
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 security = HTTPBearer()
@@ -26,9 +27,8 @@ def create_access_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Dependency to get current user from JWT token"""
-    token = credentials.credentials
+def decode_user_id(token: str) -> str:
+    """Return the user id (sub) of a valid JWT or raise 401"""
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
         user_id = payload.get("sub")
@@ -36,9 +36,37 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             raise HTTPException(status_code=401, detail="Invalid token")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    return user_id
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """
+    Dependency to get current user from JWT token.
+    Returns a minimal principal (_id, email, full_name, role, status,
+    department), served from a short-TTL cache when possible.
+    Use get_current_user_profile when the full document is needed.
+    """
+    token = credentials.credentials
+    user_id = decode_user_id(token)
+    
+    principal = principal_cache.get(user_id, token)
+    if principal is not None:
+        return principal
+    
+    users_col = get_users_collection()
+    user = await users_col.find_one({"_id": ObjectId(user_id)}, principal_cache.PROJECTION)
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    
+    user["_id"] = str(user["_id"])
+    principal_cache.put(user_id, token, user)
+    return user
+
+async def get_current_user_profile(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Dependency to get the current user's full profile document"""
+    user_id = decode_user_id(credentials.credentials)
     
     users_col = get_users_collection()
-    user = await users_col.find_one({"_id": ObjectId(user_id)})
+    user = await users_col.find_one({"_id": ObjectId(user_id)}, {"hashed_password": 0})
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
     
@@ -130,7 +158,7 @@ async def login(login_data: UserLogin):
     )
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(current_user: dict = Depends(get_current_user)):
+async def get_me(current_user: dict = Depends(get_current_user_profile)):
     """Get current user information"""
     return UserResponse(
         id=current_user["_id"],
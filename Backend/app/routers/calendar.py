@@ -3,24 +3,12 @@ from datetime import datetime, date
 from typing import Optional
 from bson import ObjectId
 
-from ..database import get_database
+from ..database import get_leaves_collection, get_tasks_collection, get_users_collection
 from .auth import get_current_user
 from ..models.user import UserRole
 
 router = APIRouter(prefix="/api/calendar", tags=["calendar"])
 
-def get_leaves_collection():
-    db = get_database()
-    return db["leaves"]
-
-def get_tasks_collection():
-    db = get_database()
-    return db["tasks"]
-
-def get_attendance_collection():
-    db = get_database()
-    return db["attendance"]
-
 @router.get("/events")
 async def get_calendar_events(
     month: int = Query(..., ge=1, le=12),
@@ -114,8 +102,7 @@ async def get_calendar_events(
         })
     
     # 3. Get birthdays (from users collection)
-    db = get_database()
-    users_col = db["users"]
+    users_col = get_users_collection()
     
     # Find users with birthdays in this month
     users = await users_col.find({
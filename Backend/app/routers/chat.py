@@ -2,20 +2,37 @@ from datetime import datetime
 from typing import List
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
 from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING
 import os
 import aiofiles
 
 from ..config import settings
-from ..database import get_conversations_collection, get_messages_collection, get_users_collection
+from ..database import Collections, get_conversations_collection, get_messages_collection, get_users_collection, register_indexes
 from ..models.chat import (
     Conversation, ConversationCreate, ConversationUpdate,
     Message, MessageCreate, MessageStatus, ConversationType
 )
 from ..models.user import UserStatus
+from ..repositories import messages_repo, read_cursors_repo
+from ..services.presence import presence
 from .auth import get_current_user
 
 router = APIRouter(prefix="/api/chat", tags=["Chat"])
 
+register_indexes(
+    Collections.MESSAGES,
+    IndexModel([("conversation_id", ASCENDING), ("_id", DESCENDING)])
+)
+register_indexes(
+    Collections.CONVERSATIONS,
+    IndexModel([("participants", ASCENDING), ("last_message_at", DESCENDING)])
+)
+register_indexes(
+    Collections.READ_CURSORS,
+    IndexModel([("conversation_id", ASCENDING), ("user_id", ASCENDING)], unique=True),
+    IndexModel([("user_id", ASCENDING), ("conversation_id", ASCENDING)])
+)
+
 @router.get("/conversations", response_model=List[dict])
 async def get_conversations(current_user: dict = Depends(get_current_user)):
     """Get all conversations for current user"""
@@ -29,10 +46,26 @@ async def get_conversations(current_user: dict = Depends(get_current_user)):
         "participants": current_user["_id"]
     }).sort("last_message_at", -1).to_list(100)
     
+    # Unread badges: one read-cursor lookup + one indexed range count
+    conversation_ids = [str(conv["_id"]) for conv in conversations]
+    cursors = await read_cursors_repo.for_user(current_user["_id"], conversation_ids)
+    unread = await messages_repo.unread_counts(
+        current_user["_id"],
+        {conversation_id: cursors.get(conversation_id) for conversation_id in conversation_ids}
+    )
+    
+    # Online dot for private chats: one presence lookup for all of them
+    private_peers = [
+        p for conv in conversations if conv["type"] == ConversationType.PRIVATE.value
+        for p in conv["participants"] if p != current_user["_id"]
+    ]
+    online = await presence.online(private_peers)
+    
     result = []
     for conv in conversations:
         # Get other participant info for private chats
         other_user = None
+        other_id = []
         if conv["type"] == ConversationType.PRIVATE.value:
             other_id = [p for p in conv["participants"] if p != current_user["_id"]]
             if other_id:
@@ -46,7 +79,8 @@ async def get_conversations(current_user: dict = Depends(get_current_user)):
             "participants": conv["participants"],
             "last_message": conv.get("last_message"),
             "last_message_at": conv.get("last_message_at"),
-            "unread_count": 0  # TODO: Calculate unread
+            "unread_count": unread.get(str(conv["_id"]), 0),
+            "is_online": bool(other_id) and other_id[0] in online
         })
     
     return result
@@ -128,8 +162,20 @@ async def get_messages(
     messages = await msg_col.find(query).sort("_id", -1).limit(limit).to_list(limit)
     messages.reverse()  # Oldest first
     
+    # A message is seen by every member whose read cursor is at or past it
+    cursors = await read_cursors_repo.for_conversation(conversation_id)
+    
     result = []
     for msg in messages:
+        seen_by = list(msg.get("seen_by", []))  # recorded before read cursors
+        seen_by += [
+            user_id for user_id, last_read_id in cursors.items()
+            if last_read_id >= msg["_id"] and user_id != msg["sender_id"] and user_id not in seen_by
+        ]
+        status = msg.get("status", MessageStatus.SENT.value)
+        if seen_by:
+            status = MessageStatus.SEEN.value
+        
         result.append({
             "id": str(msg["_id"]),
             "sender_id": msg["sender_id"],
@@ -139,9 +185,9 @@ async def get_messages(
             "message_type": msg.get("message_type", "text"),
             "file_url": None if msg.get("is_revoked") else msg.get("file_url"),
             "file_name": msg.get("file_name"),
-            "status": msg.get("status", MessageStatus.SENT.value),
+            "status": status,
             "is_revoked": msg.get("is_revoked", False),
-            "seen_by": msg.get("seen_by", []),
+            "seen_by": seen_by,
             "created_at": msg.get("created_at")
         })
     
@@ -268,6 +314,7 @@ async def remove_member(
             "$set": {"updated_at": datetime.utcnow()}
         }
     )
+    await read_cursors_repo.remove(conversation_id, member_id)
     
     return {"message": "Đã xóa thành viên"}
 
@@ -292,6 +339,7 @@ async def delete_conversation(
     if conv["type"] == ConversationType.GROUP.value and current_user["_id"] in conv.get("admin_ids", []):
         await msg_col.delete_many({"conversation_id": conversation_id})
         await conv_col.delete_one({"_id": ObjectId(conversation_id)})
+        await read_cursors_repo.remove(conversation_id)
         return {"message": "Đã xóa nhóm"}
     
     # Otherwise, just leave
@@ -299,5 +347,6 @@ async def delete_conversation(
         {"_id": ObjectId(conversation_id)},
         {"$pull": {"participants": current_user["_id"]}}
     )
+    await read_cursors_repo.remove(conversation_id, current_user["_id"])
     
     return {"message": "Đã rời khỏi cuộc trò chuyện"}
@@ -7,7 +7,7 @@ from enum import Enum
 import os
 import uuid
 
-from ..database import get_database
+from ..database import get_contracts_collection, get_users_collection
 from .auth import get_current_user
 from ..models.user import UserRole
 from .notifications import create_notification
@@ -34,10 +34,6 @@ class ContractCreate(BaseModel):
     position: str
     notes: str = ""
 
-def get_contracts_collection():
-    db = get_database()
-    return db["contracts"]
-
 # ================ ENDPOINTS ================
 
 @router.post("/")
@@ -50,8 +46,7 @@ async def create_contract(
         raise HTTPException(status_code=403, detail="Không có quyền tạo hợp đồng")
     
     contracts_col = get_contracts_collection()
-    db = get_database()
-    users_col = db["users"]
+    users_col = get_users_collection()
     
     # Get employee info
     employee = await users_col.find_one({"_id": ObjectId(data.employee_id)})
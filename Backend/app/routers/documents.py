@@ -8,7 +8,7 @@ import os
 import uuid
 import shutil
 
-from ..database import get_database
+from ..database import get_documents_collection
 from .auth import get_current_user
 from ..models.user import UserRole
 from .notifications import create_notification
@@ -27,10 +27,6 @@ class DocumentCategory(str, Enum):
 ALLOWED_EXTENSIONS = {'.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.txt', '.png', '.jpg', '.jpeg'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
-def get_documents_collection():
-    db = get_database()
-    return db["documents"]
-
 def get_safe_filename(filename: str) -> str:
     """Generate safe filename with UUID"""
     ext = os.path.splitext(filename)[1].lower()
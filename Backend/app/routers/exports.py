@@ -1,42 +1,74 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
-from fastapi.responses import StreamingResponse
-from datetime import datetime
-from io import BytesIO
+from fastapi.responses import StreamingResponse, FileResponse
 from typing import Optional
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from pydantic import BaseModel
+from pymongo import IndexModel, ASCENDING
+import os
 
-from ..database import get_database
+from ..database import Collections, register_indexes
 from .auth import get_current_user
 from ..models.user import UserRole
+from ..services.export_reports import (
+    ExportSheet, build_attendance_export, build_leaves_export, build_overtime_export,
+    REPORT_BUILDERS, MONTHLY_REPORTS
+)
+from ..services.export_jobs import export_jobs, ExportJobStatus
+from ..services.xlsx_stream import XLSX_MEDIA_TYPE
 
 router = APIRouter(prefix="/api/export", tags=["export"])
 
-def get_attendance_collection():
-    db = get_database()
-    return db["attendance"]
+register_indexes(
+    Collections.EXPORT_JOBS,
+    # One valid job per (report, year, month, scope) - concurrent submits share it
+    IndexModel(
+        [("report", ASCENDING), ("year", ASCENDING), ("month", ASCENDING), ("scope", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"valid": True}
+    )
+)
 
-def get_users_collection():
-    db = get_database()
-    return db["users"]
+# Who may export each report
+REPORT_ROLES = {
+    "attendance": [UserRole.SUPER_ADMIN.value, UserRole.HR_MANAGER.value],
+    "leaves": [UserRole.SUPER_ADMIN.value, UserRole.HR_MANAGER.value],
+    "overtime": [UserRole.SUPER_ADMIN.value, UserRole.HR_MANAGER.value, UserRole.ACCOUNTANT.value]
+}
 
-def get_leaves_collection():
-    db = get_database()
-    return db["leaves"]
+# Every report currently covers the whole company
+EXPORT_SCOPE = "company"
 
-def get_overtime_collection():
-    db = get_database()
-    return db["overtime"]
+class ExportJobRequest(BaseModel):
+    report: str
+    year: int
+    month: Optional[int] = None
 
-# Styling
-HEADER_FILL = PatternFill(start_color="4F46E5", end_color="4F46E5", fill_type="solid")
-HEADER_FONT = Font(bold=True, color="FFFFFF")
-BORDER = Border(
-    left=Side(style='thin'),
-    right=Side(style='thin'),
-    top=Side(style='thin'),
-    bottom=Side(style='thin')
-)
+def check_export_role(report: str, current_user: dict):
+    if current_user.get("role") not in REPORT_ROLES[report]:
+        raise HTTPException(status_code=403, detail="Không có quyền xuất báo cáo")
+
+def xlsx_response(sheet: ExportSheet) -> StreamingResponse:
+    """Stream a sheet to the client while its rows are still being read"""
+    return StreamingResponse(
+        sheet.writer.stream(sheet.rows, sheet.footer),
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename={sheet.filename}"}
+    )
+
+def serialize_job(job: dict) -> dict:
+    job_id = str(job["_id"])
+    return {
+        "id": job_id,
+        "report": job["report"],
+        "month": job.get("month"),
+        "year": job["year"],
+        "status": job["status"],
+        "filename": job.get("filename"),
+        "size": job.get("size"),
+        "error": job.get("error"),
+        "created_at": job["created_at"],
+        "finished_at": job.get("finished_at"),
+        "download_url": f"/api/export/jobs/{job_id}/download" if job["status"] == ExportJobStatus.DONE.value else None
+    }
 
 @router.get("/attendance")
 async def export_attendance(
@@ -45,91 +77,8 @@ async def export_attendance(
     current_user: dict = Depends(get_current_user)
 ):
     """Export attendance report to Excel"""
-    if current_user.get("role") not in [UserRole.SUPER_ADMIN.value, UserRole.HR_MANAGER.value]:
-        raise HTTPException(status_code=403, detail="Không có quyền xuất báo cáo")
-    
-    from calendar import monthrange
-    
-    attendance_col = get_attendance_collection()
-    users_col = get_users_collection()
-    
-    # Get all active users
-    users = await users_col.find({"status": "ACTIVE"}).to_list(1000)
-    
-    # Get attendance for the month
-    first_day = datetime(year, month, 1)
-    last_day = datetime(year, month, monthrange(year, month)[1], 23, 59, 59)
-    
-    attendance = await attendance_col.find({
-        "timestamp": {"$gte": first_day, "$lte": last_day},
-        "attendance_type": "CHECK_IN"
-    }).to_list(10000)
-    
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = f"Chấm công T{month}/{year}"
-    
-    # Headers
-    headers = ["STT", "Mã NV", "Họ tên", "Phòng ban", "Số ngày làm", "Đúng giờ", "Đi muộn", "Tỷ lệ %"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.fill = HEADER_FILL
-        cell.font = HEADER_FONT
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = BORDER
-    
-    # Data rows
-    row = 2
-    for idx, user in enumerate(users, 1):
-        user_id = str(user["_id"])
-        user_attendance = [a for a in attendance if a["user_id"] == user_id]
-        
-        on_time = sum(1 for a in user_attendance if a["status"] == "ON_TIME")
-        late = sum(1 for a in user_attendance if a["status"] == "LATE")
-        total = len(user_attendance)
-        rate = round(on_time / total * 100, 1) if total > 0 else 0
-        
-        data = [
-            idx,
-            user.get("employee_id", "N/A"),
-            user.get("full_name", "N/A"),
-            user.get("department", "N/A"),
-            total,
-            on_time,
-            late,
-            f"{rate}%"
-        ]
-        
-        for col, value in enumerate(data, 1):
-            cell = ws.cell(row=row, column=col, value=value)
-            cell.border = BORDER
-            cell.alignment = Alignment(horizontal='center')
-        
-        row += 1
-    
-    # Adjust column widths
-    ws.column_dimensions['A'].width = 8
-    ws.column_dimensions['B'].width = 12
-    ws.column_dimensions['C'].width = 25
-    ws.column_dimensions['D'].width = 20
-    ws.column_dimensions['E'].width = 12
-    ws.column_dimensions['F'].width = 12
-    ws.column_dimensions['G'].width = 12
-    ws.column_dimensions['H'].width = 12
-    
-    # Save to buffer
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
-    filename = f"attendance_{year}_{month:02d}.xlsx"
-    
-    return StreamingResponse(
-        buffer,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+    check_export_role("attendance", current_user)
+    return xlsx_response(await build_attendance_export(month, year))
 
 @router.get("/leaves")
 async def export_leaves(
@@ -137,62 +86,8 @@ async def export_leaves(
     current_user: dict = Depends(get_current_user)
 ):
     """Export leaves report to Excel"""
-    if current_user.get("role") not in [UserRole.SUPER_ADMIN.value, UserRole.HR_MANAGER.value]:
-        raise HTTPException(status_code=403, detail="Không có quyền xuất báo cáo")
-    
-    leaves_col = get_leaves_collection()
-    
-    # Get all leaves for the year
-    leaves = await leaves_col.find({
-        "start_date": {"$regex": f"^{year}"}
-    }).to_list(10000)
-    
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = f"Nghỉ phép {year}"
-    
-    # Headers
-    headers = ["STT", "Nhân viên", "Loại", "Từ ngày", "Đến ngày", "Số ngày", "Trạng thái", "Người duyệt"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.fill = HEADER_FILL
-        cell.font = HEADER_FONT
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = BORDER
-    
-    # Data rows
-    for idx, leave in enumerate(leaves, 1):
-        row = idx + 1
-        data = [
-            idx,
-            leave.get("user_name", "N/A"),
-            leave.get("leave_type", "N/A"),
-            leave.get("start_date", "N/A"),
-            leave.get("end_date", "N/A"),
-            leave.get("days", 0),
-            leave.get("status", "N/A"),
-            leave.get("approved_by", "")
-        ]
-        
-        for col, value in enumerate(data, 1):
-            cell = ws.cell(row=row, column=col, value=value)
-            cell.border = BORDER
-            cell.alignment = Alignment(horizontal='center')
-    
-    # Column widths
-    for i, width in enumerate([8, 25, 15, 12, 12, 10, 12, 20], 1):
-        ws.column_dimensions[chr(64 + i)].width = width
-    
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
-    return StreamingResponse(
-        buffer,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=leaves_{year}.xlsx"}
-    )
+    check_export_role("leaves", current_user)
+    return xlsx_response(await build_leaves_export(None, year))
 
 @router.get("/overtime")
 async def export_overtime(
@@ -201,65 +96,60 @@ async def export_overtime(
     current_user: dict = Depends(get_current_user)
 ):
     """Export overtime report to Excel"""
-    if current_user.get("role") not in [UserRole.SUPER_ADMIN.value, UserRole.HR_MANAGER.value, UserRole.ACCOUNTANT.value]:
-        raise HTTPException(status_code=403, detail="Không có quyền xuất báo cáo")
-    
-    ot_col = get_overtime_collection()
-    
-    # Get all approved OT for the month
-    date_pattern = f"{year}-{month:02d}"
-    ots = await ot_col.find({
-        "date": {"$regex": f"^{date_pattern}"},
-        "status": "APPROVED"
-    }).to_list(10000)
-    
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = f"OT T{month}/{year}"
-    
-    # Headers
-    headers = ["STT", "Nhân viên", "Phòng ban", "Ngày", "Từ", "Đến", "Số giờ", "Lý do"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.fill = HEADER_FILL
-        cell.font = HEADER_FONT
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = BORDER
-    
-    # Data rows
-    for idx, ot in enumerate(ots, 1):
-        row = idx + 1
-        data = [
-            idx,
-            ot.get("user_name", "N/A"),
-            ot.get("user_department", "N/A"),
-            ot.get("date", "N/A"),
-            ot.get("start_time", ""),
-            ot.get("end_time", ""),
-            ot.get("hours", 0),
-            ot.get("reason", "")
-        ]
-        
-        for col, value in enumerate(data, 1):
-            cell = ws.cell(row=row, column=col, value=value)
-            cell.border = BORDER
-            cell.alignment = Alignment(horizontal='center')
-    
-    # Add summary
-    total_row = len(ots) + 3
-    ws.cell(row=total_row, column=6, value="Tổng cộng:").font = Font(bold=True)
-    ws.cell(row=total_row, column=7, value=sum(o.get("hours", 0) for o in ots)).font = Font(bold=True)
-    
-    for i, width in enumerate([8, 25, 20, 12, 8, 8, 10, 30], 1):
-        ws.column_dimensions[chr(64 + i)].width = width
-    
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
-    return StreamingResponse(
-        buffer,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=overtime_{year}_{month:02d}.xlsx"}
-    )
+    check_export_role("overtime", current_user)
+    return xlsx_response(await build_overtime_export(month, year))
+
+# ================ BACKGROUND EXPORT JOBS ================
+
+@router.post("/jobs")
+async def create_export_job(
+    data: ExportJobRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Queue an export, or reuse the cached file if the data has not changed"""
+    if data.report not in REPORT_BUILDERS:
+        raise HTTPException(status_code=400, detail="Loại báo cáo không hợp lệ")
+    check_export_role(data.report, current_user)
+
+    month = data.month
+    if data.report in MONTHLY_REPORTS:
+        if month is None or not 1 <= month <= 12:
+            raise HTTPException(status_code=400, detail="Tháng không hợp lệ")
+    else:
+        month = None
+
+    job = await export_jobs.submit(data.report, month, data.year, EXPORT_SCOPE, current_user["_id"])
+    return serialize_job(job)
+
+@router.get("/jobs/{job_id}")
+async def get_export_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the status of an export job"""
+    job = await export_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Không tìm thấy yêu cầu xuất báo cáo")
+    check_export_role(job["report"], current_user)
+
+    return serialize_job(job)
+
+@router.get("/jobs/{job_id}/download")
+async def download_export_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Download the file of a finished export job"""
+    job = await export_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Không tìm thấy yêu cầu xuất báo cáo")
+    check_export_role(job["report"], current_user)
+
+    if job["status"] != ExportJobStatus.DONE.value:
+        raise HTTPException(status_code=409, detail="Báo cáo chưa được tạo xong")
+
+    path = export_jobs.file_path(job["file_hash"])
+    if not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="File báo cáo không còn, vui lòng tạo lại")
+
+    return FileResponse(path, media_type=XLSX_MEDIA_TYPE, filename=job["filename"])
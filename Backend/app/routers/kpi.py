@@ -5,7 +5,7 @@ from bson import ObjectId
 from pydantic import BaseModel
 from enum import Enum
 
-from ..database import get_database
+from ..database import get_kpi_collection, get_users_collection
 from .auth import get_current_user
 from ..models.user import UserRole
 from .notifications import create_notification
@@ -41,10 +41,6 @@ class KPIReviewUpdate(BaseModel):
     self_review: str = ""
     manager_feedback: str = ""
 
-def get_kpi_collection():
-    db = get_database()
-    return db["kpi_reviews"]
-
 # ================ ENDPOINTS ================
 
 @router.post("/")
@@ -62,8 +58,7 @@ async def create_kpi_review(
         target_employee_id = data.employee_id
         
         # Get employee info
-        db = get_database()
-        users_col = db["users"]
+        users_col = get_users_collection()
         employee = await users_col.find_one({"_id": ObjectId(target_employee_id)})
         if not employee:
             raise HTTPException(status_code=404, detail="Không tìm thấy nhân viên")
@@ -4,14 +4,22 @@ from typing import Optional, List
 from bson import ObjectId
 from pydantic import BaseModel
 from enum import Enum
+from pymongo import IndexModel, ASCENDING, DESCENDING
 
-from ..database import get_database
+from ..database import Collections, get_leaves_collection, get_users_collection, register_indexes
 from .auth import get_current_user
 from ..models.user import UserRole
 from .notifications import create_notification, create_notification_for_role
+from ..services.export_jobs import export_jobs
 
 router = APIRouter(prefix="/api/leaves", tags=["leaves"])
 
+register_indexes(
+    Collections.LEAVES,
+    IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    IndexModel([("status", ASCENDING), ("start_date", ASCENDING)])
+)
+
 # Enums
 class LeaveType(str, Enum):
     ANNUAL = "ANNUAL"          # Nghỉ phép năm
@@ -39,14 +47,6 @@ class LeaveRequest(BaseModel):
 class LeaveResponse(BaseModel):
     message: str
 
-def get_leaves_collection():
-    db = get_database()
-    return db["leaves"]
-
-def get_users_collection():
-    db = get_database()
-    return db["users"]
-
 # Helper function to calculate leave days
 def calculate_leave_days(start: date, end: date, half_day: bool = False) -> float:
     if half_day:
@@ -96,6 +96,7 @@ async def create_leave_request(
     }
     
     result = await leaves_col.insert_one(leave_doc)
+    await export_jobs.invalidate("leaves", data.start_date.year)
     
     # Notify HR and Leaders about new leave request
     await create_notification_for_role(
@@ -226,6 +227,7 @@ async def approve_leave(
             }
         }
     )
+    await export_jobs.invalidate("leaves", int(leave["start_date"][:4]))
     
     # Notify employee that their leave was approved
     await create_notification(
@@ -269,6 +271,7 @@ async def reject_leave(
             }
         }
     )
+    await export_jobs.invalidate("leaves", int(leave["start_date"][:4]))
     
     # Notify employee that their leave was rejected
     await create_notification(
@@ -308,6 +311,7 @@ async def cancel_leave(
             }
         }
     )
+    await export_jobs.invalidate("leaves", int(leave["start_date"][:4]))
     
     return {"message": "Đã hủy đơn xin nghỉ phép"}
 
@@ -2,14 +2,21 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from datetime import datetime
 from typing import Optional, List
 from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from pydantic import BaseModel
 from enum import Enum
 
-from ..database import get_database
+from ..database import Collections, get_notifications_collection, get_users_collection, register_indexes
 from .auth import get_current_user
 
 router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 
+register_indexes(
+    Collections.NOTIFICATIONS,
+    IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    IndexModel([("user_id", ASCENDING), ("read", ASCENDING)])
+)
+
 class NotificationType(str, Enum):
     LEAVE_REQUEST = "LEAVE_REQUEST"
     LEAVE_APPROVED = "LEAVE_APPROVED"
@@ -21,10 +28,6 @@ class NotificationType(str, Enum):
     ATTENDANCE_REMINDER = "ATTENDANCE_REMINDER"
     SYSTEM = "SYSTEM"
 
-def get_notifications_collection():
-    db = get_database()
-    return db["notifications"]
-
 # ================ ENDPOINTS ================
 
 @router.get("/")
@@ -144,8 +147,7 @@ async def create_notification_for_role(
     link: str = None
 ):
     """Create notifications for all users with a specific role"""
-    db = get_database()
-    users_col = db["users"]
+    users_col = get_users_collection()
     notifications_col = get_notifications_collection()
     
     cursor = users_col.find({"role": role, "status": "ACTIVE"})
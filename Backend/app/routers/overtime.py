@@ -4,14 +4,22 @@ from typing import Optional
 from bson import ObjectId
 from pydantic import BaseModel
 from enum import Enum
+from pymongo import IndexModel, ASCENDING
 
-from ..database import get_database
+from ..database import Collections, get_overtime_collection, get_users_collection, register_indexes
 from .auth import get_current_user
 from ..models.user import UserRole
 from .notifications import create_notification, create_notification_for_role
+from ..services.export_jobs import export_jobs
 
 router = APIRouter(prefix="/api/overtime", tags=["overtime"])
 
+register_indexes(
+    Collections.OVERTIME,
+    IndexModel([("user_id", ASCENDING), ("date", ASCENDING)]),
+    IndexModel([("status", ASCENDING), ("date", ASCENDING)])
+)
+
 class OTStatus(str, Enum):
     PENDING = "PENDING"
     APPROVED = "APPROVED"
@@ -28,10 +36,6 @@ class OTRequest(BaseModel):
 class OTResponse(BaseModel):
     message: str
 
-def get_ot_collection():
-    db = get_database()
-    return db["overtime"]
-
 def calculate_hours(start_time: str, end_time: str) -> float:
     """Calculate OT hours from time strings"""
     start = datetime.strptime(start_time, "%H:%M")
@@ -50,7 +54,7 @@ async def create_ot_request(
     if data.date < date.today():
         raise HTTPException(status_code=400, detail="Không thể đăng ký OT cho ngày đã qua")
     
-    ot_col = get_ot_collection()
+    ot_col = get_overtime_collection()
     
     # Check existing OT on same date
     existing = await ot_col.find_one({
@@ -99,7 +103,7 @@ async def get_my_ot(
     current_user: dict = Depends(get_current_user)
 ):
     """Get current user's OT requests"""
-    ot_col = get_ot_collection()
+    ot_col = get_overtime_collection()
     
     query = {"user_id": current_user["_id"]}
     if status:
@@ -145,7 +149,7 @@ async def get_pending_ot(
     if current_user.get("role") not in [UserRole.SUPER_ADMIN.value, UserRole.HR_MANAGER.value, UserRole.LEADER.value]:
         raise HTTPException(status_code=403, detail="Không có quyền xem")
     
-    ot_col = get_ot_collection()
+    ot_col = get_overtime_collection()
     
     query = {"status": OTStatus.PENDING.value}
     
@@ -180,7 +184,7 @@ async def approve_ot(
     if current_user.get("role") not in [UserRole.SUPER_ADMIN.value, UserRole.HR_MANAGER.value, UserRole.LEADER.value]:
         raise HTTPException(status_code=403, detail="Không có quyền duyệt")
     
-    ot_col = get_ot_collection()
+    ot_col = get_overtime_collection()
     
     ot = await ot_col.find_one({"_id": ObjectId(ot_id)})
     if not ot:
@@ -198,6 +202,9 @@ async def approve_ot(
             "updated_at": datetime.utcnow()
         }}
     )
+    # Only approved OT is exported, so approval is the only write that changes it
+    ot_date = datetime.strptime(ot["date"], "%Y-%m-%d")
+    await export_jobs.invalidate("overtime", ot_date.year, ot_date.month)
     
     # Notify employee
     await create_notification(
@@ -220,7 +227,7 @@ async def reject_ot(
     if current_user.get("role") not in [UserRole.SUPER_ADMIN.value, UserRole.HR_MANAGER.value, UserRole.LEADER.value]:
         raise HTTPException(status_code=403, detail="Không có quyền từ chối")
     
-    ot_col = get_ot_collection()
+    ot_col = get_overtime_collection()
     
     ot = await ot_col.find_one({"_id": ObjectId(ot_id)})
     if not ot:
@@ -257,7 +264,7 @@ async def cancel_ot(
     current_user: dict = Depends(get_current_user)
 ):
     """Cancel own OT request"""
-    ot_col = get_ot_collection()
+    ot_col = get_overtime_collection()
     
     ot = await ot_col.find_one({"_id": ObjectId(ot_id)})
     if not ot:
@@ -289,9 +296,8 @@ async def get_ot_stats(
     if current_user.get("role") not in [UserRole.SUPER_ADMIN.value, UserRole.HR_MANAGER.value, UserRole.ACCOUNTANT.value]:
         raise HTTPException(status_code=403, detail="Không có quyền xem thống kê")
     
-    ot_col = get_ot_collection()
-    db = get_database()
-    users_col = db["users"]
+    ot_col = get_overtime_collection()
+    users_col = get_users_collection()
     
     # Get all approved OT for the month
     date_pattern = f"{year}-{month:02d}"
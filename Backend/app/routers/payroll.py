@@ -1,19 +1,33 @@
+import json
 from datetime import datetime
-from typing import List
-from fastapi import APIRouter, HTTPException, Depends
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
 
-from ..database import get_payrolls_collection, get_users_collection
+from ..database import Collections, get_payrolls_collection, get_users_collection, register_indexes
 from ..models.payroll import (
-    Payroll, PayrollCalculateRequest, PayrollApprove, PayrollPay,
+    Payroll, PayrollCalculateRequest, PayrollRunRequest, PayrollApprove, PayrollPay,
     PayrollStatus, PayrollSummary, PayrollBonus
 )
 from ..models.user import UserRole, UserStatus
+from ..repositories import payrolls_repo
 from ..services.payroll_service import payroll_service
 from .auth import get_current_user
 
 router = APIRouter(prefix="/api/payroll", tags=["Payroll"])
 
+register_indexes(
+    Collections.PAYROLLS,
+    # One payroll per employee and month, also under concurrent /run and /calculate
+    IndexModel([("user_id", ASCENDING), ("month", ASCENDING), ("year", ASCENDING)], unique=True),
+    IndexModel([("year", DESCENDING), ("month", DESCENDING), ("status", ASCENDING)]),
+    IndexModel([("year", DESCENDING), ("month", DESCENDING), ("_id", DESCENDING)])
+)
+
 @router.post("/calculate")
 async def calculate_payroll(
     data: PayrollCalculateRequest,
@@ -50,7 +64,15 @@ async def calculate_payroll(
     
     # Save to database
     payroll_dict = payroll.dict()
-    result = await payrolls_col.insert_one(payroll_dict)
+    try:
+        result = await payrolls_col.insert_one(payroll_dict)
+    except DuplicateKeyError:
+        # A concurrent /calculate or /run inserted it after the check above
+        raise HTTPException(
+            status_code=400,
+            detail=f"Bảng lương tháng {data.month}/{data.year} đã tồn tại"
+        )
+    payroll_service.invalidate_summary(data.month, data.year)
     
     return {
         "id": str(result.inserted_id),
@@ -60,14 +82,101 @@ async def calculate_payroll(
         "bonuses": payroll.total_bonuses
     }
 
+@router.post("/run")
+async def run_payroll(
+    data: PayrollRunRequest,
+    stream: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Calculate payroll for all active employees of a month (HR/Admin only).
+    Uses each employee's base_salary. With stream=true, progress is sent as
+    NDJSON lines followed by a final "done" line with the summary.
+    """
+    if current_user.get("role") not in [UserRole.HR_MANAGER.value, UserRole.SUPER_ADMIN.value]:
+        raise HTTPException(status_code=403, detail="Không có quyền tính lương")
+    
+    events = payroll_service.run_payroll(data.month, data.year, overwrite=data.overwrite)
+    
+    if stream:
+        async def body():
+            async for event in events:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+    
+    async for event in events:
+        if event["event"] == "done":
+            done = event
+    
+    done.pop("event")
+    return {
+        "message": f"Đã tính lương cho {done['created'] + done['updated']} nhân viên",
+        **done
+    }
+
+# Page size of /list when paging with `after` and no `limit`
+LIST_PAGE_SIZE = 200
+
+# Newest month first; _id makes the order total for keyset pagination
+PAYROLL_LIST_SORT = [("year", DESCENDING), ("month", DESCENDING), ("_id", DESCENDING)]
+
+# Fields returned by /list
+PAYROLL_LIST_PROJECTION = {
+    "user_id": 1,
+    "user_name": 1,
+    "department": 1,
+    "month": 1,
+    "year": 1,
+    "base_salary": 1,
+    "total_deductions": 1,
+    "total_bonuses": 1,
+    "net_salary": 1,
+    "status": 1,
+    "actual_working_days": 1,
+    "total_working_days": 1,
+    "late_days": 1,
+    "created_at": 1
+}
+
+def _payroll_list_item(p: dict) -> dict:
+    return {
+        "id": str(p["_id"]),
+        "user_id": p["user_id"],
+        "user_name": p["user_name"],
+        "department": p.get("department"),
+        "month": p["month"],
+        "year": p["year"],
+        "base_salary": p["base_salary"],
+        "total_deductions": p["total_deductions"],
+        "total_bonuses": p["total_bonuses"],
+        "net_salary": p["net_salary"],
+        "status": p["status"],
+        "working_days": f"{p['actual_working_days']}/{p['total_working_days']}",
+        "late_days": p.get("late_days", 0),
+        "created_at": p.get("created_at")
+    }
+
 @router.get("/list", response_model=List[dict])
 async def get_payrolls(
+    response: Response,
     month: int = None,
     year: int = None,
     status: str = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    after: str = None,
+    include_total: bool = False,
+    stream: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get payroll list (HR/Accountant/Admin)"""
+    """
+    Get payroll list, newest month first (HR/Accountant/Admin).
+    Pass the id of the last payroll received as `after` to get the next page
+    (pages of `limit`, default 200); without limit or after every
+    matching payroll is returned, as before paging existed.
+    include_total=true adds the number of matching payrolls in X-Total-Count.
+    stream=true returns every matching payroll (after `after`) as NDJSON.
+    """
     if current_user.get("role") not in [
         UserRole.HR_MANAGER.value, 
         UserRole.ACCOUNTANT.value, 
@@ -75,8 +184,6 @@ async def get_payrolls(
     ]:
         raise HTTPException(status_code=403, detail="Không có quyền xem bảng lương")
     
-    payrolls_col = get_payrolls_collection()
-    
     query = {}
     if month:
         query["month"] = month
@@ -85,28 +192,29 @@ async def get_payrolls(
     if status:
         query["status"] = status
     
-    payrolls = await payrolls_col.find(query).sort([("year", -1), ("month", -1)]).to_list(None)
+    try:
+        cursor = await payrolls_repo.find_after(
+            query,
+            PAYROLL_LIST_SORT,
+            after,
+            PAYROLL_LIST_PROJECTION,
+            limit=0 if stream else (limit or (LIST_PAGE_SIZE if after else 0))
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Tham số after không hợp lệ")
     
-    result = []
-    for p in payrolls:
-        result.append({
-            "id": str(p["_id"]),
-            "user_id": p["user_id"],
-            "user_name": p["user_name"],
-            "department": p.get("department"),
-            "month": p["month"],
-            "year": p["year"],
-            "base_salary": p["base_salary"],
-            "total_deductions": p["total_deductions"],
-            "total_bonuses": p["total_bonuses"],
-            "net_salary": p["net_salary"],
-            "status": p["status"],
-            "working_days": f"{p['actual_working_days']}/{p['total_working_days']}",
-            "late_days": p.get("late_days", 0),
-            "created_at": p.get("created_at")
-        })
+    if stream:
+        async def body():
+            async for p in cursor:
+                yield json.dumps(jsonable_encoder(_payroll_list_item(p)), ensure_ascii=False) + "\n"
+        
+        return StreamingResponse(body(), media_type="application/x-ndjson")
     
-    return result
+    if include_total:
+        total = await payrolls_repo.collection().count_documents(query)
+        response.headers["X-Total-Count"] = str(total)
+    
+    return [_payroll_list_item(p) async for p in cursor]
 
 @router.get("/my-payroll", response_model=List[dict])
 async def get_my_payroll(
@@ -175,6 +283,8 @@ async def get_payroll_detail(
         "late_days": payroll.get("late_days", 0),
         "early_leave_days": payroll.get("early_leave_days", 0),
         "absent_days": payroll.get("absent_days", 0),
+        "leave_days": payroll.get("leave_days", 0),
+        "overtime_hours": payroll.get("overtime_hours", 0),
         "base_salary": payroll["base_salary"],
         "deductions": payroll.get("deductions", []),
         "bonuses": payroll.get("bonuses", []),
@@ -211,6 +321,8 @@ async def approve_payrolls(
             "approved_at": datetime.utcnow()
         }}
     )
+    # The approved payrolls may span several months
+    payroll_service.invalidate_summary()
     
     return {
         "message": f"Đã duyệt {result.modified_count} bảng lương",
@@ -249,6 +361,7 @@ async def pay_payroll(
             "payment_method": data.payment_method
         }}
     )
+    payroll_service.invalidate_summary(payroll["month"], payroll["year"])
     
     return {
         "message": "Đã thanh toán thành công",
@@ -300,31 +413,4 @@ async def get_payroll_summary(
     ]:
         raise HTTPException(status_code=403, detail="Không có quyền xem tổng hợp")
     
-    payrolls_col = get_payrolls_collection()
-    
-    payrolls = await payrolls_col.find({
-        "month": month,
-        "year": year
-    }).to_list(None)
-    
-    total_gross = sum(p["base_salary"] for p in payrolls)
-    total_deductions = sum(p["total_deductions"] for p in payrolls)
-    total_bonuses = sum(p["total_bonuses"] for p in payrolls)
-    total_net = sum(p["net_salary"] for p in payrolls)
-    
-    draft_count = len([p for p in payrolls if p["status"] == PayrollStatus.DRAFT.value])
-    approved_count = len([p for p in payrolls if p["status"] == PayrollStatus.APPROVED.value])
-    paid_count = len([p for p in payrolls if p["status"] == PayrollStatus.PAID.value])
-    
-    return PayrollSummary(
-        month=month,
-        year=year,
-        total_employees=len(payrolls),
-        total_gross_salary=total_gross,
-        total_deductions=total_deductions,
-        total_bonuses=total_bonuses,
-        total_net_salary=total_net,
-        draft_count=draft_count,
-        approved_count=approved_count,
-        paid_count=paid_count
-    )
+    return await payroll_service.get_summary(month, year)
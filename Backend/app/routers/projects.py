@@ -2,17 +2,30 @@ from datetime import datetime
 from typing import List, Optional
 from fastapi import APIRouter, HTTPException, Depends
 from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING
 
-from ..database import get_projects_collection, get_tasks_collection, get_users_collection
+from ..database import Collections, get_projects_collection, get_tasks_collection, register_indexes
 from ..models.project import (
     Project, ProjectCreate, ProjectStatus,
     Task, TaskCreate, TaskStatus, TaskAccept, TaskProgressUpdate
 )
 from ..models.user import UserRole, UserStatus
+from ..loaders import RequestLoaders, get_loaders
+from ..services.performance_stats import performance_stats
 from .auth import get_current_user
 
 router = APIRouter(prefix="/api/projects", tags=["Projects"])
 
+register_indexes(
+    Collections.TASKS,
+    IndexModel([("project_id", ASCENDING)]),
+    IndexModel([("assigned_to", ASCENDING), ("status", ASCENDING)])
+)
+register_indexes(
+    Collections.PROJECTS,
+    IndexModel([("team_members", ASCENDING), ("created_at", DESCENDING)])
+)
+
 # ============ PROJECT ENDPOINTS ============
 
 @router.get("/", response_model=List[dict])
@@ -85,12 +98,12 @@ async def create_project(
 @router.get("/{project_id}", response_model=dict)
 async def get_project(
     project_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    loaders: RequestLoaders = Depends(get_loaders)
 ):
     """Get project details"""
     projects_col = get_projects_collection()
     tasks_col = get_tasks_collection()
-    users_col = get_users_collection()
     
     project = await projects_col.find_one({"_id": ObjectId(project_id)})
     if not project:
@@ -98,21 +111,17 @@ async def get_project(
     
     # Get team member details
     team_members = []
-    for member_id in project.get("team_members", []):
-        try:
-            user = await users_col.find_one({"_id": ObjectId(member_id)})
-            if user:
-                team_members.append({
-                    "id": str(user["_id"]),
-                    "full_name": user.get("full_name"),
-                    "avatar": user.get("avatar"),
-                    "position": user.get("position")
-                })
-        except:
-            pass
+    for user in await loaders.users.load_many(project.get("team_members", [])):
+        if user:
+            team_members.append({
+                "id": str(user["_id"]),
+                "full_name": user.get("full_name"),
+                "avatar": user.get("avatar"),
+                "position": user.get("position")
+            })
     
     # Get task statistics
-    tasks = await tasks_col.find({"project_id": project_id}).to_list(None)
+    tasks = await tasks_col.find({"project_id": project_id}, {"status": 1}).to_list(None)
     task_stats = {
         "total": len(tasks),
         "completed": len([t for t in tasks if t.get("status") == TaskStatus.COMPLETED.value]),
@@ -189,31 +198,27 @@ class MemberIds(PydanticModel):
 @router.get("/{project_id}/members", response_model=list)
 async def get_project_members(
     project_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    loaders: RequestLoaders = Depends(get_loaders)
 ):
     """Get all members of a project"""
     projects_col = get_projects_collection()
-    users_col = get_users_collection()
     
-    project = await projects_col.find_one({"_id": ObjectId(project_id)})
+    project = await projects_col.find_one({"_id": ObjectId(project_id)}, {"team_members": 1})
     if not project:
         raise HTTPException(status_code=404, detail="Không tìm thấy dự án")
     
     members = []
-    for member_id in project.get("team_members", []):
-        try:
-            user = await users_col.find_one({"_id": ObjectId(member_id)})
-            if user:
-                members.append({
-                    "id": str(user["_id"]),
-                    "full_name": user.get("full_name"),
-                    "email": user.get("email"),
-                    "avatar": user.get("avatar"),
-                    "position": user.get("position"),
-                    "department": user.get("department")
-                })
-        except:
-            pass
+    for user in await loaders.users.load_many(project.get("team_members", [])):
+        if user:
+            members.append({
+                "id": str(user["_id"]),
+                "full_name": user.get("full_name"),
+                "email": user.get("email"),
+                "avatar": user.get("avatar"),
+                "position": user.get("position"),
+                "department": user.get("department")
+            })
     
     return members
 
@@ -275,6 +280,7 @@ async def delete_project(
     
     # Delete all tasks in project
     await tasks_col.delete_many({"project_id": project_id})
+    performance_stats.invalidate()
     
     # Delete project
     await projects_col.delete_one({"_id": ObjectId(project_id)})
@@ -288,11 +294,11 @@ async def get_project_tasks(
     project_id: str,
     status: str = None,
     assigned_to: str = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    loaders: RequestLoaders = Depends(get_loaders)
 ):
     """Get all tasks in a project"""
     tasks_col = get_tasks_collection()
-    users_col = get_users_collection()
     
     query = {"project_id": project_id}
     if status:
@@ -302,20 +308,22 @@ async def get_project_tasks(
     
     tasks = await tasks_col.find(query).sort("created_at", -1).to_list(None)
     
+    # All assignees in one query
+    assignees = await loaders.users.load_many(
+        [t["assigned_to"] for t in tasks if t.get("assigned_to")]
+    )
+    users = {str(u["_id"]): u for u in assignees if u}
+    
     result = []
     for task in tasks:
         assignee = None
-        if task.get("assigned_to"):
-            try:
-                user = await users_col.find_one({"_id": ObjectId(task["assigned_to"])})
-                if user:
-                    assignee = {
-                        "id": str(user["_id"]),
-                        "full_name": user.get("full_name"),
-                        "avatar": user.get("avatar")
-                    }
-            except:
-                pass
+        user = users.get(task.get("assigned_to"))
+        if user:
+            assignee = {
+                "id": str(user["_id"]),
+                "full_name": user.get("full_name"),
+                "avatar": user.get("avatar")
+            }
         
         result.append({
             "id": str(task["_id"]),
@@ -362,6 +370,7 @@ async def create_task(
     }
     
     result = await tasks_col.insert_one(task)
+    performance_stats.invalidate()
     
     # TODO: Send notification to assigned user
     
@@ -373,11 +382,11 @@ async def create_task(
 @router.get("/tasks/my-tasks", response_model=List[dict])
 async def get_my_tasks(
     status: str = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    loaders: RequestLoaders = Depends(get_loaders)
 ):
     """Get tasks assigned to current user"""
     tasks_col = get_tasks_collection()
-    projects_col = get_projects_collection()
     
     query = {"assigned_to": current_user["_id"]}
     if status:
@@ -385,10 +394,11 @@ async def get_my_tasks(
     
     tasks = await tasks_col.find(query).sort("deadline", 1).to_list(None)
     
+    # All projects in one query
+    projects = await loaders.projects.load_many(t["project_id"] for t in tasks)
+    
     result = []
-    for task in tasks:
-        project = await projects_col.find_one({"_id": ObjectId(task["project_id"])})
-        
+    for task, project in zip(tasks, projects):
         result.append({
             "id": str(task["_id"]),
             "title": task["title"],
@@ -407,33 +417,28 @@ async def get_my_tasks(
 @router.get("/tasks/{task_id}")
 async def get_task(
     task_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    loaders: RequestLoaders = Depends(get_loaders)
 ):
     """Get single task details"""
     tasks_col = get_tasks_collection()
-    users_col = get_users_collection()
-    projects_col = get_projects_collection()
     
     task = await tasks_col.find_one({"_id": ObjectId(task_id)})
     if not task:
         raise HTTPException(status_code=404, detail="Không tìm thấy task")
     
-    # Get assignee info
+    # Assignee and project are fetched concurrently
+    project = loaders.projects.load(task["project_id"])
+    user = await loaders.users.load(task["assigned_to"]) if task.get("assigned_to") else None
+    project = await project
+    
     assignee = None
-    if task.get("assigned_to"):
-        try:
-            user = await users_col.find_one({"_id": ObjectId(task["assigned_to"])})
-            if user:
-                assignee = {
-                    "id": str(user["_id"]),
-                    "full_name": user.get("full_name"),
-                    "avatar": user.get("avatar")
-                }
-        except:
-            pass
-    
-    # Get project info
-    project = await projects_col.find_one({"_id": ObjectId(task["project_id"])})
+    if user:
+        assignee = {
+            "id": str(user["_id"]),
+            "full_name": user.get("full_name"),
+            "avatar": user.get("avatar")
+        }
     
     return {
         "id": str(task["_id"]),
@@ -504,6 +509,8 @@ async def update_task(
         {"_id": ObjectId(task_id)},
         {"$set": update_doc}
     )
+    if "status" in update_doc:
+        performance_stats.invalidate()
     
     return {"message": "Cập nhật task thành công"}
 
@@ -522,6 +529,7 @@ async def delete_task(
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Không tìm thấy task")
+    performance_stats.invalidate()
     
     return {"message": "Đã xóa task"}
 
@@ -556,6 +564,7 @@ async def respond_to_task(
                 "updated_at": datetime.utcnow()
             }}
         )
+        performance_stats.invalidate()
         return {"message": "Đã nhận việc"}
     else:
         # Reject task
@@ -572,6 +581,7 @@ async def respond_to_task(
                 "updated_at": datetime.utcnow()
             }}
         )
+        performance_stats.invalidate()
         
         # TODO: Notify leader
         
@@ -610,6 +620,7 @@ async def update_task_progress(
             "updated_at": datetime.utcnow()
         }}
     )
+    performance_stats.invalidate()
     
     return {
         "message": f"Cập nhật tiến độ: {data.progress}%",
@@ -618,47 +629,20 @@ async def update_task_progress(
 
 @router.get("/stats/employee-performance")
 async def get_employee_performance(
+    department: str = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get task completion statistics per employee (Leader/Admin only)"""
+    """
+    Get task completion statistics per employee (Leader/Admin only).
+    Leaders see their own department; HR/Admin can filter by department.
+    """
     if current_user.get("role") not in [UserRole.LEADER.value, UserRole.HR_MANAGER.value, UserRole.SUPER_ADMIN.value]:
         raise HTTPException(status_code=403, detail="Không có quyền xem thống kê")
     
-    tasks_col = get_tasks_collection()
-    users_col = get_users_collection()
-    
-    # Get all employees
-    employees = await users_col.find({"role": UserRole.EMPLOYEE.value}).to_list(None)
-    
-    result = []
-    for emp in employees:
-        emp_id = str(emp["_id"])
-        
-        # Get task counts
-        total_tasks = await tasks_col.count_documents({"assigned_to": emp_id})
-        completed_tasks = await tasks_col.count_documents({
-            "assigned_to": emp_id,
-            "status": TaskStatus.COMPLETED.value
-        })
-        in_progress = await tasks_col.count_documents({
-            "assigned_to": emp_id,
-            "status": TaskStatus.IN_PROGRESS.value
-        })
-        
-        completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
-        
-        result.append({
-            "user_id": emp_id,
-            "full_name": emp.get("full_name", "Unknown"),
-            "avatar": emp.get("avatar"),
-            "department": emp.get("department"),
-            "total_tasks": total_tasks,
-            "completed_tasks": completed_tasks,
-            "in_progress_tasks": in_progress,
-            "completion_rate": round(completion_rate, 1)
-        })
-    
-    # Sort by completion rate
-    result.sort(key=lambda x: x["completion_rate"], reverse=True)
+    if current_user.get("role") == UserRole.LEADER.value:
+        if not current_user.get("department"):
+            # A leader without a department leads no one - never fall back to company-wide stats
+            return []
+        return await performance_stats.get("department", current_user["department"])
     
-    return result
+    return await performance_stats.get("company", department)
@@ -1,20 +1,16 @@
-from datetime import datetime
+from datetime import date, datetime
 from fastapi import APIRouter, HTTPException, Depends
-from ..database import get_database
+from ..database import get_database, get_settings_collection, INDEX_REGISTRY, pool_metrics
 from ..models.settings import CompanySettings, CompanySettingsUpdate
 from ..config import settings as app_settings
 from .auth import get_current_user
 
 router = APIRouter(prefix="/api/settings", tags=["Settings"])
 
-async def get_settings_collection():
-    db = get_database()
-    return db["settings"]
-
 @router.get("/company", response_model=CompanySettings)
 async def get_company_settings(current_user: dict = Depends(get_current_user)):
     """Get current company settings (any authenticated user)"""
-    settings_col = await get_settings_collection()
+    settings_col = get_settings_collection()
     settings = await settings_col.find_one({"type": "company"})
     
     if not settings:
@@ -41,6 +37,7 @@ async def get_company_settings(current_user: dict = Depends(get_current_user)):
         work_end_time=settings.get("work_end_time", "17:00"),
         late_threshold_minutes=settings.get("late_threshold_minutes", 15),
         early_leave_threshold_minutes=settings.get("early_leave_threshold_minutes", 30),
+        holidays=settings.get("holidays", []),
         updated_at=settings.get("updated_at"),
         updated_by=settings.get("updated_by")
     )
@@ -54,12 +51,18 @@ async def update_company_settings(
     if current_user.get("role") != "SUPER_ADMIN":
         raise HTTPException(status_code=403, detail="Chỉ Super Admin mới có thể thay đổi cấu hình công ty")
     
-    settings_col = await get_settings_collection()
+    settings_col = get_settings_collection()
     
     # Get existing settings or create new
     existing = await settings_col.find_one({"type": "company"})
     
     update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
+    
+    if "holidays" in update_dict:
+        try:
+            update_dict["holidays"] = sorted({date.fromisoformat(d).isoformat() for d in update_dict["holidays"]})
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Ngày nghỉ lễ phải có dạng YYYY-MM-DD")
     update_dict["updated_at"] = datetime.utcnow()
     update_dict["updated_by"] = current_user.get("full_name", current_user.get("email"))
     update_dict["type"] = "company"
@@ -82,6 +85,7 @@ async def update_company_settings(
             "work_end_time": "17:00",
             "late_threshold_minutes": 15,
             "early_leave_threshold_minutes": 30,
+            "holidays": [],
             **update_dict
         }
         await settings_col.insert_one(new_settings)
@@ -92,7 +96,7 @@ async def update_company_settings(
 @router.get("/company/location")
 async def get_company_location():
     """Get company location for geofencing (public endpoint)"""
-    settings_col = await get_settings_collection()
+    settings_col = get_settings_collection()
     settings = await settings_col.find_one({"type": "company"})
     
     if settings:
@@ -111,3 +115,37 @@ async def get_company_location():
         "company_name": "GoodZWork",
         "address": None
     }
+
+@router.get("/indexes")
+async def get_index_stats(current_user: dict = Depends(get_current_user)):
+    """Usage of every registered collection's indexes via $indexStats (SUPER_ADMIN only)"""
+    if current_user.get("role") != "SUPER_ADMIN":
+        raise HTTPException(status_code=403, detail="Chỉ Super Admin mới có thể xem thống kê index")
+    
+    db = get_database()
+    result = {}
+    for collection_name in sorted(INDEX_REGISTRY):
+        stats = await db[collection_name].aggregate([{"$indexStats": {}}]).to_list(None)
+        result[collection_name] = [
+            {
+                "name": s["name"],
+                "key": s["key"],
+                "ops": s["accesses"]["ops"],
+                "since": s["accesses"]["since"],
+                "host": s.get("host")
+            }
+            for s in sorted(stats, key=lambda s: s["accesses"]["ops"], reverse=True)
+        ]
+    
+    return result
+
+@router.get("/db-pool")
+async def get_db_pool_metrics(current_user: dict = Depends(get_current_user)):
+    """MongoDB connection pool checkouts and wait times (SUPER_ADMIN only)"""
+    if current_user.get("role") != "SUPER_ADMIN":
+        raise HTTPException(status_code=403, detail="Chỉ Super Admin mới có thể xem thống kê kết nối")
+    
+    return {
+        **pool_metrics.snapshot(),
+        "report_read_preference": app_settings.MONGODB_REPORT_READ_PREFERENCE
+    }
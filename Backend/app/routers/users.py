@@ -1,19 +1,31 @@
 from datetime import datetime
-from typing import List
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query, Response
+from fastapi.encoders import jsonable_encoder
 from bson import ObjectId
+from pymongo import IndexModel, ASCENDING
 
-from ..database import get_users_collection
+from ..database import Collections, get_users_collection, register_indexes
 from ..models.user import UserResponse, UserProfileUpdate, UserStatus, UserRole
-from ..services.face_recognition_service import face_service
-from .auth import get_current_user
+from ..repositories import users_repo
+from ..services.face_worker_pool import face_worker_pool, FaceWorkerPoolBusy
+from ..services.face_template_cache import face_template_cache
+from ..services.principal_cache import principal_cache
+from .auth import get_current_user, get_current_user_profile
 
 router = APIRouter(prefix="/api/users", tags=["Users"])
 
+register_indexes(
+    Collections.USERS,
+    IndexModel([("email", ASCENDING)], unique=True),
+    IndexModel([("status", ASCENDING), ("department", ASCENDING)]),
+    IndexModel([("role", ASCENDING)])
+)
+
 @router.put("/profile")
 async def update_profile(
     profile_data: UserProfileUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user_profile)
 ):
     """
     Update user profile (Force Update flow for INIT users).
@@ -58,6 +70,7 @@ async def update_profile(
         {"_id": ObjectId(current_user["_id"])},
         {"$set": update_data}
     )
+    principal_cache.invalidate(current_user["_id"])
     
     return {
         "message": "Cập nhật hồ sơ thành công",
@@ -70,7 +83,7 @@ import uuid
 from ..config import settings as settings_config
 
 @router.get("/me")
-async def get_current_profile(current_user: dict = Depends(get_current_user)):
+async def get_current_profile(current_user: dict = Depends(get_current_user_profile)):
     """Get current user's full profile"""
     return {
         "id": current_user["_id"],
@@ -157,19 +170,45 @@ async def change_password(
     
     return {"message": "Đổi mật khẩu thành công"}
 
+import json
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 class FaceEnrollRequest(BaseModel):
     face_images: List[str]
 
+def _enrollment_stream(events, on_success) -> StreamingResponse:
+    """
+    Stream enrollment progress as NDJSON: one line per processed image,
+    then a final "done" line once the encodings have been saved.
+    """
+    async def body():
+        try:
+            async for event in events:
+                if event["event"] == "done":
+                    done = {"event": "done", "success": event["success"], "message": event["message"]}
+                    if event["success"]:
+                        done.update(await on_success(event["encodings"]))
+                    yield json.dumps(done, ensure_ascii=False) + "\n"
+                else:
+                    yield json.dumps(event) + "\n"
+        except FaceWorkerPoolBusy:
+            # The pool filled up between the up-front check and the first image
+            done = {"event": "done", "success": False, "message": "Hệ thống nhận diện khuôn mặt đang quá tải, vui lòng thử lại sau giây lát"}
+            yield json.dumps(done, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
 @router.post("/enroll-face")
 async def enroll_face(
     request: FaceEnrollRequest,
+    stream: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
     """
     Enroll face with images for AI training.
     After successful enrollment, status changes to PENDING.
+    With ?stream=true, per-image progress is streamed as NDJSON.
     """
     face_images = request.face_images
     
@@ -179,8 +218,33 @@ async def enroll_face(
             detail=f"Cần ít nhất 10 ảnh khuôn mặt, bạn chỉ gửi {len(face_images)} ảnh"
         )
     
+    async def save_enrollment(embeddings):
+        # Store face embeddings and change status to PENDING
+        await face_template_cache.save_encodings(current_user["_id"], embeddings)
+        users_col = get_users_collection()
+        await users_col.update_one(
+            {"_id": ObjectId(current_user["_id"])},
+            {
+                "$set": {
+                    "face_registered": True,
+                    "status": UserStatus.PENDING.value,
+                    "updated_at": datetime.utcnow()
+                }
+            }
+        )
+        principal_cache.invalidate(current_user["_id"])
+        return {
+            "status": "PENDING",
+            "embeddings_count": len(embeddings),
+            "next_step": "wait_for_approval"
+        }
+    
+    if stream:
+        events = face_worker_pool.iter_enrollment(current_user["_id"], face_images)
+        return _enrollment_stream(events, save_enrollment)
+    
     # Process face images
-    success, message, embeddings = face_service.enroll_faces(
+    success, message, embeddings = await face_worker_pool.enroll_faces(
         user_id=current_user["_id"],
         face_images=face_images
     )
@@ -188,26 +252,65 @@ async def enroll_face(
     if not success:
         raise HTTPException(status_code=400, detail=message)
     
-    # Update user with face embeddings and change status to PENDING
+    return {"message": message, **await save_enrollment(embeddings)}
+
+@router.post("/{user_id}/enroll-face")
+async def admin_enroll_face(
+    user_id: str,
+    request: FaceEnrollRequest,
+    stream: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Re-enroll face for a specific user (HR/Admin only).
+    Replaces the stored encodings without changing the user's status.
+    With ?stream=true, per-image progress is streamed as NDJSON.
+    """
+    if current_user.get("role") not in [UserRole.HR_MANAGER.value, UserRole.SUPER_ADMIN.value]:
+        raise HTTPException(status_code=403, detail="Không có quyền đăng ký khuôn mặt cho người khác")
+    
+    face_images = request.face_images
+    
+    if len(face_images) < 10:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Cần ít nhất 10 ảnh khuôn mặt, bạn chỉ gửi {len(face_images)} ảnh"
+        )
+    
     users_col = get_users_collection()
-    await users_col.update_one(
-        {"_id": ObjectId(current_user["_id"])},
-        {
-            "$set": {
-                "face_encodings": embeddings,
-                "face_registered": True,
-                "status": UserStatus.PENDING.value,
-                "updated_at": datetime.utcnow()
+    user = None
+    if ObjectId.is_valid(user_id):
+        user = await users_col.find_one({"_id": ObjectId(user_id)}, {"_id": 1})
+    if not user:
+        raise HTTPException(status_code=404, detail="Không tìm thấy người dùng")
+    
+    async def save_enrollment(embeddings):
+        await face_template_cache.save_encodings(user_id, embeddings)
+        await users_col.update_one(
+            {"_id": ObjectId(user_id)},
+            {
+                "$set": {
+                    "face_registered": True,
+                    "face_enrolled_by": current_user["_id"],
+                    "updated_at": datetime.utcnow()
+                }
             }
-        }
+        )
+        return {"user_id": user_id, "embeddings_count": len(embeddings)}
+    
+    if stream:
+        events = face_worker_pool.iter_enrollment(user_id, face_images)
+        return _enrollment_stream(events, save_enrollment)
+    
+    success, message, embeddings = await face_worker_pool.enroll_faces(
+        user_id=user_id,
+        face_images=face_images
     )
     
-    return {
-        "message": message,
-        "status": "PENDING",
-        "embeddings_count": len(embeddings),
-        "next_step": "wait_for_approval"
-    }
+    if not success:
+        raise HTTPException(status_code=400, detail=message)
+    
+    return {"message": message, **await save_enrollment(embeddings)}
 
 @router.get("/pending", response_model=List[dict])
 async def get_pending_users(current_user: dict = Depends(get_current_user)):
@@ -267,6 +370,7 @@ async def approve_user(
             }
         }
     )
+    principal_cache.invalidate(user_id)
     
     return {
         "message": "Duyệt hồ sơ thành công",
@@ -293,7 +397,6 @@ async def reject_user(
             "$set": {
                 "status": UserStatus.INIT.value,
                 "face_registered": False,
-                "face_encodings": [],
                 "rejection_reason": reason,
                 "rejected_by": current_user["_id"],
                 "rejected_at": datetime.utcnow(),
@@ -301,6 +404,8 @@ async def reject_user(
             }
         }
     )
+    await face_template_cache.delete_encodings(user_id)
+    principal_cache.invalidate(user_id)
     
     return {
         "message": "Đã từ chối hồ sơ",
@@ -351,43 +456,89 @@ async def search_users(
     
     return result
 
+# Page size of /list when paging with `after` and no `limit`
+LIST_PAGE_SIZE = 200
+
+# Fields returned by /list - never load face data or bank details for it
+USER_LIST_PROJECTION = {
+    "email": 1,
+    "full_name": 1,
+    "phone": 1,
+    "department": 1,
+    "position": 1,
+    "avatar": 1,
+    "role": 1,
+    "status": 1,
+    "face_registered": 1,
+    "created_at": 1
+}
+
+def _user_list_item(user: dict) -> dict:
+    return {
+        "id": str(user["_id"]),
+        "email": user["email"],
+        "full_name": user.get("full_name"),
+        "phone": user.get("phone"),
+        "department": user.get("department"),
+        "position": user.get("position"),
+        "avatar": user.get("avatar"),
+        "role": user.get("role"),
+        "status": user.get("status"),
+        "face_registered": user.get("face_registered", False),
+        "created_at": user.get("created_at")
+    }
+
 @router.get("/list", response_model=List[dict])
 async def list_users(
+    response: Response,
     status: str = None,
     role: str = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    after: str = None,
+    include_total: bool = False,
+    stream: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get list of all users (HR/Admin only)"""
+    """
+    Get list of users, oldest first (HR/Admin only).
+    Pass the id of the last user received as `after` to get the next page
+    (pages of `limit`, default 200); without limit or after every
+    matching user is returned, as before paging existed.
+    include_total=true adds the number of matching users in X-Total-Count.
+    stream=true returns every matching user (after `after`) as NDJSON.
+    """
     if current_user.get("role") not in [UserRole.HR_MANAGER.value, UserRole.SUPER_ADMIN.value]:
         raise HTTPException(status_code=403, detail="Không có quyền truy cập")
     
-    users_col = get_users_collection()
-    
     query = {}
     if status:
         query["status"] = status
     if role:
         query["role"] = role
     
-    users = await users_col.find(query).to_list(None)
+    try:
+        cursor = await users_repo.find_after(
+            query,
+            [("_id", ASCENDING)],
+            after,
+            USER_LIST_PROJECTION,
+            limit=0 if stream else (limit or (LIST_PAGE_SIZE if after else 0))
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Tham số after không hợp lệ")
     
-    result = []
-    for user in users:
-        result.append({
-            "id": str(user["_id"]),
-            "email": user["email"],
-            "full_name": user.get("full_name"),
-            "phone": user.get("phone"),
-            "department": user.get("department"),
-            "position": user.get("position"),
-            "avatar": user.get("avatar"),
-            "role": user.get("role"),
-            "status": user.get("status"),
-            "face_registered": user.get("face_registered", False),
-            "created_at": user.get("created_at")
-        })
+    if stream:
+        async def body():
+            async for user in cursor:
+                yield json.dumps(jsonable_encoder(_user_list_item(user)), ensure_ascii=False) + "\n"
+        
+        return StreamingResponse(body(), media_type="application/x-ndjson")
     
-    return result
+    if include_total:
+        total = await users_repo.collection().count_documents(query)
+        response.headers["X-Total-Count"] = str(total)
+    
+    return [_user_list_item(user) async for user in cursor]
 
 @router.get("/{user_id}", response_model=dict)
 async def get_user(
@@ -453,6 +604,7 @@ async def update_user_status(
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Không tìm thấy người dùng")
+    principal_cache.invalidate(user_id)
     
     status_messages = {
         "ACTIVE": "Đã kích hoạt tài khoản",
@@ -495,6 +647,7 @@ async def update_user_role(
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Không tìm thấy người dùng")
+    principal_cache.invalidate(user_id)
     
     return {"message": f"Đã thay đổi vai trò thành {data.role}"}
 
@@ -564,6 +717,7 @@ async def admin_update_user(
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Không tìm thấy người dùng")
+    principal_cache.invalidate(user_id)
     
     return {"message": "Cập nhật thông tin thành công"}
 
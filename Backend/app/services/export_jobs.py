@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import List, Optional
+
+import aiofiles
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from ..config import settings
+from ..database import get_export_jobs_collection
+from .export_reports import REPORT_BUILDERS
+
+class ExportJobStatus(str, Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+class ExportJobManager:
+    """
+    Generates report exports on background workers and keeps the files as
+    cached artifacts. A job document doubles as the cache entry: a job with
+    valid=True is reused for the same (report, month, year, scope) until a
+    write to the underlying data calls invalidate(). At most one valid job
+    exists per key (unique partial index), so concurrent requests share a
+    job. Files are stored in EXPORTS_PATH under their SHA-256, so an
+    unchanged regeneration reuses the same file; they are only served
+    through the download endpoint, which checks the role.
+    """
+
+    # Queued/running jobs older than this are treated as lost (e.g. restart)
+    JOB_TIMEOUT_SECONDS = 600
+
+    def __init__(self, workers: int, export_dir: str):
+        self.workers = workers
+        self.export_dir = export_dir
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Start the worker tasks (call from the running event loop)"""
+        if self._tasks:
+            return
+        os.makedirs(self.export_dir, exist_ok=True)
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def file_path(self, file_hash: str) -> str:
+        return os.path.join(self.export_dir, f"{file_hash}.xlsx")
+
+    async def submit(self, report: str, month: Optional[int], year: int, scope: str, requested_by: str) -> dict:
+        """Return a reusable job for this report, or queue a new one"""
+        jobs_col = get_export_jobs_collection()
+        key = {"report": report, "month": month, "year": year, "scope": scope}
+        cutoff = datetime.utcnow() - timedelta(seconds=self.JOB_TIMEOUT_SECONDS)
+
+        cached = await jobs_col.find_one({**key, "valid": True})
+        if cached:
+            if cached["status"] == ExportJobStatus.DONE.value:
+                if os.path.exists(self.file_path(cached["file_hash"])):
+                    return cached
+                # The file was removed from disk - drop the entry and regenerate
+            elif cached["created_at"] >= cutoff:
+                return cached
+            # Done without its file, or queued/running for too long: retire it
+            await jobs_col.update_one({"_id": cached["_id"], "valid": True}, {"$set": {"valid": False}})
+
+        job = {
+            **key,
+            "status": ExportJobStatus.PENDING.value,
+            "valid": True,
+            "requested_by": requested_by,
+            "created_at": datetime.utcnow()
+        }
+        try:
+            result = await jobs_col.insert_one(job)
+        except DuplicateKeyError:
+            # A concurrent request created the job for this key first
+            existing = await jobs_col.find_one({**key, "valid": True})
+            if existing:
+                return existing
+            raise
+        job["_id"] = result.inserted_id
+
+        self.start()
+        self._queue.put_nowait(job["_id"])
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        if not ObjectId.is_valid(job_id):
+            return None
+        return await get_export_jobs_collection().find_one({"_id": ObjectId(job_id)})
+
+    async def invalidate(self, report: str, year: int, month: Optional[int] = None):
+        """
+        Mark cached exports of a report as stale after its data changed.
+        Jobs still running are marked too, so their result is served to
+        whoever asked but never reused.
+        """
+        query = {"report": report, "year": year, "valid": True}
+        if month is not None:
+            query["month"] = month
+        await get_export_jobs_collection().update_many(query, {"$set": {"valid": False}})
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Export job {job_id} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: ObjectId):
+        jobs_col = get_export_jobs_collection()
+        job = await jobs_col.find_one_and_update(
+            {"_id": job_id, "status": ExportJobStatus.PENDING.value},
+            {"$set": {"status": ExportJobStatus.RUNNING.value, "started_at": datetime.utcnow()}}
+        )
+        if not job:
+            return
+
+        part_path = os.path.join(self.export_dir, f"{job_id}.part")
+        try:
+            build = REPORT_BUILDERS[job["report"]]
+            sheet = await build(job["month"], job["year"], reporting=False)
+
+            digest = hashlib.sha256()
+            size = 0
+            async with aiofiles.open(part_path, "wb") as f:
+                async for chunk in sheet.writer.stream(sheet.rows, sheet.footer):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    await f.write(chunk)
+
+            file_hash = digest.hexdigest()
+            os.replace(part_path, self.file_path(file_hash))
+
+            await jobs_col.update_one(
+                {"_id": job_id},
+                {"$set": {
+                    "status": ExportJobStatus.DONE.value,
+                    "file_hash": file_hash,
+                    "filename": sheet.filename,
+                    "size": size,
+                    "finished_at": datetime.utcnow()
+                }}
+            )
+        except Exception as e:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            await jobs_col.update_one(
+                {"_id": job_id},
+                {"$set": {
+                    "status": ExportJobStatus.FAILED.value,
+                    "valid": False,
+                    "error": str(e),
+                    "finished_at": datetime.utcnow()
+                }}
+            )
+            raise
+
+# Singleton instance
+export_jobs = ExportJobManager(
+    workers=settings.EXPORT_JOB_WORKERS,
+    export_dir=settings.EXPORTS_PATH
+)
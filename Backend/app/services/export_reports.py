@@ -0,0 +1,119 @@
+from calendar import monthrange
+from datetime import date
+from typing import AsyncIterator, Callable, NamedTuple, Optional, Sequence
+
+from ..repositories import daily_attendance_repo, users_repo, leaves_repo, overtime_repo
+from .xlsx_stream import XlsxStreamWriter
+
+class ExportSheet(NamedTuple):
+    """Everything needed to stream one report"""
+    writer: XlsxStreamWriter
+    rows: AsyncIterator[Sequence]
+    filename: str
+    footer: Optional[Callable] = None
+
+# Report builders take (month, year, reporting). The endpoints read from
+# secondaries; cached export jobs pass reporting=False so an artifact never
+# misses the write that invalidated the previous one.
+
+async def build_attendance_export(month: int, year: int, reporting: bool = True) -> ExportSheet:
+    first_day = date(year, month, 1)
+    last_day = date(year, month, monthrange(year, month)[1])
+
+    # Checked-in days per user, grouped on the server from the daily rollup
+    counts = await daily_attendance_repo.count_checkins_by_user(first_day, last_day, reporting=reporting)
+
+    async def rows():
+        users = users_repo.active(
+            {"employee_id": 1, "full_name": 1, "department": 1},
+            reporting=reporting
+        )
+        idx = 0
+        async for user in users:
+            idx += 1
+            stats = counts.get(str(user["_id"]), {})
+            total = stats.get("total", 0)
+            on_time = stats.get("on_time", 0)
+            rate = round(on_time / total * 100, 1) if total > 0 else 0
+            yield [
+                idx,
+                user.get("employee_id", "N/A"),
+                user.get("full_name", "N/A"),
+                user.get("department", "N/A"),
+                total,
+                on_time,
+                stats.get("late", 0),
+                f"{rate}%"
+            ]
+
+    writer = XlsxStreamWriter(
+        f"Chấm công T{month}/{year}",
+        ["STT", "Mã NV", "Họ tên", "Phòng ban", "Số ngày làm", "Đúng giờ", "Đi muộn", "Tỷ lệ %"],
+        [8, 12, 25, 20, 12, 12, 12, 12]
+    )
+    return ExportSheet(writer, rows(), f"attendance_{year}_{month:02d}.xlsx")
+
+async def build_leaves_export(month: Optional[int], year: int, reporting: bool = True) -> ExportSheet:
+    """Yearly report - month is ignored"""
+    async def rows():
+        leaves = leaves_repo.in_year(year, reporting=reporting)
+        idx = 0
+        async for leave in leaves:
+            idx += 1
+            yield [
+                idx,
+                leave.get("user_name", "N/A"),
+                leave.get("leave_type", "N/A"),
+                leave.get("start_date", "N/A"),
+                leave.get("end_date", "N/A"),
+                leave.get("days", 0),
+                leave.get("status", "N/A"),
+                leave.get("approved_by", "")
+            ]
+
+    writer = XlsxStreamWriter(
+        f"Nghỉ phép {year}",
+        ["STT", "Nhân viên", "Loại", "Từ ngày", "Đến ngày", "Số ngày", "Trạng thái", "Người duyệt"],
+        [8, 25, 15, 12, 12, 10, 12, 20]
+    )
+    return ExportSheet(writer, rows(), f"leaves_{year}.xlsx")
+
+async def build_overtime_export(month: int, year: int, reporting: bool = True) -> ExportSheet:
+    total_hours = 0
+
+    async def rows():
+        nonlocal total_hours
+        ots = overtime_repo.approved_in_month(year, month, reporting=reporting)
+        idx = 0
+        async for ot in ots:
+            idx += 1
+            total_hours += ot.get("hours", 0)
+            yield [
+                idx,
+                ot.get("user_name", "N/A"),
+                ot.get("user_department", "N/A"),
+                ot.get("date", "N/A"),
+                ot.get("start_time", ""),
+                ot.get("end_time", ""),
+                ot.get("hours", 0),
+                ot.get("reason", "")
+            ]
+
+    # Summary row under the data, label in "Đến" and total in "Số giờ"
+    def footer():
+        return [[None, None, None, None, None, "Tổng cộng:", total_hours]]
+
+    writer = XlsxStreamWriter(
+        f"OT T{month}/{year}",
+        ["STT", "Nhân viên", "Phòng ban", "Ngày", "Từ", "Đến", "Số giờ", "Lý do"],
+        [8, 25, 20, 12, 8, 8, 10, 30]
+    )
+    return ExportSheet(writer, rows(), f"overtime_{year}_{month:02d}.xlsx", footer)
+
+# Report name -> builder. Monthly reports need a month; leaves is yearly.
+REPORT_BUILDERS = {
+    "attendance": build_attendance_export,
+    "leaves": build_leaves_export,
+    "overtime": build_overtime_export
+}
+MONTHLY_REPORTS = {"attendance", "overtime"}
@@ -2,10 +2,81 @@ import os
 import cv2
 import numpy as np
 import base64
-from typing import List, Tuple, Optional
+import time
+from contextlib import contextmanager
+from typing import List, Tuple, Optional, Union
 from datetime import datetime
 from ..config import settings
 
+@contextmanager
+def stage_timer(timings: Optional[dict], stage: str):
+    """Add the elapsed seconds of a processing stage to timings (if given)"""
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+class FaceTemplate:
+    """
+    A user's stored encodings stacked into one pre-centered matrix.
+    Scores a probe against every encoding with a single matrix product,
+    giving the same values as cv2.compareHist(..., HISTCMP_CORREL).
+    """
+    
+    # Storage format of encodings in the face_templates collection
+    STORAGE_DTYPE = np.float32
+    
+    def __init__(self, encodings: Union[List[List[float]], np.ndarray]):
+        # compare_histograms feeds float32 arrays to OpenCV, which then
+        # accumulates in double precision - do the same here
+        matrix = np.asarray(encodings, dtype=np.float32).astype(np.float64)
+        if matrix.size == 0:
+            matrix = matrix.reshape(0, 0)
+        
+        self.centered = matrix - matrix.mean(axis=1, keepdims=True)
+        self.sum_squares = np.einsum("ij,ij->i", self.centered, self.centered)
+    
+    def __len__(self) -> int:
+        return self.centered.shape[0]
+    
+    @staticmethod
+    def pack(encodings: List[List[float]]) -> Tuple[bytes, int, int]:
+        """Encode encodings as a compact float32 blob: (data, count, dim)"""
+        matrix = np.asarray(encodings, dtype=FaceTemplate.STORAGE_DTYPE)
+        if matrix.size == 0:
+            return b"", 0, 0
+        return matrix.tobytes(), matrix.shape[0], matrix.shape[1]
+    
+    @classmethod
+    def from_packed(cls, data: bytes, count: int, dim: int) -> "FaceTemplate":
+        """Build a template straight from a blob written by pack()"""
+        matrix = np.frombuffer(data, dtype=cls.STORAGE_DTYPE).reshape(count, dim)
+        return cls(matrix)
+    
+    def scores(self, probe: List[float]) -> np.ndarray:
+        """Correlation of the probe against every stored encoding"""
+        p = np.asarray(probe, dtype=np.float32).astype(np.float64)
+        p = p - p.mean()
+        
+        numerator = self.centered @ p
+        denominator = self.sum_squares * np.dot(p, p)
+        
+        # OpenCV returns 1.0 when either histogram has zero variance
+        result = np.ones(len(self), dtype=np.float64)
+        valid = np.abs(denominator) > np.finfo(np.float64).eps
+        result[valid] = numerator[valid] / np.sqrt(denominator[valid])
+        return result
+    
+    def best_score(self, probe: List[float]) -> float:
+        """Highest correlation against any stored encoding (0.0 if none)"""
+        if len(self) == 0:
+            return 0.0
+        return max(0.0, float(self.scores(probe).max()))
+
 class FaceRecognitionService:
     """
     Simplified Face Recognition Service using OpenCV.
@@ -13,6 +84,11 @@ class FaceRecognitionService:
     Uses face histograms for basic face comparison.
     """
     
+    # Enrollment limits
+    MIN_ENROLL_IMAGES = 10
+    MAX_ENCODINGS = 50
+    MAX_REFERENCE_IMAGES = 10
+    
     def __init__(self):
         self.face_data_path = settings.FACE_DATA_PATH
         self.uploads_path = settings.UPLOADS_PATH
@@ -36,17 +112,85 @@ class FaceRecognitionService:
         img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
         return img
     
-    def detect_face(self, img: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
-        """Detect face using OpenCV Haar Cascade"""
+    # Haar cascade parameters at full resolution
+    DETECT_SCALE_FACTOR = 1.1
+    DETECT_MIN_NEIGHBORS = 5
+    DETECT_MIN_SIZE = 50
+    
+    def detect_face(
+        self,
+        img: np.ndarray,
+        coarse_to_fine: Optional[bool] = None
+    ) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Detect face using OpenCV Haar Cascade.
+        coarse_to_fine defaults to settings.FACE_DETECT_COARSE_TO_FINE.
+        """
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        
+        if coarse_to_fine is None:
+            coarse_to_fine = settings.FACE_DETECT_COARSE_TO_FINE
+        if coarse_to_fine and 0 < settings.FACE_DETECT_DOWNSCALE < 1:
+            return self._detect_coarse_to_fine(gray)
+        return self._detect_full(gray)
+    
+    def _detect_full(self, gray: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """Single detectMultiScale pass over the full-resolution frame"""
         faces = self.face_cascade.detectMultiScale(
-            gray, scaleFactor=1.1, minNeighbors=5, minSize=(50, 50)
+            gray,
+            scaleFactor=self.DETECT_SCALE_FACTOR,
+            minNeighbors=self.DETECT_MIN_NEIGHBORS,
+            minSize=(self.DETECT_MIN_SIZE, self.DETECT_MIN_SIZE)
         )
         
         if len(faces) > 0:
-            return tuple(faces[0])  # (x, y, w, h)
+            return tuple(int(v) for v in faces[0])  # (x, y, w, h)
         return None
     
+    def _detect_coarse_to_fine(self, gray: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Detect on a downscaled frame, then refine the first candidate at full
+        resolution inside a small region around it. With
+        FACE_DETECT_FULL_FALLBACK, a coarse miss is retried at full resolution
+        so the hit rate never drops below the full-resolution path.
+        """
+        scale = settings.FACE_DETECT_DOWNSCALE
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        coarse_min = max(1, int(self.DETECT_MIN_SIZE * scale))
+        faces = self.face_cascade.detectMultiScale(
+            small,
+            scaleFactor=settings.FACE_DETECT_COARSE_SCALE_FACTOR,
+            minNeighbors=self.DETECT_MIN_NEIGHBORS,
+            minSize=(coarse_min, coarse_min)
+        )
+        if len(faces) == 0:
+            return self._detect_full(gray) if settings.FACE_DETECT_FULL_FALLBACK else None
+        
+        # Map the candidate back to full resolution and pad it
+        x, y, w, h = (int(round(v / scale)) for v in faces[0])
+        margin_x = int(w * settings.FACE_DETECT_ROI_MARGIN)
+        margin_y = int(h * settings.FACE_DETECT_ROI_MARGIN)
+        height, width = gray.shape[:2]
+        x0, y0 = max(0, x - margin_x), max(0, y - margin_y)
+        x1, y1 = min(width, x + w + margin_x), min(height, y + h + margin_y)
+        
+        roi = gray[y0:y1, x0:x1]
+        refine_min = max(self.DETECT_MIN_SIZE, int(min(w, h) * 0.8))
+        refined = self.face_cascade.detectMultiScale(
+            roi,
+            scaleFactor=self.DETECT_SCALE_FACTOR,
+            minNeighbors=self.DETECT_MIN_NEIGHBORS,
+            minSize=(refine_min, refine_min)
+        )
+        if len(refined) > 0:
+            rx, ry, rw, rh = (int(v) for v in refined[0])
+            return (x0 + rx, y0 + ry, rw, rh)
+        
+        # Refinement missed - keep the upscaled coarse box, clipped to the frame
+        w = min(w, width - x)
+        h = min(h, height - y)
+        return (x, y, w, h)
+    
     def extract_face_histogram(self, img: np.ndarray, face_rect: Tuple[int, int, int, int]) -> List[float]:
         """
         Extract face histogram as simple encoding.
@@ -77,53 +221,98 @@ class FaceRecognitionService:
         """Check if image is too blurry"""
         return self.calculate_laplacian_variance(img) < threshold
     
-    def enroll_faces(self, user_id: str, face_images: List[str]) -> Tuple[bool, str, List[List[float]]]:
+    def analyze_enrollment_image(
+        self,
+        img_base64: str,
+        timings: Optional[dict] = None
+    ) -> Tuple[Optional[List[float]], str]:
         """
-        Process face images and extract encodings for enrollment.
+        Decode one enrollment image and extract its encoding.
         
         Returns:
-            (success, message, encodings)
+            (encoding or None, outcome) where outcome is
+            "accepted", "blurry", "no_face" or "error"
         """
-        encodings = []
-        user_face_dir = os.path.join(self.face_data_path, str(user_id))
-        os.makedirs(user_face_dir, exist_ok=True)
-        
-        valid_count = 0
-        for idx, img_base64 in enumerate(face_images):
-            try:
+        try:
+            with stage_timer(timings, "decode"):
                 img = self.base64_to_image(img_base64)
-                
-                # Skip blurry images
-                if self.is_image_blurry(img):
-                    continue
-                
-                # Detect face
+            
+            # Skip blurry images
+            with stage_timer(timings, "blur_check"):
+                is_blurry = self.is_image_blurry(img)
+            if is_blurry:
+                return None, "blurry"
+            
+            # Detect face
+            with stage_timer(timings, "detect"):
                 face_rect = self.detect_face(img)
-                if face_rect is None:
-                    continue
-                
-                # Extract histogram encoding
+            if face_rect is None:
+                return None, "no_face"
+            
+            # Extract histogram encoding
+            with stage_timer(timings, "extract"):
                 encoding = self.extract_face_histogram(img, face_rect)
-                encodings.append(encoding)
-                valid_count += 1
-                
-                # Save some images for reference
-                if valid_count <= 10:
-                    face_path = os.path.join(user_face_dir, f"face_{valid_count}.jpg")
-                    cv2.imwrite(face_path, img)
-                    
-            except Exception as e:
-                print(f"Error processing image {idx}: {e}")
-                continue
+            return encoding, "accepted"
+        except Exception as e:
+            print(f"Error processing enrollment image: {e}")
+            return None, "error"
+    
+    def save_reference_face(
+        self,
+        user_id: str,
+        number: int,
+        img_base64: str,
+        timings: Optional[dict] = None
+    ) -> str:
+        """Save an enrollment image as face_<number>.jpg for reference"""
+        user_face_dir = os.path.join(self.face_data_path, str(user_id))
+        os.makedirs(user_face_dir, exist_ok=True)
         
-        if valid_count < 10:
-            return False, f"Không đủ ảnh khuôn mặt hợp lệ. Chỉ có {valid_count} ảnh, cần ít nhất 10 ảnh.", []
+        with stage_timer(timings, "decode"):
+            img = self.base64_to_image(img_base64)
+        
+        face_path = os.path.join(user_face_dir, f"face_{number}.jpg")
+        with stage_timer(timings, "write"):
+            cv2.imwrite(face_path, img)
+        return face_path
+    
+    def summarize_enrollment(self, encodings: List[List[float]]) -> Tuple[bool, str, List[List[float]]]:
+        """Apply the enrollment minimum and encoding cap to accepted encodings"""
+        valid_count = len(encodings)
+        if valid_count < self.MIN_ENROLL_IMAGES:
+            return False, f"Không đủ ảnh khuôn mặt hợp lệ. Chỉ có {valid_count} ảnh, cần ít nhất {self.MIN_ENROLL_IMAGES} ảnh.", []
         
         # Keep best encodings (max 50)
-        if len(encodings) > 50:
-            encodings = encodings[:50]
+        return True, f"Đăng ký thành công với {valid_count} ảnh khuôn mặt!", encodings[:self.MAX_ENCODINGS]
+    
+    def enroll_faces(
+        self,
+        user_id: str,
+        face_images: List[str],
+        timings: Optional[dict] = None
+    ) -> Tuple[bool, str, List[List[float]]]:
+        """
+        Process face images one by one and extract encodings for enrollment.
+        Per-stage durations are added to timings when provided.
         
-        return True, f"Đăng ký thành công với {valid_count} ảnh khuôn mặt!", encodings
+        Returns:
+            (success, message, encodings)
+        """
+        encodings = []
+        for idx, img_base64 in enumerate(face_images):
+            encoding, outcome = self.analyze_enrollment_image(img_base64, timings)
+            if encoding is None:
+                continue
+            encodings.append(encoding)
+            
+            # Save some images for reference
+            if len(encodings) <= self.MAX_REFERENCE_IMAGES:
+                try:
+                    self.save_reference_face(user_id, len(encodings), img_base64, timings)
+                except Exception as e:
+                    print(f"Error saving reference image {idx}: {e}")
+        
+        return self.summarize_enrollment(encodings)
     
     def compare_histograms(self, hist1: List[float], hist2: List[float]) -> float:
         """Compare two histograms using correlation"""
@@ -131,30 +320,40 @@ class FaceRecognitionService:
         h2 = np.array(hist2, dtype=np.float32)
         return cv2.compareHist(h1, h2, cv2.HISTCMP_CORREL)
     
-    def verify_face(self, face_image: str, stored_encodings: List[List[float]]) -> Tuple[bool, float, str]:
+    def verify_face(
+        self,
+        face_image: str,
+        stored_encodings: Union[List[List[float]], FaceTemplate],
+        timings: Optional[dict] = None
+    ) -> Tuple[bool, float, str]:
         """
         Verify if face matches stored encodings.
+        Accepts either the raw encodings list or a prebuilt FaceTemplate.
+        Per-stage durations are added to timings when provided.
         
         Returns:
             (is_match, confidence, message)
         """
         try:
-            img = self.base64_to_image(face_image)
+            with stage_timer(timings, "decode"):
+                img = self.base64_to_image(face_image)
             
             # Detect face
-            face_rect = self.detect_face(img)
+            with stage_timer(timings, "detect"):
+                face_rect = self.detect_face(img)
             if face_rect is None:
                 return False, 0.0, "Không phát hiện được khuôn mặt trong ảnh"
             
             # Extract encoding
-            current_encoding = self.extract_face_histogram(img, face_rect)
+            with stage_timer(timings, "extract"):
+                current_encoding = self.extract_face_histogram(img, face_rect)
             
-            # Compare with stored encodings
-            best_score = 0.0
-            for stored_enc in stored_encodings:
-                score = self.compare_histograms(current_encoding, stored_enc)
-                if score > best_score:
-                    best_score = score
+            # Compare with all stored encodings in one vectorized pass
+            with stage_timer(timings, "match"):
+                template = stored_encodings
+                if not isinstance(template, FaceTemplate):
+                    template = FaceTemplate(stored_encodings)
+                best_score = template.best_score(current_encoding)
             
             # Threshold for match
             threshold = 0.5
@@ -169,10 +368,17 @@ class FaceRecognitionService:
             print(f"Face verification error: {e}")
             return False, 0.0, f"Lỗi xác thực: {str(e)}"
     
-    def save_attendance_image(self, user_id: str, face_image: str, check_type: str) -> str:
+    def save_attendance_image(
+        self,
+        user_id: str,
+        face_image: str,
+        check_type: str,
+        timings: Optional[dict] = None
+    ) -> str:
         """Save attendance check image"""
         try:
-            img = self.base64_to_image(face_image)
+            with stage_timer(timings, "decode"):
+                img = self.base64_to_image(face_image)
             
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"{user_id}_{check_type}_{timestamp}.jpg"
@@ -181,7 +387,8 @@ class FaceRecognitionService:
             os.makedirs(attendance_dir, exist_ok=True)
             
             filepath = os.path.join(attendance_dir, filename)
-            cv2.imwrite(filepath, img)
+            with stage_timer(timings, "write"):
+                cv2.imwrite(filepath, img)
             
             return f"/uploads/attendance/{filename}"
         except Exception as e:
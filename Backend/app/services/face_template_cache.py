@@ -0,0 +1,105 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+from bson import Binary
+
+from ..config import settings
+from ..database import get_face_templates_collection
+from .face_recognition_service import FaceTemplate
+
+class FaceTemplateCache:
+    """
+    In-process LRU cache of ready-to-score FaceTemplates keyed by user id.
+    Encodings are stored outside the users document, one face_templates
+    document per user holding a packed float32 blob, so ordinary user
+    lookups never load face data. All reads and writes of encodings go
+    through here, which keeps the cache consistent on this process.
+    """
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self._templates: "OrderedDict[str, FaceTemplate]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> Optional[FaceTemplate]:
+        """Return the cached template and mark it as recently used"""
+        template = self._templates.get(user_id)
+        if template is None:
+            self.misses += 1
+            return None
+
+        self._templates.move_to_end(user_id)
+        self.hits += 1
+        return template
+
+    def put(self, user_id: str, template: FaceTemplate):
+        """Store a template, evicting the least recently used ones if full"""
+        self._templates[user_id] = template
+        self._templates.move_to_end(user_id)
+        while len(self._templates) > self.max_size:
+            self._templates.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        """Drop a user's template after their encodings change"""
+        self._templates.pop(str(user_id), None)
+
+    def clear(self):
+        self._templates.clear()
+
+    async def get_template(self, user_id: str) -> Optional[FaceTemplate]:
+        """
+        Get a user's template, loading it from face_templates on a miss.
+        Returns None if the user has no enrolled face.
+        """
+        user_id = str(user_id)
+        template = self.get(user_id)
+        if template is not None:
+            return template
+
+        templates_col = get_face_templates_collection()
+        doc = await templates_col.find_one({"_id": user_id})
+        if not doc or not doc.get("count"):
+            return None
+
+        template = FaceTemplate.from_packed(doc["data"], doc["count"], doc["dim"])
+        self.put(user_id, template)
+        return template
+
+    async def save_encodings(self, user_id: str, encodings: List[List[float]]):
+        """Store a user's encodings as a packed float32 blob"""
+        user_id = str(user_id)
+        data, count, dim = FaceTemplate.pack(encodings)
+
+        templates_col = get_face_templates_collection()
+        await templates_col.replace_one(
+            {"_id": user_id},
+            {
+                "_id": user_id,
+                "dtype": "float32",
+                "count": count,
+                "dim": dim,
+                "data": Binary(data),
+                "updated_at": datetime.utcnow()
+            },
+            upsert=True
+        )
+        self.invalidate(user_id)
+
+    async def delete_encodings(self, user_id: str):
+        """Remove a user's encodings (e.g. when the enrollment is rejected)"""
+        user_id = str(user_id)
+        templates_col = get_face_templates_collection()
+        await templates_col.delete_one({"_id": user_id})
+        self.invalidate(user_id)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._templates),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+# Singleton instance
+face_template_cache = FaceTemplateCache(max_size=settings.FACE_TEMPLATE_CACHE_SIZE)
@@ -0,0 +1,256 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, List, Optional, Tuple
+
+from ..config import settings
+from .face_recognition_service import FaceTemplate, face_service
+
+class FaceWorkerPoolBusy(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+    def __init__(self, retry_after: int = 2):
+        self.retry_after = retry_after
+        super().__init__("Face worker pool is saturated")
+
+def _run_timed(method: str, args: tuple) -> Tuple[float, dict, object]:
+    """Worker entry point: run a face_service method and time its stages"""
+    started_at = time.time()
+    timings = {}
+    result = getattr(face_service, method)(*args, timings=timings)
+    return started_at, timings, result
+
+class FaceWorkerPool:
+    """
+    Runs CPU-bound OpenCV work (detection, blur check, histograms, JPEG I/O)
+    outside the event loop so chat and other requests stay responsive.
+    Every job handed to the executor holds one slot - single requests,
+    each image an enrollment is analyzing, background reference writes -
+    and requests beyond workers + queue_size slots are rejected with
+    FaceWorkerPoolBusy.
+    """
+
+    def __init__(self, processes: int, queue_size: int):
+        self.processes = processes
+        self.queue_size = queue_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        self.rejected = 0
+        self._stages = {}
+        self._background_tasks = set()
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    @property
+    def workers(self) -> int:
+        """Jobs the executor runs at once (processes, or the default thread pool)"""
+        return self.processes if self.processes > 0 else min(32, (os.cpu_count() or 1) + 4)
+
+    def start(self):
+        """Create the process pool (no-op when running in thread mode)"""
+        if self.processes > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _record(self, stage: str, seconds: float):
+        entry = self._stages.setdefault(stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        ms = seconds * 1000
+        entry["count"] += 1
+        entry["total_ms"] += ms
+        entry["max_ms"] = max(entry["max_ms"], ms)
+
+    @property
+    def free_slots(self) -> int:
+        return max(0, self.capacity - self._in_flight)
+
+    def _check_capacity(self):
+        """Raise FaceWorkerPoolBusy when no request can be admitted"""
+        if not self.free_slots:
+            self.rejected += 1
+            raise FaceWorkerPoolBusy()
+
+    def _acquire(self, slots: int = 1):
+        """Admit one request or raise FaceWorkerPoolBusy when saturated"""
+        self._check_capacity()
+        self._in_flight += slots
+
+    def _release(self, slots: int = 1):
+        self._in_flight -= slots
+
+    async def _submit(self, method: str, *args):
+        """Run a face_service method on a worker and record its timings"""
+        submitted_at = time.time()
+        self.start()
+        loop = asyncio.get_running_loop()
+        try:
+            started_at, timings, result = await loop.run_in_executor(
+                self._executor, _run_timed, method, args
+            )
+        except BrokenProcessPool:
+            # A worker died - replace the pool so later calls can succeed
+            self.shutdown()
+            raise
+
+        self._record("queue_wait", max(0.0, started_at - submitted_at))
+        for stage, seconds in timings.items():
+            self._record(f"{method}.{stage}", seconds)
+        self._record(f"{method}.total", time.time() - submitted_at)
+        return result
+
+    async def run(self, method: str, *args):
+        """Run a face_service method on the pool, applying backpressure"""
+        self._acquire()
+        try:
+            return await self._submit(method, *args)
+        finally:
+            self._release()
+
+    def iter_enrollment(self, user_id: str, face_images: List[str]) -> AsyncIterator[dict]:
+        """
+        Analyze enrollment images in parallel, yielding one progress event per
+        image as soon as it finishes, then a final "done" event.
+        Saturation is checked here so a busy pool still raises
+        FaceWorkerPoolBusy up front; the slots themselves are taken when
+        iteration starts and released when the iterator finishes or is
+        closed, so a response that never starts streaming cannot leak them.
+        The enrollment takes one slot per image analyzed at once: up to
+        one per worker, fewer when the pool is already busy.
+        """
+        self._check_capacity()
+        return self._enrollment_events(user_id, face_images)
+
+    async def _enrollment_events(self, user_id: str, face_images: List[str]) -> AsyncIterator[dict]:
+        slots = max(1, min(self.workers, len(face_images), self.free_slots))
+        self._acquire(slots)
+        tasks = []
+        try:
+            # At most one image per slot at a time, so a single enrollment
+            # cannot flood the executor queue ahead of other requests
+            limit = asyncio.Semaphore(slots)
+
+            async def analyze(index: int, img_base64: str):
+                async with limit:
+                    return index, await self._submit("analyze_enrollment_image", img_base64)
+
+            total = len(face_images)
+            encodings_by_index = [None] * total
+            processed = 0
+            accepted = 0
+
+            tasks = [asyncio.create_task(analyze(idx, img)) for idx, img in enumerate(face_images)]
+            for next_done in asyncio.as_completed(tasks):
+                index, (encoding, outcome) = await next_done
+                encodings_by_index[index] = encoding
+                processed += 1
+                if encoding is not None:
+                    accepted += 1
+                yield {
+                    "event": "image",
+                    "index": index,
+                    "outcome": outcome,
+                    "processed": processed,
+                    "accepted": accepted,
+                    "total": total
+                }
+
+            # Keep the original image order for encodings and reference files
+            accepted_indexes = [i for i, enc in enumerate(encodings_by_index) if enc is not None]
+            encodings = [encodings_by_index[i] for i in accepted_indexes]
+            success, message, encodings = face_service.summarize_enrollment(encodings)
+
+            if success:
+                references = [
+                    face_images[i]
+                    for i in accepted_indexes[:face_service.MAX_REFERENCE_IMAGES]
+                ]
+                self._write_references_later(user_id, references)
+
+            yield {
+                "event": "done",
+                "success": success,
+                "message": message,
+                "encodings": encodings
+            }
+        finally:
+            # Client went away (or an image failed): drop the images not analyzed yet
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._release(slots)
+
+    def _write_references_later(self, user_id: str, images: List[str]):
+        """
+        Write reference JPEGs in the background, off the request path. The
+        enrollment already succeeded, so the writes are never rejected, but
+        each holds a slot until it finishes so new requests see the load.
+        """
+        async def write(number: int, img: str):
+            try:
+                return await self._submit("save_reference_face", user_id, number, img)
+            finally:
+                self._release()
+
+        async def write_all():
+            results = await asyncio.gather(
+                *[write(number, img) for number, img in enumerate(images, 1)],
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"Error saving reference face for {user_id}: {result}")
+
+        self._in_flight += len(images)
+        task = asyncio.create_task(write_all())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def verify_face(self, face_image: str, template: FaceTemplate) -> Tuple[bool, float, str]:
+        return await self.run("verify_face", face_image, template)
+
+    async def enroll_faces(self, user_id: str, face_images: List[str]) -> Tuple[bool, str, List[List[float]]]:
+        """Parallel enrollment without progress events"""
+        result = (False, "Không có ảnh nào được xử lý", [])
+        # Drain the iterator completely so its admission slot is released
+        async for event in self.iter_enrollment(user_id, face_images):
+            if event["event"] == "done":
+                result = (event["success"], event["message"], event["encodings"])
+        return result
+
+    async def save_attendance_image(self, user_id: str, face_image: str, check_type: str) -> str:
+        return await self.run("save_attendance_image", user_id, face_image, check_type)
+
+    def stats(self) -> dict:
+        """Pool occupancy and per-stage latency, for sizing the pool"""
+        return {
+            "mode": "process" if self.processes > 0 else "thread",
+            "processes": self.processes,
+            "queue_size": self.queue_size,
+            "in_flight": self._in_flight,
+            "rejected": self.rejected,
+            "stages": {
+                stage: {
+                    "count": entry["count"],
+                    "avg_ms": round(entry["total_ms"] / entry["count"], 2),
+                    "max_ms": round(entry["max_ms"], 2)
+                }
+                for stage, entry in sorted(self._stages.items())
+            }
+        }
+
+# Singleton instance
+face_worker_pool = FaceWorkerPool(
+    processes=settings.FACE_WORKER_PROCESSES,
+    queue_size=settings.FACE_WORKER_QUEUE_SIZE
+)
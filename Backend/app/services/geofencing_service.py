@@ -16,10 +16,9 @@ class GeofencingService:
     
     async def get_settings_from_db(self):
         """Get company location settings from database"""
-        from ..database import get_database
+        from ..database import get_settings_collection
         try:
-            db = get_database()
-            settings_col = db["settings"]
+            settings_col = get_settings_collection()
             company_settings = await settings_col.find_one({"type": "company"})
             
             if company_settings:
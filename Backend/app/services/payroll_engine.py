@@ -0,0 +1,135 @@
+from calendar import monthrange
+from datetime import date
+from typing import Dict, Iterable, List, Sequence, Union
+
+import numpy as np
+
+def _number(value) -> Union[int, float]:
+    """Plain int for whole values (e.g. 2 days), float otherwise (1.5 days)"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+class WorkingMonth:
+    """
+    A month's working-day mask (Monday to Friday, minus company holidays),
+    built once per payroll run and shared by every employee.
+    """
+
+    def __init__(self, year: int, month: int, holidays: Iterable[str] = ()):
+        self.year = year
+        self.month = month
+        self.days = monthrange(year, month)[1]
+        self.first = np.datetime64(date(year, month, 1), "D")
+        self.mask = np.is_busday(
+            self.first + np.arange(self.days),
+            holidays=np.asarray(list(holidays), dtype="datetime64[D]")
+        )
+        self.total_working_days = int(self.mask.sum())
+
+    @property
+    def start(self) -> date:
+        return date(self.year, self.month, 1)
+
+    @property
+    def end(self) -> date:
+        return date(self.year, self.month, self.days)
+
+    def offsets(self, dates: Sequence[str]) -> np.ndarray:
+        """0-based day of month of ISO dates ("YYYY-MM-DD")"""
+        return (np.asarray(dates, dtype="datetime64[D]") - self.first).astype(np.int64)
+
+class PayrollEngine:
+    """
+    Working statistics for many employees at once. Attendance and paid
+    leave are loaded into (employees x days) matrices, so every count is a
+    single reduction over all employees instead of a loop per employee.
+
+    Counts follow the long-standing rules: a day is late/early-leave if
+    either its check-in or check-out has that status, every attended day
+    counts towards actual days, and absent = working days - actual days.
+    Paid leave on working days that were not attended is no longer counted
+    as absence; unpaid leave still is.
+    """
+
+    UNPAID_LEAVE_TYPES = {"UNPAID"}
+
+    def __init__(self, month: WorkingMonth, user_ids: Sequence[str]):
+        self.month = month
+        self.user_ids = list(user_ids)
+        self.rows = {user_id: i for i, user_id in enumerate(self.user_ids)}
+
+        shape = (len(self.user_ids), month.days)
+        self.attended = np.zeros(shape, dtype=bool)
+        self.late = np.zeros(shape, dtype=bool)
+        self.early_leave = np.zeros(shape, dtype=bool)
+        self.leave = np.zeros(shape, dtype=np.float64)  # 1 (or 0.5) per paid leave day
+        self.overtime_hours = np.zeros(len(self.user_ids), dtype=np.float64)
+
+    def add_attendance(self, rows: Iterable[dict]):
+        """Rows from DailyAttendanceRepository.status_days_by_user"""
+        users, dates, late, early = [], [], [], []
+        for row in rows:
+            i = self.rows.get(row["_id"])
+            if i is None:
+                continue
+            users.append(np.full(len(row["dates"]), i, dtype=np.int64))
+            dates.extend(row["dates"])
+            late.extend(row["late"])
+            early.extend(row["early"])
+
+        if not dates:
+            return
+
+        users = np.concatenate(users)
+        days = self.month.offsets(dates)
+        late = np.asarray(late, dtype=bool)
+        early = np.asarray(early, dtype=bool)
+
+        self.attended[users, days] = True
+        self.late[users[late], days[late]] = True
+        self.early_leave[users[early], days[early]] = True
+
+    def add_leaves(self, leaves: Iterable[dict]):
+        """Approved leave documents overlapping the month"""
+        for leave in leaves:
+            i = self.rows.get(leave["user_id"])
+            if i is None or leave.get("leave_type") in self.UNPAID_LEAVE_TYPES:
+                continue
+            start, end = self.month.offsets([leave["start_date"], leave["end_date"]])
+            start, end = max(start, 0), min(end, self.month.days - 1)
+            weight = 0.5 if leave.get("half_day") else 1.0
+
+            span = self.leave[i, start:end + 1]
+            np.maximum(span, weight, out=span)
+
+    def add_overtime(self, hours_by_user: Dict[str, float]):
+        """Approved OT hours per user"""
+        for user_id, hours in hours_by_user.items():
+            i = self.rows.get(user_id)
+            if i is not None:
+                self.overtime_hours[i] += hours or 0
+
+    def compute(self) -> List[dict]:
+        """Working statistics per employee, in user_ids order"""
+        working = self.month.mask
+        total = self.month.total_working_days
+
+        actual = self.attended.sum(axis=1)
+        late = self.late.sum(axis=1)
+        early_leave = self.early_leave.sum(axis=1)
+        leave_days = (self.leave * working).sum(axis=1)
+        excused = (self.leave * (working & ~self.attended)).sum(axis=1)
+        absent = np.maximum(0, total - actual - excused)
+
+        return [
+            {
+                "total_working_days": total,
+                "actual_working_days": int(actual[i]),
+                "late_days": int(late[i]),
+                "early_leave_days": int(early_leave[i]),
+                "absent_days": _number(absent[i]),
+                "leave_days": _number(leave_days[i]),
+                "overtime_hours": _number(self.overtime_hours[i])
+            }
+            for i in range(len(self.user_ids))
+        ]
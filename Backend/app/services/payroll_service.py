@@ -1,13 +1,23 @@
-from datetime import datetime
-from typing import List, Optional
-from ..database import get_attendance_collection, get_users_collection
-from ..models.attendance import AttendanceStatus
-from ..models.payroll import Payroll, PayrollDeduction, PayrollStatus
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ..config import settings
+from ..database import get_payrolls_collection, get_settings_collection
+from ..repositories import daily_attendance_repo, leaves_repo, overtime_repo, users_repo
+from ..models.payroll import Payroll, PayrollDeduction, PayrollStatus, PayrollSummary
+from .payroll_engine import PayrollEngine, WorkingMonth
+
+# MongoDB error code of a unique index violation
+DUPLICATE_KEY = 11000
 
 class PayrollService:
     """
     Payroll calculation service.
-    Automatically calculates salary based on attendance logs.
+    Automatically calculates salary from the daily attendance rollup,
+    approved leaves and approved OT (see PayrollEngine).
     """
     
     # Deduction rates
@@ -15,57 +25,43 @@ class PayrollService:
     EARLY_LEAVE_DEDUCTION_RATE = 50000
     ABSENT_DEDUCTION_RATE = 200000  # 200,000 VND per absent day
     
+    # Overtime pay: hourly rate (base salary / standard hours) x multiplier
+    STANDARD_HOURS_PER_DAY = 8
+    OVERTIME_PAY_MULTIPLIER = 1.5
+    
+    def __init__(self):
+        # Summaries of closed months (every payroll PAID), keyed by (year, month).
+        # Other workers cannot invalidate this one's cache, so entries expire
+        self._closed_summaries: Dict[Tuple[int, int], Tuple[float, PayrollSummary]] = {}
+    
+    async def working_month(self, month: int, year: int) -> WorkingMonth:
+        """Working-day mask of a month with the company holidays removed"""
+        company = await get_settings_collection().find_one({"type": "company"}, {"holidays": 1})
+        return WorkingMonth(year, month, (company or {}).get("holidays", []))
+    
+    async def load_engine(self, working_month: WorkingMonth, user_ids: List[str], user_id: str = None) -> PayrollEngine:
+        """
+        Engine with attendance, approved leaves and approved OT of the month
+        loaded. Pass user_id to read a single user's documents only.
+        """
+        start, end = working_month.start, working_month.end
+        attendance, leaves, overtime = await asyncio.gather(
+            daily_attendance_repo.status_days_by_user(start, end, user_id),
+            leaves_repo.approved_overlapping(start, end, user_id),
+            overtime_repo.approved_hours_by_user(start, end, user_id)
+        )
+        
+        engine = PayrollEngine(working_month, user_ids)
+        engine.add_attendance(attendance)
+        engine.add_leaves(leaves)
+        engine.add_overtime(overtime)
+        return engine
+    
     async def calculate_working_days(self, user_id: str, month: int, year: int) -> dict:
         """Calculate working statistics for a user in a specific month"""
-        attendance_col = get_attendance_collection()
-        
-        # Get all attendance logs for the month
-        start_date = datetime(year, month, 1)
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1)
-        else:
-            end_date = datetime(year, month + 1, 1)
-        
-        logs = await attendance_col.find({
-            "user_id": user_id,
-            "timestamp": {"$gte": start_date, "$lt": end_date}
-        }).to_list(None)
-        
-        # Count different statuses
-        late_days = set()
-        early_leave_days = set()
-        on_time_days = set()
-        
-        for log in logs:
-            day = log["timestamp"].date()
-            status = log.get("status")
-            
-            if status == AttendanceStatus.LATE.value:
-                late_days.add(day)
-            elif status == AttendanceStatus.EARLY_LEAVE.value:
-                early_leave_days.add(day)
-            elif status == AttendanceStatus.ON_TIME.value:
-                on_time_days.add(day)
-        
-        # Calculate working days in month (excluding weekends)
-        import calendar
-        total_working_days = 0
-        cal = calendar.monthcalendar(year, month)
-        for week in cal:
-            for i, day in enumerate(week):
-                if day != 0 and i < 5:  # Monday to Friday
-                    total_working_days += 1
-        
-        actual_days = len(late_days | early_leave_days | on_time_days)
-        absent_days = total_working_days - actual_days
-        
-        return {
-            "total_working_days": total_working_days,
-            "actual_working_days": actual_days,
-            "late_days": len(late_days),
-            "early_leave_days": len(early_leave_days),
-            "absent_days": max(0, absent_days)
-        }
+        working_month = await self.working_month(month, year)
+        engine = await self.load_engine(working_month, [user_id], user_id)
+        return engine.compute()[0]
     
     async def calculate_payroll(
         self, 
@@ -74,9 +70,28 @@ class PayrollService:
         year: int,
         base_salary: float,
         bonuses: List[dict] = None
+    ) -> Payroll:
+        """Calculate payroll for a user (see build_payroll for the formula)"""
+        # user_id is the string form of the user's ObjectId
+        user = await users_repo.get(user_id, {"full_name": 1, "department": 1})
+        
+        # Get working statistics
+        stats = await self.calculate_working_days(user_id, month, year)
+        
+        return self.build_payroll(user_id, user, month, year, stats, base_salary, bonuses)
+    
+    def build_payroll(
+        self,
+        user_id: str,
+        user: Optional[dict],
+        month: int,
+        year: int,
+        stats: dict,
+        base_salary: float,
+        bonuses: List[dict] = None
     ) -> Payroll:
         """
-        Calculate payroll for a user.
+        Build a payroll from working statistics.
         
         Formula:
         Net Salary = Base Salary - Deductions + Bonuses
@@ -85,15 +100,11 @@ class PayrollService:
         - Late days * LATE_DEDUCTION_RATE
         - Early leave days * EARLY_LEAVE_DEDUCTION_RATE
         - Absent days * ABSENT_DEDUCTION_RATE
-        """
-        users_col = get_users_collection()
-        user = await users_col.find_one({"_id": user_id})
-        
-        # Get working statistics
-        stats = await self.calculate_working_days(user_id, month, year)
         
-        # Calculate deductions
+        Approved OT is added as an "overtime" bonus.
+        """
         deductions = []
+        bonuses = list(bonuses or [])
         
         if stats["late_days"] > 0:
             deductions.append(PayrollDeduction(
@@ -116,11 +127,20 @@ class PayrollService:
                 amount=stats["absent_days"] * self.ABSENT_DEDUCTION_RATE
             ))
         
+        overtime_hours = stats.get("overtime_hours", 0)
+        if overtime_hours > 0 and stats["total_working_days"] > 0:
+            hourly_rate = base_salary / (stats["total_working_days"] * self.STANDARD_HOURS_PER_DAY)
+            bonuses.append({
+                "type": "overtime",
+                "description": f"Tăng ca {overtime_hours} giờ",
+                "amount": round(overtime_hours * hourly_rate * self.OVERTIME_PAY_MULTIPLIER)
+            })
+        
         total_deductions = sum(d.amount for d in deductions)
-        total_bonuses = sum(b.get("amount", 0) for b in (bonuses or []))
+        total_bonuses = sum(b.get("amount", 0) for b in bonuses)
         net_salary = base_salary - total_deductions + total_bonuses
         
-        payroll = Payroll(
+        return Payroll(
             user_id=user_id,
             user_name=user.get("full_name", "Unknown") if user else "Unknown",
             department=user.get("department") if user else None,
@@ -131,16 +151,193 @@ class PayrollService:
             late_days=stats["late_days"],
             early_leave_days=stats["early_leave_days"],
             absent_days=stats["absent_days"],
+            leave_days=stats.get("leave_days", 0),
+            overtime_hours=overtime_hours,
             base_salary=base_salary,
             deductions=deductions,
-            bonuses=bonuses or [],
+            bonuses=bonuses,
             total_deductions=total_deductions,
             total_bonuses=total_bonuses,
             net_salary=max(0, net_salary),
             status=PayrollStatus.DRAFT
         )
+    
+    async def run_payroll(
+        self,
+        month: int,
+        year: int,
+        overwrite: bool = False,
+        batch_size: int = 500
+    ) -> AsyncIterator[dict]:
+        """
+        Calculate payroll for every active employee of a month with one
+        aggregated query each for attendance, leaves and OT, a single
+        PayrollEngine pass and batched bulk upserts.
+        
+        Yields {"event": "progress", ...} after each written batch and a
+        final {"event": "done", ...} with counts and per-user errors.
+        Existing DRAFT payrolls are recalculated only with overwrite=True;
+        approved and paid ones are never touched. Employees need a
+        base_salary on their user document.
+        """
+        payrolls_col = get_payrolls_collection()
+        
+        users = await users_repo.active(
+            {"full_name": 1, "department": 1, "base_salary": 1}
+        ).to_list(None)
+        
+        existing = {
+            p["user_id"]: p["status"]
+            async for p in payrolls_col.find(
+                {"month": month, "year": year},
+                {"user_id": 1, "status": 1}
+            )
+        }
+        
+        working_month = await self.working_month(month, year)
+        engine = await self.load_engine(working_month, [str(u["_id"]) for u in users])
+        all_stats = engine.compute()
+        
+        created = updated = skipped = 0
+        errors = []
+        ops, op_users = [], []
+        
+        async def flush():
+            nonlocal created, updated, skipped
+            failed = 0
+            try:
+                result = await payrolls_col.bulk_write(ops, ordered=False)
+                details = result.bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+                for write_error in details.get("writeErrors", []):
+                    if write_error.get("code") == DUPLICATE_KEY:
+                        continue  # a concurrent run or /calculate inserted it first
+                    failed += 1
+                    user = op_users[write_error["index"]]
+                    errors.append({
+                        "user_id": str(user["_id"]),
+                        "user_name": user.get("full_name"),
+                        "error": write_error.get("errmsg", "Lỗi ghi dữ liệu")
+                    })
+            created += details.get("nUpserted", 0)
+            updated += details.get("nModified", 0)
+            # Writes that changed nothing: a draft approved since it was read
+            # (its ReplaceOne no longer matches), or a payroll inserted first
+            # by a concurrent run (matched, or rejected by the unique index)
+            skipped += len(ops) - details.get("nUpserted", 0) - details.get("nModified", 0) - failed
+            ops.clear()
+            op_users.clear()
+        
+        for processed, (user, stats) in enumerate(zip(users, all_stats), 1):
+            user_id = str(user["_id"])
+            status = existing.get(user_id)
+            
+            if status and (not overwrite or status != PayrollStatus.DRAFT.value):
+                skipped += 1
+            elif not user.get("base_salary"):
+                errors.append({
+                    "user_id": user_id,
+                    "user_name": user.get("full_name"),
+                    "error": "Chưa có lương cơ bản"
+                })
+            else:
+                try:
+                    payroll = self.build_payroll(user_id, user, month, year, stats, user["base_salary"])
+                    doc = payroll.dict()
+                    
+                    if status:
+                        # Only replace if it is still a draft when the write lands
+                        ops.append(ReplaceOne(
+                            {"user_id": user_id, "month": month, "year": year, "status": PayrollStatus.DRAFT.value},
+                            doc
+                        ))
+                    else:
+                        # Insert unless a concurrent run got there first
+                        # (the unique (user_id, month, year) index decides)
+                        ops.append(UpdateOne(
+                            {"user_id": user_id, "month": month, "year": year},
+                            {"$setOnInsert": doc},
+                            upsert=True
+                        ))
+                    op_users.append(user)
+                except Exception as e:
+                    errors.append({"user_id": user_id, "user_name": user.get("full_name"), "error": str(e)})
+            
+            if len(ops) >= batch_size:
+                await flush()
+                yield {"event": "progress", "processed": processed, "total": len(users)}
+        
+        if ops:
+            await flush()
+        self.invalidate_summary(month, year)
+        
+        yield {
+            "event": "done",
+            "month": month,
+            "year": year,
+            "total_employees": len(users),
+            "created": created,
+            "updated": updated,
+            "skipped": skipped,
+            "errors": errors
+        }
+    
+    async def get_summary(self, month: int, year: int) -> PayrollSummary:
+        """
+        Totals and status counts of a month's payrolls from one $group.
+        Months where every payroll is PAID rarely change, so their summary
+        is kept for PAYROLL_SUMMARY_CACHE_TTL_SECONDS or until
+        invalidate_summary() is called on this worker.
+        """
+        cached = self._closed_summaries.get((year, month))
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        
+        def count(status: PayrollStatus):
+            return {"$sum": {"$cond": [{"$eq": ["$status", status.value]}, 1, 0]}}
+        
+        pipeline = [
+            {"$match": {"month": month, "year": year}},
+            {"$group": {
+                "_id": None,
+                "total_employees": {"$sum": 1},
+                "total_gross_salary": {"$sum": "$base_salary"},
+                "total_deductions": {"$sum": "$total_deductions"},
+                "total_bonuses": {"$sum": "$total_bonuses"},
+                "total_net_salary": {"$sum": "$net_salary"},
+                "draft_count": count(PayrollStatus.DRAFT),
+                "approved_count": count(PayrollStatus.APPROVED),
+                "paid_count": count(PayrollStatus.PAID)
+            }}
+        ]
+        rows = await get_payrolls_collection().aggregate(pipeline).to_list(1)
+        totals = rows[0] if rows else {}
+        
+        summary = PayrollSummary(
+            month=month,
+            year=year,
+            total_employees=totals.get("total_employees", 0),
+            total_gross_salary=totals.get("total_gross_salary", 0),
+            total_deductions=totals.get("total_deductions", 0),
+            total_bonuses=totals.get("total_bonuses", 0),
+            total_net_salary=totals.get("total_net_salary", 0),
+            draft_count=totals.get("draft_count", 0),
+            approved_count=totals.get("approved_count", 0),
+            paid_count=totals.get("paid_count", 0)
+        )
         
-        return payroll
+        ttl = settings.PAYROLL_SUMMARY_CACHE_TTL_SECONDS
+        if ttl > 0 and summary.total_employees > 0 and summary.paid_count == summary.total_employees:
+            self._closed_summaries[(year, month)] = (time.monotonic() + ttl, summary)
+        return summary
+    
+    def invalidate_summary(self, month: Optional[int] = None, year: Optional[int] = None):
+        """Forget the cached summary of a month (all months if not given)"""
+        if month is None or year is None:
+            self._closed_summaries.clear()
+        else:
+            self._closed_summaries.pop((year, month), None)
     
     def generate_payment_qr(self, payroll: Payroll, bank_account: str) -> str:
         """
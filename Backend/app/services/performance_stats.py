@@ -0,0 +1,86 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..database import get_users_collection
+from ..models.user import UserRole
+from ..repositories import tasks_repo
+
+class PerformanceStats:
+    """
+    Task completion statistics per employee, computed from one $group on
+    tasks merged with a projected employee list. Results are cached for a
+    short TTL per (scope, department) and dropped by invalidate() whenever
+    a task is created, deleted, reassigned or changes status.
+    """
+
+    def __init__(self, ttl_seconds: float = 30):
+        self.ttl_seconds = ttl_seconds
+        # {(scope, department): (expires_at, result)}
+        self._entries: Dict[Tuple[str, Optional[str]], Tuple[float, List[dict]]] = {}
+
+    async def get(self, scope: str, department: Optional[str] = None) -> List[dict]:
+        """
+        Stats of EMPLOYEE users, best completion rate first. scope is
+        "department" (only `department`) or "company" (every department,
+        or only `department` if one is given).
+        """
+        key = (scope, department)
+        cached = self._entries.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        result = await self._compute(department)
+        if self.ttl_seconds > 0:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, result)
+        return result
+
+    def invalidate(self):
+        """Drop every cached result after tasks changed"""
+        self._entries.clear()
+
+    async def _compute(self, department: Optional[str]) -> List[dict]:
+        query = {"role": UserRole.EMPLOYEE.value}
+        if department is not None:
+            query["department"] = department
+        employees_cursor = get_users_collection().find(
+            query,
+            {"full_name": 1, "avatar": 1, "department": 1}
+        )
+
+        if department is None:
+            # Company-wide: group every assigned task, no $in over all employees
+            employees, counts = await asyncio.gather(
+                employees_cursor.to_list(None),
+                tasks_repo.counts_by_assignee()
+            )
+        else:
+            employees = await employees_cursor.to_list(None)
+            counts = await tasks_repo.counts_by_assignee([str(e["_id"]) for e in employees])
+
+        empty = {"total": 0, "completed": 0, "in_progress": 0}
+        result = []
+        for emp in employees:
+            emp_id = str(emp["_id"])
+            row = counts.get(emp_id, empty)
+            total_tasks = row["total"]
+            completion_rate = (row["completed"] / total_tasks * 100) if total_tasks > 0 else 0
+
+            result.append({
+                "user_id": emp_id,
+                "full_name": emp.get("full_name", "Unknown"),
+                "avatar": emp.get("avatar"),
+                "department": emp.get("department"),
+                "total_tasks": total_tasks,
+                "completed_tasks": row["completed"],
+                "in_progress_tasks": row["in_progress"],
+                "completion_rate": round(completion_rate, 1)
+            })
+
+        # Sort by completion rate
+        result.sort(key=lambda x: x["completion_rate"], reverse=True)
+        return result
+
+# Singleton instance
+performance_stats = PerformanceStats(ttl_seconds=settings.PERFORMANCE_STATS_CACHE_TTL_SECONDS)
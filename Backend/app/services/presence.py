@@ -0,0 +1,149 @@
+from typing import Dict, List, Optional, Set
+
+from ..config import settings
+
+class MemoryPresenceBackend:
+    """Presence kept in this process only - for a single worker"""
+
+    def __init__(self):
+        self._sids: Dict[str, Set[str]] = {}   # user_id -> sids
+        self._users: Dict[str, str] = {}       # sid -> user_id
+
+    async def add(self, user_id: str, sid: str):
+        self._users[sid] = user_id
+        self._sids.setdefault(user_id, set()).add(sid)
+
+    async def remove(self, sid: str) -> Optional[str]:
+        user_id = self._users.pop(sid, None)
+        if user_id is not None:
+            sids = self._sids.get(user_id)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._sids[user_id]
+        return user_id
+
+    async def user_of(self, sid: str) -> Optional[str]:
+        return self._users.get(sid)
+
+    async def sids_of(self, user_id: str) -> Set[str]:
+        return set(self._sids.get(user_id, ()))
+
+    async def online(self, user_ids: List[str]) -> Set[str]:
+        return {user_id for user_id in user_ids if user_id in self._sids}
+
+    async def clear_sids(self, sids: List[str]):
+        for sid in sids:
+            await self.remove(sid)
+
+class RedisPresenceBackend:
+    """
+    Presence shared by every worker through a Redis-compatible store
+    (anything with the redis.asyncio command and pipeline methods used
+    here, e.g. a local stand-in in tests). Layout, under `prefix`:
+      <prefix>:sid          hash  sid -> user_id
+      <prefix>:user:<id>    set   the user's sids on all workers
+    Every command is O(1) in the number of connected users. The hash and
+    the user's set are changed together in one MULTI/EXEC so they never
+    disagree, and online() asks about many users in one round trip.
+    """
+
+    def __init__(self, client, prefix: str = "presence"):
+        self.client = client
+        self.prefix = prefix
+
+    def _user_key(self, user_id: str) -> str:
+        return f"{self.prefix}:user:{user_id}"
+
+    @property
+    def _sid_key(self) -> str:
+        return f"{self.prefix}:sid"
+
+    async def add(self, user_id: str, sid: str):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(self._sid_key, sid, user_id)
+            pipe.sadd(self._user_key(user_id), sid)
+            await pipe.execute()
+
+    async def remove(self, sid: str) -> Optional[str]:
+        user_id = await self.client.hget(self._sid_key, sid)
+        if user_id is None:
+            return None
+        if isinstance(user_id, bytes):
+            user_id = user_id.decode()
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hdel(self._sid_key, sid)
+            pipe.srem(self._user_key(user_id), sid)
+            await pipe.execute()
+        return user_id
+
+    async def user_of(self, sid: str) -> Optional[str]:
+        user_id = await self.client.hget(self._sid_key, sid)
+        return user_id.decode() if isinstance(user_id, bytes) else user_id
+
+    async def sids_of(self, user_id: str) -> Set[str]:
+        sids = await self.client.smembers(self._user_key(user_id))
+        return {s.decode() if isinstance(s, bytes) else s for s in sids}
+
+    async def online(self, user_ids: List[str]) -> Set[str]:
+        if not user_ids:
+            return set()
+        async with self.client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.scard(self._user_key(user_id))
+            counts = await pipe.execute()
+        return {user_id for user_id, count in zip(user_ids, counts) if count}
+
+    async def clear_sids(self, sids: List[str]):
+        for sid in sids:
+            await self.remove(sid)
+
+class Presence:
+    """
+    Who is connected to Socket.IO: several sids per user (tabs, devices)
+    and a sid -> user reverse index, so connect and disconnect are O(1).
+    With the redis backend presence is shared across workers; each worker
+    also remembers its own sids so it can remove them on shutdown instead
+    of leaving them behind as ghosts.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        # This worker's sids, for cleanup on shutdown
+        self._local_sids: Set[str] = set()
+
+    async def connect(self, sid: str, user_id: str):
+        self._local_sids.add(sid)
+        await self.backend.add(user_id, sid)
+
+    async def disconnect(self, sid: str) -> Optional[str]:
+        """Forget a sid and return its user (None if it never identified)"""
+        self._local_sids.discard(sid)
+        return await self.backend.remove(sid)
+
+    async def user_of(self, sid: str) -> Optional[str]:
+        return await self.backend.user_of(sid)
+
+    async def sids_of(self, user_id: str) -> Set[str]:
+        return await self.backend.sids_of(user_id)
+
+    async def is_online(self, user_id: str) -> bool:
+        return bool(await self.backend.online([user_id]))
+
+    async def online(self, user_ids: List[str]) -> Set[str]:
+        return await self.backend.online(user_ids)
+
+    async def shutdown(self):
+        """Remove this worker's connections from shared presence"""
+        await self.backend.clear_sids(list(self._local_sids))
+        self._local_sids.clear()
+
+def create_presence() -> Presence:
+    """Presence with the backend chosen by PRESENCE_BACKEND (memory or redis)"""
+    if settings.PRESENCE_BACKEND == "redis":
+        import redis.asyncio as redis  # only needed for multi-worker setups
+        return Presence(RedisPresenceBackend(redis.from_url(settings.REDIS_URL), prefix=f"{settings.DATABASE_NAME}:presence"))
+    return Presence(MemoryPresenceBackend())
+
+# Singleton instance
+presence = create_presence()
@@ -0,0 +1,84 @@
+import time
+from typing import Dict, Optional, Tuple
+
+from ..config import settings
+
+class PrincipalCache:
+    """
+    Short-TTL cache of authenticated principals keyed by (user id, token).
+    Holds only the projected fields that authorization needs, so most
+    requests skip the users lookup entirely. Must be invalidated when a
+    user's role, status, department or name changes.
+    """
+
+    # Fields loaded for every authenticated request
+    PROJECTION = {
+        "_id": 1,
+        "email": 1,
+        "full_name": 1,
+        "role": 1,
+        "status": 1,
+        "department": 1
+    }
+
+    def __init__(self, ttl_seconds: float = 30, max_size: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        # {user_id: {token: (expires_at, principal)}}
+        self._entries: Dict[str, Dict[str, Tuple[float, dict]]] = {}
+        self._size = 0
+
+    def get(self, user_id: str, token: str) -> Optional[dict]:
+        tokens = self._entries.get(user_id)
+        if not tokens or token not in tokens:
+            return None
+
+        expires_at, principal = tokens[token]
+        if expires_at < time.monotonic():
+            del tokens[token]
+            self._size -= 1
+            if not tokens:
+                del self._entries[user_id]
+            return None
+
+        # Hand out a copy so handlers cannot change the cached principal
+        return dict(principal)
+
+    def put(self, user_id: str, token: str, principal: dict):
+        if self.ttl_seconds <= 0:
+            return
+        if self._size >= self.max_size:
+            self._evict_expired()
+        if self._size >= self.max_size:
+            self.clear()
+
+        tokens = self._entries.setdefault(user_id, {})
+        if token not in tokens:
+            self._size += 1
+        tokens[token] = (time.monotonic() + self.ttl_seconds, dict(principal))
+
+    def invalidate(self, user_id: str):
+        """Drop every cached token of a user"""
+        tokens = self._entries.pop(str(user_id), None)
+        if tokens:
+            self._size -= len(tokens)
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for user_id in list(self._entries):
+            tokens = self._entries[user_id]
+            for token in [t for t, (expires_at, _) in tokens.items() if expires_at < now]:
+                del tokens[token]
+                self._size -= 1
+            if not tokens:
+                del self._entries[user_id]
+
+# Singleton instance
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS,
+    max_size=settings.AUTH_PRINCIPAL_CACHE_SIZE
+)
@@ -0,0 +1,153 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateMany
+
+from ..database import get_messages_collection
+from ..models.chat import MessageStatus
+from ..repositories import read_cursors_repo
+
+class ReceiptBuffer:
+    """
+    Delivered and seen receipts, buffered briefly per conversation and
+    written together. Opening a busy group chat reports many messages for
+    many members at once; everything received within `flush_interval`
+    costs one lookup of the messages (conversation and sender), one
+    unordered bulk_write of update_many operations for delivered receipts
+    (one per conversation and user, plus one status update) and one of
+    read-cursor moves for seen receipts, instead of an update (and a
+    read-back) per message.
+
+    Senders are notified in their user room (every tab, on any node) with
+    one coalesced event per flush, replacing the old per-message
+    {message_id, status, delivered_to} payload:
+        message_status_update {
+            "conversation_id": ...,
+            "delivered": {user_id: [message_id, ...]},
+            "seen": {user_id: [message_id, ...]}
+        }
+    listing only that sender's messages. Viewers of the conversation room
+    still get messages_seen per user, as before.
+    """
+
+    DELIVERED = "delivered"
+    SEEN = "seen"
+
+    def __init__(self, emit: Callable[..., Awaitable], user_room: Callable[[str], str], flush_interval: float):
+        self.emit = emit
+        self.user_room = user_room
+        self.flush_interval = flush_interval
+        # conversation_id (None if the client did not send it) -> kind -> user_id -> message ids
+        self._pending: Dict[Optional[str], Dict[str, Dict[str, Set[str]]]] = {}
+        # (conversation_id, user_id) -> sids that reported seen, so it is not echoed back to them
+        self._seen_sids: Dict[Tuple[str, str], Set[str]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def add(self, kind: str, conversation_id: Optional[str], user_id: str,
+            message_ids: Iterable[str], sid: Optional[str] = None):
+        """Queue receipts; they are written on the next flush"""
+        ids = {str(m) for m in message_ids if ObjectId.is_valid(m)}
+        if not ids:
+            return
+        users = self._pending.setdefault(conversation_id, {}).setdefault(kind, {})
+        users.setdefault(user_id, set()).update(ids)
+        if sid and kind == self.SEEN:
+            self._seen_sids.setdefault((conversation_id, user_id), set()).add(sid)
+
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Error writing message receipts: {e}")
+
+    async def flush(self):
+        """Write and announce everything buffered so far"""
+        pending, self._pending = self._pending, {}
+        seen_sids, self._seen_sids = self._seen_sids, {}
+        if not pending:
+            return
+
+        msg_col = get_messages_collection()
+
+        # One lookup for every message: its conversation (when the client
+        # did not send it, or sent a wrong one) and its sender
+        all_ids = {i for kinds in pending.values() for users in kinds.values() for ids in users.values() for i in ids}
+        messages = {
+            str(doc["_id"]): doc
+            async for doc in msg_col.find(
+                {"_id": {"$in": [ObjectId(i) for i in all_ids]}},
+                {"conversation_id": 1, "sender_id": 1}
+            )
+        }
+
+        # conversation_id -> kind -> user_id -> message ids, checked against the messages
+        receipts: Dict[str, Dict[str, Dict[str, Set[str]]]] = {}
+        for conversation_id, kinds in pending.items():
+            for kind, users in kinds.items():
+                for user_id, ids in users.items():
+                    for message_id in ids:
+                        message = messages.get(message_id)
+                        if message is None or conversation_id not in (None, message["conversation_id"]):
+                            continue
+                        receipts.setdefault(message["conversation_id"], {}).setdefault(kind, {}) \
+                            .setdefault(user_id, set()).add(message_id)
+
+        operations = []
+        delivered_ids = set()
+        read_positions = {}
+        for conversation_id, kinds in receipts.items():
+            for user_id, ids in kinds.get(self.DELIVERED, {}).items():
+                operations.append(UpdateMany(
+                    {"_id": {"$in": [ObjectId(i) for i in ids]}},
+                    {"$addToSet": {"delivered_to": user_id}}
+                ))
+                delivered_ids.update(ids)
+            # Seen = the user's read cursor moves to the newest message seen
+            for user_id, ids in kinds.get(self.SEEN, {}).items():
+                read_positions[(conversation_id, user_id)] = max(ids, key=ObjectId)
+
+        if operations:
+            # Status only moves forward; SEEN is derived from read cursors
+            operations.append(UpdateMany(
+                {"_id": {"$in": [ObjectId(i) for i in delivered_ids]}, "status": MessageStatus.SENT.value},
+                {"$set": {"status": MessageStatus.DELIVERED.value}}
+            ))
+            await msg_col.bulk_write(operations, ordered=False)
+        await read_cursors_repo.advance_many(read_positions)
+
+        for conversation_id, kinds in receipts.items():
+            # One event per sender, about that sender's messages only
+            updates: Dict[str, dict] = {}
+            for kind in (self.DELIVERED, self.SEEN):
+                for user_id, ids in kinds.get(kind, {}).items():
+                    for message_id in sorted(ids):
+                        sender_id = messages[message_id]["sender_id"]
+                        if sender_id == user_id:
+                            continue
+                        update = updates.setdefault(sender_id, {
+                            "conversation_id": conversation_id, self.DELIVERED: {}, self.SEEN: {}
+                        })
+                        update[kind].setdefault(user_id, []).append(message_id)
+            for sender_id, update in updates.items():
+                await self.emit("message_status_update", update, room=self.user_room(sender_id))
+
+            # Per-user event the chat page already listens to
+            for user_id, ids in kinds.get(self.SEEN, {}).items():
+                await self.emit("messages_seen", {
+                    "conversation_id": conversation_id,
+                    "message_ids": sorted(ids),
+                    "seen_by": user_id
+                }, room=conversation_id, skip_sid=list(seen_sids.get((conversation_id, user_id), ())))
+
+    async def shutdown(self):
+        """Write what is still buffered (call before closing MongoDB)"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
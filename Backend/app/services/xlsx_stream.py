@@ -0,0 +1,214 @@
+import io
+import re
+import zipfile
+from typing import AsyncIterator, Callable, List, Optional, Sequence
+from xml.sax.saxutils import escape
+
+# Style ids in styles.xml (cellXfs order)
+STYLE_DEFAULT = 0
+STYLE_HEADER = 1   # bold white on indigo, thin border, centered
+STYLE_BODY = 2     # thin border, centered
+STYLE_BOLD = 3     # bold only (summary rows)
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# One shared style table for every cell instead of a style object per cell
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="3">'
+    '<font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><color rgb="FFFFFFFF"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font>'
+    '</fonts>'
+    '<fills count="3">'
+    '<fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="FF4F46E5"/><bgColor rgb="FF4F46E5"/></patternFill></fill>'
+    '</fills>'
+    '<borders count="2">'
+    '<border><left/><right/><top/><bottom/><diagonal/></border>'
+    '<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border>'
+    '</borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="2" borderId="1" xfId="0" applyFont="1" applyFill="1" applyBorder="1" applyAlignment="1"><alignment horizontal="center"/></xf>'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="1" xfId="0" applyBorder="1" applyAlignment="1"><alignment horizontal="center"/></xf>'
+    '<xf numFmtId="0" fontId="2" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_INVALID_TITLE_CHARS = re.compile(r"[\\*?:/\[\]]")
+# Characters XML 1.0 does not allow, even escaped
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+def column_letter(index: int) -> str:
+    """1 -> A, 27 -> AA"""
+    letters = ""
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def _cell_xml(ref: str, value, style: int) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" s="{style}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}" s="{style}"><v>{value}</v></c>'
+    text = escape(_INVALID_XML_CHARS.sub("", str(value)))
+    return f'<c r="{ref}" s="{style}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+def _entry(name: str) -> zipfile.ZipInfo:
+    """Zip entry with a fixed timestamp, so equal data gives equal bytes"""
+    info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+class _ChunkSink(io.RawIOBase):
+    """Non-seekable sink; zipfile then streams entries with data descriptors"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class XlsxStreamWriter:
+    """
+    Minimal single-sheet XLSX writer that yields the file as it is produced.
+    Rows are written straight into the deflate stream, so memory stays flat
+    and the first bytes reach the client before the last row is read.
+    """
+
+    def __init__(
+        self,
+        title: str,
+        headers: Sequence[str],
+        widths: Sequence[float] = (),
+        flush_rows: int = 500
+    ):
+        self.title = _INVALID_TITLE_CHARS.sub("-", title)[:31] or "Sheet1"
+        self.headers = list(headers)
+        self.widths = list(widths)
+        self.flush_rows = flush_rows
+        self._letters = [column_letter(i) for i in range(1, len(self.headers) + 1)]
+
+    def _letter(self, index: int) -> str:
+        if index < len(self._letters):
+            return self._letters[index]
+        return column_letter(index + 1)
+
+    def _row_xml(self, row_number: int, values: Sequence, style: int) -> str:
+        cells = "".join(
+            _cell_xml(f"{self._letter(i)}{row_number}", value, style)
+            for i, value in enumerate(values)
+        )
+        return f'<row r="{row_number}">{cells}</row>'
+
+    def _workbook_xml(self) -> str:
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(self.title, {chr(34): "&quot;"})}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        )
+
+    def _sheet_head(self) -> str:
+        cols = "".join(
+            f'<col min="{i}" max="{i}" width="{width}" customWidth="1"/>'
+            for i, width in enumerate(self.widths, 1)
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            + (f"<cols>{cols}</cols>" if cols else "")
+            + "<sheetData>"
+        )
+
+    async def stream(
+        self,
+        rows: AsyncIterator[Sequence],
+        footer: Optional[Callable[[], List[Sequence]]] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Yield the XLSX file in chunks. rows are written below the header with
+        the body style; footer (called after the last row) returns bold rows
+        placed after one blank row. None values leave the cell empty.
+        """
+        sink = _ChunkSink()
+        zf = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED)
+        zf.writestr(_entry("[Content_Types].xml"), _CONTENT_TYPES)
+        zf.writestr(_entry("_rels/.rels"), _ROOT_RELS)
+        zf.writestr(_entry("xl/workbook.xml"), self._workbook_xml())
+        zf.writestr(_entry("xl/_rels/workbook.xml.rels"), _WORKBOOK_RELS)
+        zf.writestr(_entry("xl/styles.xml"), _STYLES)
+
+        with zf.open(_entry("xl/worksheets/sheet1.xml"), "w") as sheet:
+            sheet.write(self._sheet_head().encode())
+            sheet.write(self._row_xml(1, self.headers, STYLE_HEADER).encode())
+            yield sink.drain()
+
+            row_number = 1
+            buffered = []
+            async for values in rows:
+                row_number += 1
+                buffered.append(self._row_xml(row_number, values, STYLE_BODY))
+                if len(buffered) >= self.flush_rows:
+                    sheet.write("".join(buffered).encode())
+                    buffered.clear()
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+
+            if footer:
+                row_number += 1  # blank separator row
+                for values in footer():
+                    row_number += 1
+                    buffered.append(self._row_xml(row_number, values, STYLE_BOLD))
+
+            buffered.append("</sheetData></worksheet>")
+            sheet.write("".join(buffered).encode())
+
+        zf.close()
+        yield sink.drain()
@@ -2,46 +2,61 @@ import socketio
 from datetime import datetime
 from bson import ObjectId
 
+from .config import settings
 from .database import get_messages_collection, get_conversations_collection
 from .models.chat import MessageStatus
+from .services.presence import presence
+from .services.receipts import ReceiptBuffer
+
+def create_client_manager():
+    """
+    Pub/sub manager for multi-node mode, chosen by SOCKETIO_MESSAGE_QUEUE.
+    Every node publishes its emits to the queue and delivers the ones for
+    its own clients, so rooms and sids work across nodes. None = single node.
+    """
+    url = settings.SOCKETIO_MESSAGE_QUEUE
+    if not url:
+        return None
+    channel = f"{settings.DATABASE_NAME}:socketio"
+    if url.startswith("amqp"):
+        return socketio.AsyncAioPikaManager(url, channel=channel)
+    return socketio.AsyncRedisManager(url, channel=channel)
 
 # Create Socket.IO server
 sio = socketio.AsyncServer(
     async_mode='asgi',
     cors_allowed_origins='*',
+    client_manager=create_client_manager(),
     logger=True,
     engineio_logger=True
 )
 
-# Store connected users: {user_id: sid}
-connected_users = {}
+def user_room(user_id: str) -> str:
+    """Room of every connection (tab, device) of one user"""
+    return f"user:{user_id}"
 
 @sio.event
 async def connect(sid, environ, auth):
-    """Handle client connection"""
+    """
+    Handle client connection. Only the user's own room is joined - new
+    messages are fanned out to the participants' user rooms, and a
+    conversation room is joined on demand (join_conversation) while the
+    chat is open - so connecting never touches the database.
+    """
     print(f"Client connected: {sid}")
     if auth and auth.get("user_id"):
         user_id = auth["user_id"]
-        connected_users[user_id] = sid
+        await presence.connect(sid, user_id)
+        await sio.enter_room(sid, user_room(user_id))
         print(f"User {user_id} connected with SID {sid}")
-        
-        # Join user's conversation rooms
-        conv_col = get_conversations_collection()
-        conversations = await conv_col.find({"participants": user_id}).to_list(None)
-        for conv in conversations:
-            await sio.enter_room(sid, str(conv["_id"]))
-            print(f"User {user_id} joined room {conv['_id']}")
 
 @sio.event
 async def disconnect(sid):
     """Handle client disconnection"""
     print(f"Client disconnected: {sid}")
-    # Remove from connected users
-    for user_id, user_sid in list(connected_users.items()):
-        if user_sid == sid:
-            del connected_users[user_id]
-            print(f"User {user_id} disconnected")
-            break
+    user_id = await presence.disconnect(sid)
+    if user_id:
+        print(f"User {user_id} disconnected")
 
 @sio.event
 async def join_conversation(sid, data):
@@ -121,56 +136,36 @@ async def send_message(sid, data):
     message["id"] = str(result.inserted_id)
     message["created_at"] = message["created_at"].isoformat()
     
-    # Update conversation's last message
-    await conv_col.update_one(
+    # Update conversation's last message, reading back its participants
+    conv = await conv_col.find_one_and_update(
         {"_id": ObjectId(conversation_id)},
         {"$set": {
             "last_message": content[:50] + "..." if len(content) > 50 else content,
             "last_message_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
-        }}
+        }},
+        projection={"participants": 1}
     )
     
-    # Broadcast to conversation room
-    await sio.emit("new_message", message, room=conversation_id)
-    print(f"Message sent to room {conversation_id}: {content[:30]}...")
+    # Fan out to every participant's user room (all their tabs, on any node)
+    rooms = [user_room(p) for p in conv["participants"]] if conv else conversation_id
+    await sio.emit("new_message", message, room=rooms)
+    print(f"Message sent to conversation {conversation_id}: {content[:30]}...")
 
 @sio.event
 async def message_delivered(sid, data):
-    """Mark message as delivered"""
-    msg_col = get_messages_collection()
-    
-    message_id = data.get("message_id")
+    """Mark message(s) as delivered - buffered, see ReceiptBuffer"""
+    message_ids = data.get("message_ids") or [data.get("message_id")]
     user_id = data.get("user_id")
     
-    if not message_id or not user_id:
+    if not message_ids[0] or not user_id:
         return
     
-    # Add user to delivered_to list
-    await msg_col.update_one(
-        {"_id": ObjectId(message_id)},
-        {
-            "$addToSet": {"delivered_to": user_id},
-            "$set": {"status": MessageStatus.DELIVERED.value}
-        }
-    )
-    
-    # Get message to notify sender
-    message = await msg_col.find_one({"_id": ObjectId(message_id)})
-    if message:
-        sender_sid = connected_users.get(message["sender_id"])
-        if sender_sid:
-            await sio.emit("message_status_update", {
-                "message_id": message_id,
-                "status": MessageStatus.DELIVERED.value,
-                "delivered_to": user_id
-            }, to=sender_sid)
+    receipts.add(ReceiptBuffer.DELIVERED, data.get("conversation_id"), user_id, message_ids)
 
 @sio.event
 async def mark_seen(sid, data):
-    """Mark messages as seen"""
-    msg_col = get_messages_collection()
-    
+    """Mark messages as seen - buffered, see ReceiptBuffer"""
     conversation_id = data.get("conversation_id")
     message_ids = data.get("message_ids", [])
     user_id = data.get("user_id")
@@ -178,23 +173,7 @@ async def mark_seen(sid, data):
     if not conversation_id or not user_id:
         return
     
-    # Update all messages in conversation
-    if message_ids:
-        for msg_id in message_ids:
-            await msg_col.update_one(
-                {"_id": ObjectId(msg_id)},
-                {
-                    "$addToSet": {"seen_by": user_id},
-                    "$set": {"status": MessageStatus.SEEN.value}
-                }
-            )
-    
-    # Notify other participants
-    await sio.emit("messages_seen", {
-        "conversation_id": conversation_id,
-        "message_ids": message_ids,
-        "seen_by": user_id
-    }, room=conversation_id, skip_sid=sid)
+    receipts.add(ReceiptBuffer.SEEN, conversation_id, user_id, message_ids, sid=sid)
 
 @sio.event
 async def typing(sid, data):
@@ -240,12 +219,20 @@ async def revoke_message(sid, data):
         {"$set": {"is_revoked": True}}
     )
     
-    # Broadcast to conversation
+    # Fan out to every participant's user room, like new messages
+    conv = await get_conversations_collection().find_one(
+        {"_id": ObjectId(message["conversation_id"])},
+        {"participants": 1}
+    )
+    rooms = [user_room(p) for p in conv["participants"]] if conv else message["conversation_id"]
     await sio.emit("message_revoked", {
         "message_id": message_id,
         "conversation_id": message["conversation_id"]
-    }, room=message["conversation_id"])
+    }, room=rooms)
     print(f"Message {message_id} revoked")
 
+# Delivered/seen receipts, written in batches
+receipts = ReceiptBuffer(sio.emit, user_room, settings.CHAT_RECEIPT_FLUSH_MS / 1000)
+
 # Create ASGI app for Socket.IO
 socket_app = socketio.ASGIApp(sio)
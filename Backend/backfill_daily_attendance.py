@@ -0,0 +1,86 @@
+"""
+Script to rebuild the daily_attendance rollup from attendance_logs.
+Groups logs per (user, day) on the server and writes one document per day
+with check-in/check-out time, status and worked hours. Existing rollup
+documents for those days are replaced, so it is safe to run more than once.
+Run: python backfill_daily_attendance.py [YYYY-MM]   (default: all months)
+"""
+import asyncio
+import sys
+from calendar import monthrange
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne
+
+from app.config import settings
+
+BATCH_SIZE = 500
+
+def build_day(user_id: str, date: str, user_name: str, logs: list) -> dict:
+    """Same shape as DailyAttendanceRepository.record_check_in/out"""
+    check_ins = sorted((l for l in logs if l["type"] == "CHECK_IN"), key=lambda l: l["timestamp"])
+    check_outs = sorted((l for l in logs if l["type"] == "CHECK_OUT"), key=lambda l: l["timestamp"])
+
+    doc = {"user_id": user_id, "date": date, "user_name": user_name, "updated_at": datetime.utcnow()}
+    if check_ins:
+        doc["check_in_time"] = check_ins[0]["timestamp"]
+        doc["check_in_status"] = check_ins[0]["status"]
+    if check_outs:
+        doc["check_out_time"] = check_outs[-1]["timestamp"]
+        doc["check_out_status"] = check_outs[-1]["status"]
+    if check_ins and check_outs:
+        hours = (doc["check_out_time"] - doc["check_in_time"]).total_seconds() / 3600
+        doc["total_hours"] = round(hours, 2)
+    return doc
+
+async def backfill(month_arg: str = None):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.DATABASE_NAME]
+    logs_col = db["attendance_logs"]
+    daily_col = db["daily_attendance"]
+
+    await daily_col.create_index([("user_id", 1), ("date", 1)], unique=True)
+    await daily_col.create_index([("date", 1)])
+
+    match = {}
+    if month_arg:
+        year, month = map(int, month_arg.split("-"))
+        match["timestamp"] = {
+            "$gte": datetime(year, month, 1),
+            "$lte": datetime(year, month, monthrange(year, month)[1], 23, 59, 59, 999999)
+        }
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}
+            },
+            "user_name": {"$last": "$user_name"},
+            "logs": {"$push": {"type": "$attendance_type", "status": "$status", "timestamp": "$timestamp"}}
+        }}
+    ]
+
+    written = 0
+    ops = []
+    async for group in logs_col.aggregate(pipeline, allowDiskUse=True):
+        key = group["_id"]
+        doc = build_day(key["user_id"], key["date"], group.get("user_name"), group["logs"])
+        ops.append(ReplaceOne({"user_id": key["user_id"], "date": key["date"]}, doc, upsert=True))
+
+        if len(ops) >= BATCH_SIZE:
+            await daily_col.bulk_write(ops, ordered=False)
+            written += len(ops)
+            ops = []
+
+    if ops:
+        await daily_col.bulk_write(ops, ordered=False)
+        written += len(ops)
+
+    print(f"✅ Rebuilt {written} daily_attendance documents")
+
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(backfill(sys.argv[1] if len(sys.argv) > 1 else None))
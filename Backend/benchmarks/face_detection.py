@@ -0,0 +1,74 @@
+"""
+Benchmark: full-resolution Haar detection vs coarse-to-fine detection.
+Reports latency and hit rate on a folder of sample frames (jpg/png),
+searched recursively. Defaults to the enrolled reference faces in face_data.
+Run from the Backend folder: python -m benchmarks.face_detection [frames_dir]
+"""
+import os
+import sys
+import time
+import cv2
+
+from app.config import settings
+from app.services.face_recognition_service import face_service
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+def load_frames(folder: str) -> list:
+    frames = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                img = cv2.imread(os.path.join(root, name))
+                if img is not None:
+                    frames.append(img)
+    return frames
+
+def iou(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+def run(frames: list, coarse_to_fine: bool):
+    boxes, latencies = [], []
+    for img in frames:
+        start = time.perf_counter()
+        boxes.append(face_service.detect_face(img, coarse_to_fine=coarse_to_fine))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return boxes, sorted(latencies)
+
+def report(label: str, boxes: list, latencies: list):
+    hits = sum(1 for b in boxes if b is not None)
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"  {label:<15}: hit rate {hits}/{len(boxes)} ({hits / len(boxes) * 100:.1f}%), "
+          f"avg {sum(latencies) / len(latencies):.2f} ms, p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else settings.FACE_DATA_PATH
+    frames = load_frames(folder)
+    if not frames:
+        print(f"No sample frames found in {folder}")
+        return
+
+    print(f"{len(frames)} frames from {folder}, downscale {settings.FACE_DETECT_DOWNSCALE}, "
+          f"coarse scaleFactor {settings.FACE_DETECT_COARSE_SCALE_FACTOR}")
+
+    # Warm up the cascade once so the first frame does not skew latency
+    face_service.detect_face(frames[0], coarse_to_fine=False)
+
+    full_boxes, full_latency = run(frames, coarse_to_fine=False)
+    fast_boxes, fast_latency = run(frames, coarse_to_fine=True)
+    report("full resolution", full_boxes, full_latency)
+    report("coarse-to-fine", fast_boxes, fast_latency)
+
+    both = [(a, b) for a, b in zip(full_boxes, fast_boxes) if a is not None and b is not None]
+    if both:
+        print(f"  mean IoU vs full-resolution box: {sum(iou(a, b) for a, b in both) / len(both):.3f}")
+
+if __name__ == "__main__":
+    main()
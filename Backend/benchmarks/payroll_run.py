@@ -0,0 +1,116 @@
+"""
+Benchmark: monthly payroll for every employee, one /api/payroll/calculate
+call per user vs a single payroll run.
+Seeds 5,000 active users with a base salary x 22 working days of the
+daily_attendance rollup into a separate database (<DATABASE_NAME>_bench)
+on MONGODB_URL, then times the per-user loop (existing-payroll check,
+calculation, insert_one) against PayrollService.run_payroll.
+Run from the Backend folder: python -m benchmarks.payroll_run
+"""
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from app import database
+from app.config import settings
+from app.services.payroll_service import payroll_service
+
+USERS = 5000
+DAYS = 22
+MONTH, YEAR = 1, 2025  # 23 weekdays, so all 22 days fall inside the month
+
+async def seed(db):
+    await db["users"].drop()
+    await db["daily_attendance"].drop()
+    await db["payrolls"].drop()
+    await database.ensure_indexes()
+
+    users = [
+        {
+            "full_name": f"Nhân viên {i:04d}",
+            "department": random.choice(["IT", "HR", "Sales", "Finance"]),
+            "status": "ACTIVE",
+            "role": "EMPLOYEE",
+            "base_salary": random.choice([10, 15, 20, 30]) * 1000000
+        }
+        for i in range(USERS)
+    ]
+    result = await db["users"].insert_many(users)
+
+    day = datetime(YEAR, MONTH, 1)
+    working_days = []
+    while len(working_days) < DAYS:
+        if day.weekday() < 5:
+            working_days.append(day)
+        day += timedelta(days=1)
+
+    days = []
+    for user_id in result.inserted_ids:
+        for work_day in working_days:
+            if random.random() < 0.05:
+                continue  # absent
+            late = random.random() < 0.2
+            early = random.random() < 0.1
+            days.append({
+                "user_id": str(user_id),
+                "date": work_day.strftime("%Y-%m-%d"),
+                "check_in_time": work_day.replace(hour=9 if late else 8),
+                "check_in_status": "LATE" if late else "ON_TIME",
+                "check_out_time": work_day.replace(hour=16 if early else 17, minute=30),
+                "check_out_status": "EARLY_LEAVE" if early else "ON_TIME"
+            })
+        if len(days) >= 10000:
+            await db["daily_attendance"].insert_many(days)
+            days = []
+    if days:
+        await db["daily_attendance"].insert_many(days)
+
+async def per_user_calculate(db):
+    """What a client has to do today: one calculate call per employee"""
+    payrolls_col = db["payrolls"]
+    created = 0
+    async for user in db["users"].find({"status": "ACTIVE"}, {"base_salary": 1}):
+        user_id = str(user["_id"])
+        existing = await payrolls_col.find_one({"user_id": user_id, "month": MONTH, "year": YEAR})
+        if existing:
+            continue
+        payroll = await payroll_service.calculate_payroll(user_id, MONTH, YEAR, user["base_salary"])
+        await payrolls_col.insert_one(payroll.dict())
+        created += 1
+    return created
+
+async def batch_run():
+    async for event in payroll_service.run_payroll(MONTH, YEAR):
+        if event["event"] == "done":
+            return event
+
+async def main():
+    settings.DATABASE_NAME = f"{settings.DATABASE_NAME}_bench"
+    await database.connect_to_mongo()
+    db = database.get_database()
+
+    print(f"Seeding {USERS} users x {DAYS} days into {settings.DATABASE_NAME}...")
+    await seed(db)
+
+    start = time.perf_counter()
+    created = await per_user_calculate(db)
+    legacy = time.perf_counter() - start
+    legacy_payrolls = await db["payrolls"].find({}, {"_id": 0, "created_at": 0}).sort("user_id", 1).to_list(None)
+    print(f"  {'per-user calculate':<20}: {legacy * 1000:9.1f} ms  ({created} payrolls)")
+
+    await db["payrolls"].delete_many({})
+    start = time.perf_counter()
+    done = await batch_run()
+    batch = time.perf_counter() - start
+    print(f"  {'payroll run':<20}: {batch * 1000:9.1f} ms  "
+          f"({done['created']} payrolls, {len(done['errors'])} errors)  {legacy / batch:.1f}x")
+
+    batch_payrolls = await db["payrolls"].find({}, {"_id": 0, "created_at": 0}).sort("user_id", 1).to_list(None)
+    if batch_payrolls != legacy_payrolls:
+        print("  WARNING: payroll run results differ from the per-user calculation")
+
+    await database.close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
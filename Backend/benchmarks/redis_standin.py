@@ -0,0 +1,149 @@
+"""
+Minimal in-process stand-in for a Redis server, for benchmarks on machines
+without Redis. Speaks enough RESP2 for redis-py: PUBLISH/SUBSCRIBE (the
+Socket.IO AsyncRedisManager) and the hash/set commands and MULTI/EXEC
+transactions used by the presence registry. Not for production use.
+Run standalone: python -m benchmarks.redis_standin [port]   (default 6390)
+"""
+import asyncio
+import sys
+from typing import Dict, List, Optional, Set
+
+class RedisStandIn:
+    def __init__(self):
+        self.hashes: Dict[bytes, Dict[bytes, bytes]] = {}
+        self.sets: Dict[bytes, Set[bytes]] = {}
+        self.channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+        self.published = 0
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self._client, host, port)
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        subscribed: Set[bytes] = set()
+        transaction: Optional[List[List[bytes]]] = None  # commands queued after MULTI
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if command is None:
+                    break
+                name = command[0].upper()
+                if name == b"MULTI":
+                    transaction = []
+                    reply = b"+OK\r\n"
+                elif name == b"DISCARD":
+                    transaction = None
+                    reply = b"+OK\r\n"
+                elif name == b"EXEC":
+                    # Commands run one after another without awaiting, so
+                    # no other client sees the transaction half applied
+                    replies = [self._execute(c, writer, subscribed) for c in transaction or []]
+                    reply = b"*%d\r\n" % len(replies) + b"".join(replies)
+                    transaction = None
+                elif transaction is not None:
+                    transaction.append(command)
+                    reply = b"+QUEUED\r\n"
+                else:
+                    reply = self._execute(command, writer, subscribed)
+                writer.write(reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscribed:
+                self.channels.get(channel, set()).discard(writer)
+            writer.close()
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()  # inline command
+        args = []
+        for _ in range(int(line[1:])):
+            size = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    @staticmethod
+    def _bulk(value) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _array(self, values: List) -> bytes:
+        out = b"*%d\r\n" % len(values)
+        for value in values:
+            out += b":%d\r\n" % value if isinstance(value, int) else self._bulk(value)
+        return out
+
+    def _execute(self, command: List[bytes], writer, subscribed: Set[bytes]) -> bytes:
+        name, args = command[0].upper(), command[1:]
+
+        if name == b"PING":
+            return b"+PONG\r\n"
+        if name in (b"CLIENT", b"SELECT", b"AUTH"):
+            return b"+OK\r\n"
+        if name == b"SUBSCRIBE":
+            out = b""
+            for channel in args:
+                subscribed.add(channel)
+                self.channels.setdefault(channel, set()).add(writer)
+                out += self._array([b"subscribe", channel, len(subscribed)])
+            return out
+        if name == b"UNSUBSCRIBE":
+            out = b""
+            for channel in args or list(subscribed):
+                subscribed.discard(channel)
+                self.channels.get(channel, set()).discard(writer)
+                out += self._array([b"unsubscribe", channel, len(subscribed)])
+            return out
+        if name == b"PUBLISH":
+            channel, message = args
+            receivers = self.channels.get(channel, set())
+            payload = self._array([b"message", channel, message])
+            for receiver in receivers:
+                receiver.write(payload)
+            self.published += 1
+            return b":%d\r\n" % len(receivers)
+        if name == b"HSET":
+            fields = self.hashes.setdefault(args[0], {})
+            added = 0
+            for i in range(1, len(args), 2):
+                added += args[i] not in fields
+                fields[args[i]] = args[i + 1]
+            return b":%d\r\n" % added
+        if name == b"HGET":
+            return self._bulk(self.hashes.get(args[0], {}).get(args[1]))
+        if name == b"HDEL":
+            fields = self.hashes.get(args[0], {})
+            return b":%d\r\n" % sum(fields.pop(f, None) is not None for f in args[1:])
+        if name == b"SADD":
+            members = self.sets.setdefault(args[0], set())
+            before = len(members)
+            members.update(args[1:])
+            return b":%d\r\n" % (len(members) - before)
+        if name == b"SREM":
+            members = self.sets.get(args[0], set())
+            before = len(members)
+            members.difference_update(args[1:])
+            return b":%d\r\n" % (before - len(members))
+        if name == b"SMEMBERS":
+            return self._array(sorted(self.sets.get(args[0], set())))
+        if name == b"SCARD":
+            return b":%d\r\n" % len(self.sets.get(args[0], set()))
+        if name == b"DEL":
+            removed = sum((self.hashes.pop(k, None) is not None) + (self.sets.pop(k, None) is not None) for k in args)
+            return b":%d\r\n" % removed
+        return b"-ERR unknown command '%s'\r\n" % name
+
+async def main(port: int):
+    server = await RedisStandIn().serve(port=port)
+    print(f"Redis stand-in listening on 127.0.0.1:{port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 6390))
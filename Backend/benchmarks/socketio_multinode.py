@@ -0,0 +1,155 @@
+"""
+Benchmark: Socket.IO across two nodes sharing a pub/sub message queue
+(SOCKETIO_MESSAGE_QUEUE).
+Starts two app Socket.IO nodes as separate processes on the same queue -
+SOCKETIO_MESSAGE_QUEUE if set, otherwise a local Redis stand-in
+(benchmarks.redis_standin) - has clients on each node publish to rooms
+joined by clients on the other node and reports messages per second per
+node, next to a single node without a queue. Publishing goes through a
+benchmark-only event registered in the node processes, so no MongoDB is
+needed; the rooms are joined with the app's own join_conversation event.
+Cross-node delivery itself is checked by tests/test_socketio_multinode.py.
+Needs aiohttp for the Socket.IO client (pip install aiohttp).
+Run from the Backend folder: python -m benchmarks.socketio_multinode
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import socketio
+
+MESSAGES = 5000     # published by each node
+SENDERS = 4         # clients publishing on each node
+RECEIVERS = 2       # clients per node in the room the other node publishes to
+TIMEOUT = 60
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def run_node(port: int):
+    """Node process: the app's Socket.IO server plus the benchmark event"""
+    import uvicorn
+    from app.socket_events import sio, socket_app
+
+    @sio.event
+    async def bench_publish(sid, data):
+        await sio.emit("bench_message", data, to=data.get("to") or data["room"])
+
+    uvicorn.run(socket_app, host="127.0.0.1", port=port, log_level="warning")
+
+def start(args, env=None) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", *args],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+async def wait_for_port(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Nothing listening on port {port}")
+            await asyncio.sleep(0.2)
+
+class Receiver:
+    def __init__(self, expected: int):
+        self.client = socketio.AsyncClient()
+        self.expected = expected
+        self.received = 0
+        self.done = asyncio.Event()
+        self.client.on("bench_message", self._on_message)
+
+    async def _on_message(self, data):
+        self.received += 1
+        if self.received >= self.expected:
+            self.done.set()
+
+async def connect(port: int, client: socketio.AsyncClient):
+    await client.connect(f"http://127.0.0.1:{port}", socketio_path="/socket.io", transports=["websocket"])
+
+async def join(client: socketio.AsyncClient, room: str):
+    await client.emit("join_conversation", {"conversation_id": room})
+
+async def throughput(ports) -> float:
+    """
+    Clients on ports[i] publish MESSAGES to a room joined by RECEIVERS
+    clients on ports[(i + 1) % n]; returns messages per second per node
+    """
+    n = len(ports)
+    receivers = {port: [Receiver(MESSAGES) for _ in range(RECEIVERS)] for port in ports}
+    senders = {port: [socketio.AsyncClient() for _ in range(SENDERS)] for port in ports}
+
+    for port in ports:
+        for receiver in receivers[port]:
+            await connect(port, receiver.client)
+            await join(receiver.client, f"to-{port}")
+        for sender in senders[port]:
+            await connect(port, sender)
+    await asyncio.sleep(0.5)
+
+    async def publish(sender, room, count):
+        for seq in range(count):
+            await sender.emit("bench_publish", {"room": room, "seq": seq})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        publish(sender, f"to-{ports[(i + 1) % n]}", MESSAGES // SENDERS)
+        for i, port in enumerate(ports)
+        for sender in senders[port]
+    ))
+    await asyncio.wait_for(
+        asyncio.gather(*(r.done.wait() for rs in receivers.values() for r in rs)),
+        TIMEOUT
+    )
+    elapsed = time.perf_counter() - start
+
+    for client in [r.client for rs in receivers.values() for r in rs] + [s for ss in senders.values() for s in ss]:
+        await client.disconnect()
+    return MESSAGES / elapsed
+
+async def main():
+    processes = []
+    queue = os.getenv("SOCKETIO_MESSAGE_QUEUE", "")
+    try:
+        if not queue:
+            broker_port = free_port()
+            processes.append(start(["benchmarks.redis_standin", str(broker_port)]))
+            await wait_for_port(broker_port)
+            queue = f"redis://127.0.0.1:{broker_port}/0"
+
+        port_a, port_b, port_single = free_port(), free_port(), free_port()
+        for port, node_queue in ((port_a, queue), (port_b, queue), (port_single, "")):
+            processes.append(start(["benchmarks.socketio_multinode", "node", str(port)],
+                                   {"SOCKETIO_MESSAGE_QUEUE": node_queue}))
+        for port in (port_a, port_b, port_single):
+            await wait_for_port(port)
+
+        print(f"Message queue: {queue}")
+        single = await throughput([port_single])
+        print(f"  {'single node, no queue':<28}: {single:9.0f} msg/s")
+        multi = await throughput([port_a, port_b])
+        print(f"  {'two nodes, cross-node':<28}: {multi:9.0f} msg/s per node "
+              f"({RECEIVERS} receivers each)")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["node"]:
+        run_node(int(sys.argv[2]))
+    else:
+        asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Benchmark: a reconnect storm - 1,000 Socket.IO clients connecting at
+once, as after a deploy - with the old connect handler (load every
+conversation of the user and join its room) vs the current one (join the
+user's own room only).
+Seeds 1,000 users in 5,000 group conversations of 40 members (about 200
+conversations per user) into a separate database (<DATABASE_NAME>_bench)
+on MONGODB_URL, then starts a Socket.IO node process per handler and
+times all clients connecting together.
+Needs aiohttp for the Socket.IO client (pip install aiohttp).
+Run from the Backend folder: python -m benchmarks.socketio_reconnect
+"""
+import asyncio
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import socketio
+
+from app import database
+from app.config import settings
+from benchmarks.socketio_multinode import free_port, start, wait_for_port
+
+USERS = 1000
+CONVERSATIONS = 5000
+MEMBERS = 40
+
+def run_node(port: int, handler: str):
+    """Node process: the app's Socket.IO server, optionally with the old connect handler"""
+    import uvicorn
+    from app.socket_events import presence, sio
+
+    if handler == "legacy":
+        @sio.event
+        async def connect(sid, environ, auth):
+            print(f"Client connected: {sid}")
+            if auth and auth.get("user_id"):
+                user_id = auth["user_id"]
+                await presence.connect(sid, user_id)
+                conv_col = database.get_conversations_collection()
+                conversations = await conv_col.find({"participants": user_id}).to_list(None)
+                for conv in conversations:
+                    await sio.enter_room(sid, str(conv["_id"]))
+                    print(f"User {user_id} joined room {conv['_id']}")
+
+    app = socketio.ASGIApp(sio, on_startup=database.connect_to_mongo, on_shutdown=database.close_mongo_connection)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+async def seed():
+    await database.connect_to_mongo()
+    db = database.get_database()
+    await db["conversations"].drop()
+    await database.ensure_indexes()
+
+    user_ids = [f"{i:024x}" for i in range(USERS)]
+    now = datetime.utcnow()
+    await db["conversations"].insert_many([
+        {
+            "type": "group",
+            "name": f"Nhóm {i}",
+            "participants": random.sample(user_ids, MEMBERS),
+            "created_at": now,
+            "last_message_at": now
+        }
+        for i in range(CONVERSATIONS)
+    ])
+    await database.close_mongo_connection()
+    return user_ids
+
+async def storm(port: int, user_ids) -> dict:
+    clients = [socketio.AsyncClient() for _ in user_ids]
+    latencies = []
+
+    async def connect(client, user_id):
+        start = time.perf_counter()
+        await client.connect(f"http://127.0.0.1:{port}", socketio_path="/socket.io",
+                             transports=["websocket"], auth={"user_id": user_id}, wait_timeout=120)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(connect(c, u) for c, u in zip(clients, user_ids)))
+    total = time.perf_counter() - start
+
+    await asyncio.gather(*(c.disconnect() for c in clients))
+    latencies.sort()
+    return {
+        "total": total,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1]
+    }
+
+async def main():
+    settings.DATABASE_NAME = f"{settings.DATABASE_NAME}_bench"
+    print(f"Seeding {CONVERSATIONS} conversations x {MEMBERS} members into {settings.DATABASE_NAME}...")
+    user_ids = await seed()
+
+    results = {}
+    for handler in ("legacy", "current"):
+        port = free_port()
+        node = start(["benchmarks.socketio_reconnect", "node", str(port), handler],
+                     {"DATABASE_NAME": settings.DATABASE_NAME, "SOCKETIO_MESSAGE_QUEUE": ""})
+        try:
+            await wait_for_port(port)
+            results[handler] = await storm(port, user_ids)
+        finally:
+            node.terminate()
+            node.wait()
+
+        r = results[handler]
+        speedup = f"  {results['legacy']['total'] / r['total']:.1f}x" if handler != "legacy" else ""
+        print(f"  {handler + ' connect':<16}: {r['total'] * 1000:9.1f} ms for {USERS} clients  "
+              f"(p50 {r['p50'] * 1000:.1f} ms, p95 {r['p95'] * 1000:.1f} ms){speedup}")
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["node"]:
+        run_node(int(sys.argv[2]), sys.argv[3])
+    else:
+        asyncio.run(main())
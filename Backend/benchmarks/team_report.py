@@ -0,0 +1,144 @@
+"""
+Benchmark: /api/attendance/report/team, legacy Python join vs $group pipeline.
+Seeds 2,000 active users x 22 working days of check-ins (raw logs plus the
+daily_attendance rollup) into a separate database (<DATABASE_NAME>_bench)
+on MONGODB_URL, then times both versions
+and shows how much the legacy version's 1,000-user / 10,000-log caps cut off.
+Run from the Backend folder: python -m benchmarks.team_report
+"""
+import asyncio
+import random
+import time
+from calendar import monthrange
+from datetime import datetime, timedelta
+
+from app import database
+from app.config import settings
+from app.routers.attendance import get_team_report
+
+USERS = 2000
+DAYS = 22
+MONTH, YEAR = 1, 2025  # 23 weekdays, so all 22 days fall inside the month
+ROUNDS = 3
+
+async def seed(db):
+    await db["users"].drop()
+    await db["attendance_logs"].drop()
+    await db["daily_attendance"].drop()
+    await database.ensure_indexes()
+
+    users = [
+        {
+            "full_name": f"Nhân viên {i:04d}",
+            "department": random.choice(["IT", "HR", "Sales", "Finance"]),
+            "status": "ACTIVE",
+            "role": "EMPLOYEE"
+        }
+        for i in range(USERS)
+    ]
+    result = await db["users"].insert_many(users)
+
+    day = datetime(YEAR, MONTH, 1)
+    working_days = []
+    while len(working_days) < DAYS:
+        if day.weekday() < 5:
+            working_days.append(day)
+        day += timedelta(days=1)
+
+    logs, days = [], []
+    for user_id in result.inserted_ids:
+        for work_day in working_days:
+            late = random.random() < 0.2
+            status = "LATE" if late else "ON_TIME"
+            timestamp = work_day.replace(hour=9 if late else 8, minute=random.randint(0, 40))
+            logs.append({
+                "user_id": str(user_id),
+                "attendance_type": "CHECK_IN",
+                "status": status,
+                "timestamp": timestamp
+            })
+            days.append({
+                "user_id": str(user_id),
+                "date": timestamp.strftime("%Y-%m-%d"),
+                "check_in_time": timestamp,
+                "check_in_status": status
+            })
+        if len(logs) >= 10000:
+            await db["attendance_logs"].insert_many(logs)
+            await db["daily_attendance"].insert_many(days)
+            logs, days = [], []
+    if logs:
+        await db["attendance_logs"].insert_many(logs)
+        await db["daily_attendance"].insert_many(days)
+
+async def legacy_team_report(db, month: int, year: int) -> dict:
+    """The pre-aggregation implementation, kept for comparison"""
+    first_day = datetime(year, month, 1)
+    last_day = datetime(year, month, monthrange(year, month)[1], 23, 59, 59)
+    users = await db["users"].find({"status": "ACTIVE"}).to_list(1000)
+    logs = await db["attendance_logs"].find({
+        "timestamp": {"$gte": first_day, "$lte": last_day},
+        "attendance_type": "CHECK_IN"
+    }).to_list(10000)
+
+    user_stats = {}
+    for user in users:
+        user_id = str(user["_id"])
+        user_logs = [l for l in logs if l["user_id"] == user_id]
+        on_time = sum(1 for l in user_logs if l["status"] == "ON_TIME")
+        late = sum(1 for l in user_logs if l["status"] == "LATE")
+        total = len(user_logs)
+        user_stats[user_id] = {
+            "id": user_id,
+            "name": user.get("full_name"),
+            "department": user.get("department"),
+            "total_days": total,
+            "on_time": on_time,
+            "late": late,
+            "on_time_rate": round(on_time / total * 100, 1) if total > 0 else 0
+        }
+    sorted_stats = sorted(user_stats.values(), key=lambda x: x["on_time_rate"], reverse=True)
+    total_checkins = len(logs)
+    total_on_time = sum(1 for l in logs if l["status"] == "ON_TIME")
+    return {
+        "month": month,
+        "year": year,
+        "total_employees": len(users),
+        "total_checkins": total_checkins,
+        "overall_on_time_rate": round(total_on_time / total_checkins * 100, 1) if total_checkins > 0 else 0,
+        "employees": sorted_stats
+    }
+
+async def timed(label: str, make_report):
+    best = None
+    report = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        report = await make_report()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<22}: {best * 1000:8.1f} ms  "
+          f"({report['total_employees']} employees, {report['total_checkins']} check-ins)")
+    return report
+
+async def main():
+    settings.DATABASE_NAME = f"{settings.DATABASE_NAME}_bench"
+    await database.connect_to_mongo()
+    db = database.get_database()
+
+    print(f"Seeding {USERS} users x {DAYS} days into {settings.DATABASE_NAME}...")
+    await seed(db)
+
+    admin = {"_id": "bench", "role": "SUPER_ADMIN"}
+    legacy = await timed("legacy (capped)", lambda: legacy_team_report(db, MONTH, YEAR))
+    current = await timed("daily rollup $group", lambda: get_team_report(MONTH, YEAR, admin))
+
+    if legacy["total_checkins"] < current["total_checkins"]:
+        print(f"  legacy report truncated: {legacy['total_checkins']} of "
+              f"{current['total_checkins']} check-ins, {legacy['total_employees']} of "
+              f"{current['total_employees']} employees")
+
+    await database.close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+Benchmark: in-memory openpyxl workbook vs streaming XlsxStreamWriter.
+Builds a 50,000-row attendance-style sheet with each engine in a fresh
+subprocess and reports peak RSS, time to first byte and total time.
+The openpyxl side reproduces the old export code (per-cell styles, save
+to BytesIO) and needs openpyxl installed.
+Run from the Backend folder: python -m benchmarks.xlsx_export
+"""
+import asyncio
+import resource
+import subprocess
+import sys
+import time
+
+ROWS = 50000
+HEADERS = ["STT", "Mã NV", "Họ tên", "Phòng ban", "Số ngày làm", "Đúng giờ", "Đi muộn", "Tỷ lệ %"]
+WIDTHS = [8, 12, 25, 20, 12, 12, 12, 12]
+
+def make_row(i: int) -> list:
+    return [i, f"NV{i:05d}", f"Nhân viên {i:05d}", "Phòng Kỹ thuật", 22, 18, 4, "81.8%"]
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_openpyxl():
+    from io import BytesIO
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+
+    fill = PatternFill(start_color="4F46E5", end_color="4F46E5", fill_type="solid")
+    font = Font(bold=True, color="FFFFFF")
+    border = Border(left=Side(style='thin'), right=Side(style='thin'),
+                    top=Side(style='thin'), bottom=Side(style='thin'))
+
+    start = time.perf_counter()
+    wb = Workbook()
+    ws = wb.active
+    for col, header in enumerate(HEADERS, 1):
+        cell = ws.cell(row=1, column=col, value=header)
+        cell.fill = fill
+        cell.font = font
+        cell.alignment = Alignment(horizontal='center')
+        cell.border = border
+    for i in range(1, ROWS + 1):
+        for col, value in enumerate(make_row(i), 1):
+            cell = ws.cell(row=i + 1, column=col, value=value)
+            cell.border = border
+            cell.alignment = Alignment(horizontal='center')
+    buffer = BytesIO()
+    wb.save(buffer)
+    # Nothing can be sent before the whole file is saved
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed, len(buffer.getvalue())
+
+def run_stream():
+    from app.services.xlsx_stream import XlsxStreamWriter
+
+    async def rows():
+        for i in range(1, ROWS + 1):
+            yield make_row(i)
+
+    async def consume():
+        writer = XlsxStreamWriter("Chấm công", HEADERS, WIDTHS)
+        start = time.perf_counter()
+        first_byte = None
+        size = 0
+        async for chunk in writer.stream(rows()):
+            if first_byte is None and chunk:
+                first_byte = time.perf_counter() - start
+            size += len(chunk)
+        return first_byte, time.perf_counter() - start, size
+
+    return asyncio.run(consume())
+
+def child(mode: str):
+    baseline = peak_rss_mb()
+    first_byte, total, size = run_openpyxl() if mode == "openpyxl" else run_stream()
+    print(f"{first_byte} {total} {size} {peak_rss_mb() - baseline} {peak_rss_mb()}")
+
+def main():
+    print(f"{ROWS} rows x {len(HEADERS)} columns")
+    for mode in ("openpyxl", "stream"):
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.xlsx_export", mode],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(f"  {mode:<9}: failed ({result.stderr.strip().splitlines()[-1]})")
+            continue
+        first_byte, total, size, grown, peak = map(float, result.stdout.split())
+        print(f"  {mode:<9}: first byte {first_byte * 1000:8.1f} ms  total {total * 1000:8.1f} ms  "
+              f"peak RSS {peak:7.1f} MB (+{grown:.1f} MB)  {size / 1024:,.0f} KB")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        child(sys.argv[1])
+    else:
+        main()
@@ -88,7 +88,6 @@ async def create_users():
             "status": user_data["status"],
             "avatar": None,
             "face_registered": False,
-            "face_encodings": [],
             "base_salary": 20000000,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow(),
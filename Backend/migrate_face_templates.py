@@ -0,0 +1,72 @@
+"""
+Script to move face encodings out of the users collection.
+Each user's face_encodings (list of lists of doubles) is packed into a
+float32 blob in the face_templates collection, then removed from users.
+Safe to run more than once.
+Run: python migrate_face_templates.py
+"""
+import asyncio
+from datetime import datetime
+from bson import Binary
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, UpdateOne
+
+from app.config import settings
+from app.services.face_recognition_service import FaceTemplate
+
+BATCH_SIZE = 200
+
+async def migrate():
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.DATABASE_NAME]
+    users_col = db["users"]
+    templates_col = db["face_templates"]
+
+    cursor = users_col.find(
+        {"face_encodings": {"$exists": True}},
+        {"face_encodings": 1}
+    )
+
+    migrated = 0
+    template_ops, user_ops = [], []
+
+    async def flush():
+        if template_ops:
+            await templates_col.bulk_write(template_ops, ordered=False)
+        if user_ops:
+            await users_col.bulk_write(user_ops, ordered=False)
+        template_ops.clear()
+        user_ops.clear()
+
+    async for user in cursor:
+        user_id = str(user["_id"])
+        encodings = user.get("face_encodings") or []
+
+        if encodings:
+            data, count, dim = FaceTemplate.pack(encodings)
+            template_ops.append(ReplaceOne(
+                {"_id": user_id},
+                {
+                    "_id": user_id,
+                    "dtype": "float32",
+                    "count": count,
+                    "dim": dim,
+                    "data": Binary(data),
+                    "updated_at": datetime.utcnow()
+                },
+                upsert=True
+            ))
+            migrated += 1
+
+        user_ops.append(UpdateOne({"_id": user["_id"]}, {"$unset": {"face_encodings": ""}}))
+
+        if len(user_ops) >= BATCH_SIZE:
+            await flush()
+
+    await flush()
+    print(f"✅ Migrated face encodings for {migrated} users to face_templates")
+
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
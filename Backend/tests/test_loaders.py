@@ -0,0 +1,169 @@
+"""
+Query counts of the project/task endpoints that use request loaders.
+Runs against in-memory fakes, no MongoDB needed:
+    cd Backend && python -m pytest -q
+"""
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from app import loaders as loaders_module
+from app.loaders import BatchLoader, RequestLoaders
+from app.routers import projects
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    async def to_list(self, length):
+        return list(self.docs)
+
+class FakeCollection:
+    """The find/find_one subset the endpoints use, counting every query"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = 0
+
+    def _match(self, query):
+        return [d for d in self.docs if all(d.get(k) == v for k, v in query.items())]
+
+    def find(self, query=None, projection=None):
+        self.queries += 1
+        return FakeCursor(self._match(query or {}))
+
+    async def find_one(self, query, projection=None):
+        self.queries += 1
+        docs = self._match(query)
+        return docs[0] if docs else None
+
+class FakeRepository:
+    """Repository.get_many over a dict, counting every query"""
+
+    def __init__(self, docs):
+        self.docs = {str(d["_id"]): d for d in docs}
+        self.queries = 0
+
+    async def get_many(self, ids, projection=None):
+        self.queries += 1
+        return {str(i): self.docs[str(i)] for i in ids if str(i) in self.docs}
+
+class World:
+    """One project with `size` members and `size` tasks, each assigned"""
+
+    def __init__(self, size: int):
+        self.users = [{"_id": ObjectId(), "full_name": f"User {i}"} for i in range(size)]
+        self.project = {"_id": ObjectId(), "name": "Dự án", "team_members": [str(u["_id"]) for u in self.users]}
+        self.tasks = [
+            {
+                "_id": ObjectId(),
+                "title": f"Task {i}",
+                "project_id": str(self.project["_id"]),
+                "assigned_to": str(user["_id"]),
+                "status": "TODO"
+            }
+            for i, user in enumerate(self.users)
+        ]
+        self.projects_col = FakeCollection([self.project])
+        self.tasks_col = FakeCollection(self.tasks)
+        self.users_repo = FakeRepository(self.users)
+        self.projects_repo = FakeRepository([self.project])
+
+    @property
+    def queries(self) -> int:
+        return (self.projects_col.queries + self.tasks_col.queries
+                + self.users_repo.queries + self.projects_repo.queries)
+
+@pytest.fixture
+def make_world(monkeypatch):
+    def make(size: int) -> World:
+        world = World(size)
+        monkeypatch.setattr(projects, "get_projects_collection", lambda: world.projects_col)
+        monkeypatch.setattr(projects, "get_tasks_collection", lambda: world.tasks_col)
+        monkeypatch.setattr(loaders_module, "users_repo", world.users_repo)
+        monkeypatch.setattr(loaders_module, "projects_repo", world.projects_repo)
+        return world
+    return make
+
+def count_queries(make_world, size: int, call) -> int:
+    world = make_world(size)
+    asyncio.run(call(world, RequestLoaders()))
+    return world.queries
+
+ENDPOINTS = {
+    # find_one project + find tasks + one users $in
+    "get_project": (3, lambda w, loaders: projects.get_project(
+        str(w.project["_id"]), current_user={}, loaders=loaders)),
+    # find tasks + one users $in
+    "get_project_tasks": (2, lambda w, loaders: projects.get_project_tasks(
+        str(w.project["_id"]), current_user={}, loaders=loaders)),
+    # find_one project + one users $in
+    "get_project_members": (2, lambda w, loaders: projects.get_project_members(
+        str(w.project["_id"]), current_user={}, loaders=loaders)),
+    # find tasks + one projects $in
+    "get_my_tasks": (2, lambda w, loaders: projects.get_my_tasks(
+        current_user={"_id": w.tasks[0]["assigned_to"]}, loaders=loaders)),
+    # find_one task + one users $in + one projects $in
+    "get_task": (3, lambda w, loaders: projects.get_task(
+        str(w.tasks[0]["_id"]), current_user={}, loaders=loaders)),
+}
+
+@pytest.mark.parametrize("endpoint", sorted(ENDPOINTS))
+def test_query_count_does_not_grow_with_members_or_tasks(make_world, endpoint):
+    expected, call = ENDPOINTS[endpoint]
+    assert count_queries(make_world, 1, call) == expected
+    assert count_queries(make_world, 50, call) == expected
+
+def test_get_my_tasks_loads_shared_project_once(make_world):
+    world = make_world(20)
+    # Every task of the user points to the same project
+    for task in world.tasks:
+        task["assigned_to"] = world.tasks[0]["assigned_to"]
+
+    result = asyncio.run(projects.get_my_tasks(current_user={"_id": world.tasks[0]["assigned_to"]}, loaders=RequestLoaders()))
+
+    assert len(result) == 20
+    assert {t["project_name"] for t in result} == {"Dự án"}
+    assert world.projects_repo.queries == 1
+
+def test_batch_loader_coalesces_and_caches():
+    docs = [{"_id": ObjectId()} for _ in range(3)]
+    repo = FakeRepository(docs)
+    missing = str(ObjectId())
+
+    async def run():
+        loader = BatchLoader(repo)
+        first = await asyncio.gather(*(loader.load(str(d["_id"])) for d in docs), loader.load(missing))
+        again = await loader.load_many([str(docs[0]["_id"]), missing])
+        return first, again
+
+    first, again = asyncio.run(run())
+
+    assert first == docs + [None]
+    assert again == [docs[0], None]
+    assert repo.queries == 1
+
+def test_batch_loader_does_not_cache_failures():
+    doc = {"_id": ObjectId()}
+
+    class FlakyRepository(FakeRepository):
+        async def get_many(self, ids, projection=None):
+            if self.queries == 0:
+                self.queries += 1
+                raise RuntimeError("connection reset")
+            return await super().get_many(ids, projection)
+
+    repo = FlakyRepository([doc])
+
+    async def run():
+        loader = BatchLoader(repo)
+        with pytest.raises(RuntimeError):
+            await loader.load(str(doc["_id"]))
+        return await loader.load(str(doc["_id"]))
+
+    assert asyncio.run(run()) == doc
+    assert repo.queries == 2
@@ -0,0 +1,63 @@
+"""
+Socket.IO across two nodes sharing a pub/sub message queue: room and sid
+emits made on one node reach clients connected to the other. The nodes
+and a local Redis stand-in broker run as separate processes (see
+benchmarks/socketio_multinode.py), so no Redis or MongoDB is needed:
+    cd Backend && python -m pytest -q
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")  # Socket.IO client transport
+pytest.importorskip("uvicorn")
+
+from benchmarks.socketio_multinode import Receiver, connect, free_port, join, start, wait_for_port
+
+async def run_two_nodes(check):
+    """Start a broker and two nodes on it, then run check(port_a, port_b)"""
+    processes = []
+    try:
+        broker_port = free_port()
+        processes.append(start(["benchmarks.redis_standin", str(broker_port)]))
+        await wait_for_port(broker_port)
+        queue = f"redis://127.0.0.1:{broker_port}/0"
+
+        port_a, port_b = free_port(), free_port()
+        for port in (port_a, port_b):
+            processes.append(start(["benchmarks.socketio_multinode", "node", str(port)],
+                                   {"SOCKETIO_MESSAGE_QUEUE": queue}))
+        for port in (port_a, port_b):
+            await wait_for_port(port)
+
+        return await check(port_a, port_b)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+async def deliver_across_nodes(port_a: int, port_b: int) -> int:
+    """A room emit and a direct sid emit from node A, counted on node B"""
+    import socketio
+
+    sender = socketio.AsyncClient()
+    receiver = Receiver(expected=2)
+    await connect(port_a, sender)
+    await connect(port_b, receiver.client)
+    await join(receiver.client, "check")
+    await asyncio.sleep(0.5)
+
+    await sender.emit("bench_publish", {"room": "check"})
+    await sender.emit("bench_publish", {"to": receiver.client.get_sid()})
+    try:
+        await asyncio.wait_for(receiver.done.wait(), 5)
+    except asyncio.TimeoutError:
+        pass
+
+    await sender.disconnect()
+    await receiver.client.disconnect()
+    return receiver.received
+
+def test_room_and_sid_emits_reach_the_other_node():
+    assert asyncio.run(run_two_nodes(deliver_across_nodes)) == 2
@@ -124,10 +124,11 @@ export function SocketProvider({ children }) {
     }, [socket, connected, user])
 
     // Message delivered
-    const messageDelivered = useCallback((messageId) => {
+    const messageDelivered = useCallback((messageId, conversationId) => {
         if (socket && connected) {
             socket.emit('message_delivered', {
                 message_id: messageId,
+                conversation_id: conversationId,
                 user_id: user.id
             })
         }
@@ -35,7 +35,7 @@ export default function AdminFaceEnrollPage() {
         setEnrolling(true)
 
         try {
-            await userAPI.enrollFace(userId, images)
+            await userAPI.enrollFaceForUser(userId, images)
             toast.success('Đăng ký khuôn mặt thành công!')
             setStep('done')
         } catch (error) {
@@ -89,6 +89,11 @@ export default function ChatPage() {
     }
 
     const handleSelectConversation = (conv) => {
+        // Everything in the chat being left was seen, even if the list was
+        // reloaded before the buffered seen receipt moved the read cursor
+        setConversations(prev => prev.map(c =>
+            c.id === selectedConv?.id ? { ...c, unread_count: 0 } : c
+        ))
         setSelectedConv(conv)
         joinConversation(conv.id)
         loadMessages(conv.id)
@@ -151,13 +156,16 @@ export default function ChatPage() {
                                     }`}
                             >
                                 <div className="flex items-center gap-3">
-                                    <div className={`w-12 h-12 rounded-full flex items-center justify-center text-white font-bold flex-shrink-0 ${conv.type === 'GROUP' ? 'bg-indigo-600' : 'bg-gradient-to-r from-blue-500 to-purple-500'
+                                    <div className={`relative w-12 h-12 rounded-full flex items-center justify-center text-white font-bold flex-shrink-0 ${conv.type === 'GROUP' ? 'bg-indigo-600' : 'bg-gradient-to-r from-blue-500 to-purple-500'
                                         }`}>
                                         {conv.avatar ? (
                                             <img src={conv.avatar} alt="" className="w-full h-full rounded-full object-cover" />
                                         ) : (
                                             conv.name?.[0] || (conv.type === 'GROUP' ? 'G' : '?')
                                         )}
+                                        {conv.is_online && (
+                                            <span className="absolute bottom-0 right-0 w-3 h-3 bg-green-500 rounded-full border-2 border-slate-800 pulse-online" />
+                                        )}
                                     </div>
                                     <div className="flex-1 min-w-0">
                                         <div className="flex items-center justify-between">
@@ -172,7 +180,7 @@ export default function ChatPage() {
                                             {conv.last_message || 'Bắt đầu cuộc trò chuyện'}
                                         </p>
                                     </div>
-                                    {conv.unread_count > 0 && (
+                                    {conv.unread_count > 0 && selectedConv?.id !== conv.id && (
                                         <span className="w-5 h-5 bg-blue-500 rounded-full flex items-center justify-center text-xs">
                                             {conv.unread_count}
                                         </span>